@@ -7,34 +7,59 @@ import asyncio
 import requests
 import json
 import time
-from typing import Dict, List, Any, Optional
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from datetime import datetime
 from google.adk.agents import Agent
+from utils.enhanced_logger import enhanced_logger, log_a2a_message
+from utils.metrics import A2A_ROUTE
+from utils.replica_set import ReplicaSet, parse_replicas, replica_ports
+from utils.resilience import IDEMPOTENT_METHODS, ResiliencePolicy
+from utils.single_flight import SingleFlight
+from utils.tracing import inject_headers, start_span
 # A2AClient import removed - using HTTP-based communication instead
 
 class A2AOrchestrator:
     """Orquestrador A2A para descoberta e comunicação entre agentes"""
     
-    def __init__(self):
+    def __init__(self, coalesce: bool = True, resilience: Optional[ResiliencePolicy] = None):
         self.agent_registry: Dict[str, Dict[str, Any]] = {}
         self.agent_urls: Dict[str, str] = {}
+        # Réplicas por agente (balanceamento por menos requisições em andamento)
+        self.replica_sets: Dict[str, ReplicaSet] = {}
         self.message_log: List[Dict[str, Any]] = []
+        # Chamadas idênticas concorrentes (mesma consulta ao mesmo agente, mesmo Agent Card)
+        # compartilham uma única requisição HTTP
+        # Circuit breaker por agente, novas tentativas com backoff e hedge (FLAFLU_A2A_RESILIENCE)
+        self.resilience = resilience or ResiliencePolicy.from_env(enhanced_logger.registry)
+        # Quem aguarda uma chamada idêntica desiste dela após o timeout da tentativa e chama sozinho
+        self.coalesce = coalesce
+        self.run_flight = SingleFlight("orchestrator:/run", enhanced_logger.registry,
+                                       wait_timeout=self.resilience.attempt_timeout)
+        self.card_flight = SingleFlight("orchestrator:agent_card", enhanced_logger.registry, wait_timeout=5)
         
-    def register_agent(self, name: str, url: str, port: int):
-        """Registra um agente no orquestrador"""
-        agent_url = f"{url}:{port}"
+    def register_agent(self, name: str, url: str, port: int, replicas: int = 1):
+        """Registra um agente no orquestrador (réplicas nas portas port, port+100, ...)"""
+        self.register_replicas(name, [f"{url}:{replica_port}" for replica_port in replica_ports(port, replicas)])
+    
+    def register_replicas(self, name: str, urls: List[str]):
+        """Registra um agente servido por uma ou mais réplicas"""
+        replica_set = ReplicaSet(urls)
+        agent_url = replica_set.urls[0]
         self.agent_registry[name] = {
             "url": agent_url,
-            "port": port,
+            "port": int(agent_url.rsplit(":", 1)[1]),
             "card_url": f"{agent_url}/.well-known/agent.json",
+            "replicas": replica_set.urls,
             "status": "registered",
             "last_ping": None
         }
         
         # Armazena URL do agente para comunicação HTTP
         self.agent_urls[name] = agent_url
+        self.replica_sets[name] = replica_set
         
-        print(f"✅ Agente {name} registrado em {agent_url}")
+        suffix = f" (+{len(replica_set) - 1} réplicas)" if len(replica_set) > 1 else ""
+        print(f"✅ Agente {name} registrado em {agent_url}{suffix}")
     
     def discover_agent(self, name: str) -> Optional[Dict[str, Any]]:
         """Descobre um agente e sua agent card"""
@@ -45,7 +70,7 @@ class A2AOrchestrator:
         card_url = agent_info["card_url"]
         
         try:
-            response = requests.get(card_url, timeout=5)
+            response, _ = self._coalesced(self.card_flight, card_url, lambda: requests.get(card_url, timeout=5))
             if response.status_code == 200:
                 agent_card = response.json()
                 agent_info["card"] = agent_card
@@ -68,16 +93,14 @@ class A2AOrchestrator:
             agent_info["status"] = "error"
             return None
     
-    async def send_a2a_message(self, from_agent: str, to_agent: str, method: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Envia mensagem A2A entre agentes via HTTP"""
+    async def send_a2a_message(self, from_agent: str, to_agent: str, method: str, params: Dict[str, Any],
+                               idempotent: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """Envia mensagem A2A entre agentes via HTTP (idempotent: padrão pelo método, ver IDEMPOTENT_METHODS)"""
         if to_agent not in self.agent_urls:
             print(f"❌ Agente destinatário {to_agent} não encontrado")
             return None
         
         try:
-            # Pega URL do agente destinatário
-            agent_url = self.agent_urls[to_agent]
-            
             # Monta mensagem A2A
             message = {
                 "method": method,
@@ -90,9 +113,22 @@ class A2AOrchestrator:
             # Log da mensagem
             self.log_message("a2a_message", f"{from_agent} → {to_agent}: {method}", message)
             
-            # Envia mensagem HTTP ao endpoint /run do agente
-            run_url = f"{agent_url}/run"
-            response = requests.post(run_url, json={"prompt": params.get("query", "")}, timeout=10)
+            # Envia mensagem HTTP ao endpoint /run do agente (uma vez por consulta idêntica em andamento)
+            query = params.get("query", "")
+            if idempotent is None:
+                idempotent = method in IDEMPOTENT_METHODS
+            start_time = time.perf_counter()
+            response, coalesced = self._coalesced(
+                self.run_flight, (to_agent, query),
+                lambda: self._resilient_post(from_agent, to_agent, method, "/run", {"prompt": query}, idempotent)
+            )
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            
+            # Latência da rota entra nos quantis do EnhancedLogger
+            log_a2a_message(from_agent, to_agent, method,
+                            {"status_code": response.status_code, "coalesced": coalesced},
+                            params.get("correlation_id"),
+                            duration_ms=duration_ms)
             
             if response.status_code == 200:
                 response_data = {
@@ -110,9 +146,117 @@ class A2AOrchestrator:
         except Exception as e:
             error_msg = f"❌ Erro na comunicação A2A: {str(e)}"
             print(error_msg)
-            self.log_message("a2a_error", error_msg, {"error": str(e)})
+            self.log_message("a2a_error", error_msg, {"error": str(e), "to_agent": to_agent})
+            return None
+    
+    async def send_a2a_batch(self, from_agent: str, to_agent: str, method: str, queries: List[str],
+                             use_llm: bool = False, idempotent: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """Envia várias consultas numa só requisição A2A (/run_batch); respostas na ordem das consultas"""
+        if to_agent not in self.agent_urls:
+            print(f"❌ Agente destinatário {to_agent} não encontrado")
+            return None
+        if not queries:
+            return {"from_agent": to_agent, "to_agent": from_agent, "responses": [],
+                    "timestamp": datetime.now().isoformat()}
+        
+        try:
+            message = {
+                "method": method,
+                "params": {"queries": queries, "use_llm": use_llm},
+                "from_agent": from_agent,
+                "to_agent": to_agent,
+                "timestamp": datetime.now().isoformat()
+            }
+            self.log_message("a2a_batch", f"{from_agent} → {to_agent}: {method} ({len(queries)} consultas)", message)
+            
+            if idempotent is None:
+                idempotent = method in IDEMPOTENT_METHODS
+            payload = {"queries": list(queries), "use_llm": use_llm}
+            start_time = time.perf_counter()
+            response, coalesced = self._coalesced(
+                self.run_flight, (to_agent, "/run_batch", tuple(queries), use_llm),
+                lambda: self._resilient_post(from_agent, to_agent, method, "/run_batch", payload, idempotent)
+            )
+            duration_ms = (time.perf_counter() - start_time) * 1000
+            
+            # Lotes têm série de latência própria, fora do p95 da rota /run (base do hedge)
+            enhanced_logger.registry.observe(A2A_ROUTE, f"{from_agent}->{to_agent}:batch", duration_ms)
+            log_a2a_message(from_agent, to_agent, method,
+                            {"status_code": response.status_code, "coalesced": coalesced, "batch_size": len(queries),
+                             "duration_ms": round(duration_ms, 2)},
+                            None)
+            
+            if response.status_code == 200:
+                response_data = {
+                    "from_agent": to_agent,
+                    "to_agent": from_agent,
+                    "responses": response.json().get("responses", []),
+                    "timestamp": datetime.now().isoformat()
+                }
+                self.log_message("a2a_response", f"{to_agent} → {from_agent}: {len(queries)} respostas", response_data)
+                return response_data
+            else:
+                raise Exception(f"HTTP {response.status_code}: {response.text}")
+            
+        except Exception as e:
+            error_msg = f"❌ Erro na comunicação A2A: {str(e)}"
+            print(error_msg)
+            self.log_message("a2a_error", error_msg, {"error": str(e), "to_agent": to_agent})
             return None
     
+    def _coalesced(self, flight: SingleFlight, key, fetch: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Resultado de fetch e se ele foi compartilhado com uma chamada idêntica em andamento"""
+        if not self.coalesce:
+            return fetch(), False
+        return flight.do(key, fetch)
+    
+    def _resilient_post(self, from_agent: str, to_agent: str, method: str, path: str, payload: Dict[str, Any],
+                        idempotent: bool) -> requests.Response:
+        """_post sob a política de resiliência: 5xx, 429 e erros de rede são repetidos; 5xx e rede abrem o circuito"""
+        # O p95 da rota mede chamadas do /run; lotes não entram em hedge
+        hedge_after = self._hedge_delay(from_agent, to_agent) if path == "/run" else None
+        return self.resilience.call(
+            to_agent,
+            lambda: self._post(from_agent, to_agent, method, path, payload),
+            idempotent=idempotent,
+            hedge_after=hedge_after,
+            retryable=lambda response: response.status_code >= 500 or response.status_code == 429,
+            healthy=lambda response: response.status_code < 500,
+        )
+    
+    def _hedge_delay(self, from_agent: str, to_agent: str) -> Optional[float]:
+        """p95 da rota (s) para disparar o hedge; None sem segunda réplica saudável ou sem amostras suficientes"""
+        if self.replica_sets[to_agent].healthy_count() < 2:
+            return None
+        series = enhanced_logger.registry.series(A2A_ROUTE, f"{from_agent}->{to_agent}")
+        if series is None or series["count"] < self.resilience.hedge_min_samples:
+            return None
+        return series["p95_ms"] / 1000
+    
+    def _post(self, from_agent: str, to_agent: str, method: str, path: str,
+              payload: Dict[str, Any]) -> requests.Response:
+        """POST path na réplica menos ocupada do agente; o resultado atualiza a saúde da réplica"""
+        replica_set = self.replica_sets[to_agent]
+        replica = replica_set.acquire()
+        ok, connection_error = False, False
+        try:
+            # Span do salto A2A; o traceparent leva o trace até o servidor do agente
+            with start_span(f"a2a {from_agent}->{to_agent}", service="orchestrator", method=method,
+                            replica=replica.url) as span:
+                try:
+                    response = requests.post(f"{replica.url}{path}", json=payload,
+                                             headers=inject_headers(),
+                                             timeout=self.resilience.attempt_timeout)
+                except requests.ConnectionError:
+                    connection_error = True
+                    raise
+                span.set_attribute("status", response.status_code)
+            # 5xx conta para a ejeção da réplica; 4xx é erro do pedido, não da réplica
+            ok = response.status_code < 500
+            return response
+        finally:
+            replica_set.release(replica, ok=ok, connection_error=connection_error)
+    
     def log_message(self, message_type: str, description: str, data: Dict[str, Any]):
         """Registra mensagem no log A2A"""
         log_entry = {
@@ -129,6 +273,9 @@ class A2AOrchestrator:
         """Retorna status de todos os agentes registrados"""
         return {
             "agents": self.agent_registry,
+            "replicas": {name: replica_set.snapshot() for name, replica_set in self.replica_sets.items()},
+            "single_flight": {flight.name: flight.snapshot() for flight in (self.run_flight, self.card_flight)},
+            "resilience": self.resilience.snapshot(),
             "total_agents": len(self.agent_registry),
             "total_messages": len(self.message_log),
             "last_activity": self.message_log[-1]["timestamp"] if self.message_log else None
@@ -143,20 +290,28 @@ class A2AOrchestrator:
         results = {}
         
         for name, info in self.agent_registry.items():
-            try:
-                response = requests.get(info["card_url"], timeout=3)
-                is_alive = response.status_code == 200
-                results[name] = is_alive
-                
-                if is_alive:
-                    info["status"] = "online"
-                    info["last_ping"] = datetime.now().isoformat()
-                else:
-                    info["status"] = "offline"
-                    
-            except Exception:
-                results[name] = False
-                info["status"] = "error"
+            # Agente online se alguma réplica responde; réplicas sem resposta são ejetadas
+            replica_set = self.replica_sets[name]
+            alive = []
+            for replica in replica_set.replicas:
+                card_url = f"{replica.url}/.well-known/agent.json"
+                try:
+                    response, _ = self._coalesced(self.card_flight, card_url,
+                                                  lambda: requests.get(card_url, timeout=3))
+                    healthy = response.status_code == 200
+                except Exception:
+                    healthy = False
+                replica_set.mark_health(replica, healthy)
+                alive.append(healthy)
+            
+            is_alive = any(alive)
+            results[name] = is_alive
+            if is_alive:
+                info["status"] = "online"
+                info["healthy_replicas"] = sum(alive)
+                info["last_ping"] = datetime.now().isoformat()
+            else:
+                info["status"] = "offline"
         
         return results
 
@@ -174,8 +329,10 @@ def initialize_a2a_agents():
         ("researcher", "http://localhost", 8005)
     ]
     
+    # Mesma contagem de réplicas usada por start_a2a_servers.py (FLAFLU_REPLICAS)
+    replicas = parse_replicas()
     for name, url, port in agents_config:
-        a2a_orchestrator.register_agent(name, url, port)
+        a2a_orchestrator.register_agent(name, url, port, replicas=replicas.get(name, 1))
     
     print("🤖 A2A Orchestrator inicializado com 4 agentes")
     return a2a_orchestrator
@@ -12,6 +12,9 @@ from typing import Dict, Any, List
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from utils.prompt_batch import combine_prompts, split_response
+from utils.rate_limiter import agent_priority, estimate_tokens, get_llm_limiter
+
 # Carrega variáveis do .env
 load_dotenv()
 
@@ -30,6 +33,8 @@ class BaseAgent:
         self.conversation_history = []
         self.tools = []
         self.active = False
+        # Classe de prioridade na cota compartilhada do provedor (supervisor > torcedores > pesquisa)
+        self.priority = agent_priority(name)
         
         # Inicializa cliente Gemini
         if GOOGLE_API_KEY:
@@ -53,8 +58,19 @@ class BaseAgent:
             if context:
                 full_prompt = f"Contexto: {json.dumps(context, ensure_ascii=False)}\n\nMensagem: {message}"
             
-            # Envia para Gemini
-            response = self.client.generate_content(full_prompt)
+            # Envia para Gemini dentro da cota compartilhada (RPM/TPM) e corrige com o uso real
+            limiter = get_llm_limiter()
+            estimated = estimate_tokens(full_prompt)
+            limiter.acquire(estimated, self.priority)
+            estimated = limiter.charged_tokens(estimated, self.priority)
+            try:
+                response = self.client.generate_content(full_prompt)
+            except Exception:
+                # Falha do provedor: devolve os tokens reservados
+                limiter.settle(estimated, 0)
+                raise
+            usage = getattr(response, "usage_metadata", None)
+            limiter.settle(estimated, usage.total_token_count if usage is not None else None)
             response_text = response.text
             
             # Log da conversa
@@ -469,10 +485,23 @@ class A2AProtocol:
         research_pattern = r'\[PESQUISA\](.*?)\[/PESQUISA\]'
         research_requests = re.findall(research_pattern, message_content, re.IGNORECASE)
         
+        prompts = [f"Pesquisa solicitada: {request}" for request in research_requests]
+        # Várias solicitações vão numa só mensagem A2A (uma chamada ao Gemini); as que ficarem
+        # sem resposta marcada são reenviadas sozinhas
+        batch = None
+        if len(prompts) > 1:
+            batch = self.send_message(agent_name, "researcher", combine_prompts(prompts))
+        parts = [None] * len(prompts)
+        if batch is not None and batch["status"] == "success" and batch["response"]["status"] == "success":
+            parts = split_response(batch["response"]["message"], len(prompts))
+        
         research_responses = []
-        for request in research_requests:
+        for request, prompt, part in zip(research_requests, prompts, parts):
+            if part is not None:
+                research_responses.append({"request": request, "response": part, "a2a_log": batch["a2a_message"]})
+                continue
             # Envia solicitação via A2A para o pesquisador
-            a2a_response = self.send_message(agent_name, "researcher", f"Pesquisa solicitada: {request}")
+            a2a_response = self.send_message(agent_name, "researcher", prompt)
             if a2a_response["status"] == "success":
                 research_responses.append({
                     "request": request,
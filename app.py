@@ -19,6 +19,8 @@ from utils.enhanced_logger import (
     LogLevel, LogCategory
 )
 from utils.log_viewer import render_log_dashboard
+from utils.log_shipping import start_log_aggregator
+from utils.tracing import start_span
 
 # Importa agentes usando Google ADK oficial
 from supervisor_agent.agent import create_supervisor_agent
@@ -32,6 +34,12 @@ from a2a_orchestrator_old import a2a_orchestrator
 # Carrega variáveis do .env
 load_dotenv()
 
+# Recebe os logs dos servidores A2A (uma vez por processo; reruns reutilizam o agregador)
+try:
+    start_log_aggregator()
+except OSError as e:
+    log_error(error=e, context="log_aggregator_start")
+
 # --- Configuração da Página ---
 st.set_page_config(
     page_title="🔥 Fla-Flu Debate: 4 Agentes A2A",
@@ -301,18 +309,27 @@ async def run_agent_async(agent, prompt: str) -> str:
         return f"❌ Erro: {str(e)}"
 
 def run_agent_sync(agent, prompt: str) -> str:
-    """Executa agente de forma síncrona usando ADK oficial"""
+    """Executa agente de forma síncrona usando ADK oficial (um trace por turno do debate)"""
     try:
         response = ""
-        for chunk in agent.run(prompt):
-            if isinstance(chunk, str):
-                response += chunk
-            elif hasattr(chunk, 'content'):
-                response += chunk.content
+        with start_span("debate.turn", service="app", agent=agent.name):
+            for chunk in agent.run(prompt):
+                if isinstance(chunk, str):
+                    response += chunk
+                elif hasattr(chunk, 'content'):
+                    response += chunk.content
         return response or "Sem resposta do agente"
     except Exception as e:
         return f"❌ Erro: {str(e)}"
 
+def run_research_batch(researcher, prompts: List[str]) -> List[str]:
+    """Pesquisas de um turno num só pedido ao LLM do pesquisador (um trace para o lote)"""
+    try:
+        with start_span("debate.research_batch", service="app", agent=researcher.name, queries=len(prompts)):
+            return [response or "Sem resposta do agente" for response in researcher.run_batch(prompts)]
+    except Exception as e:
+        return [f"❌ Erro: {str(e)}"] * len(prompts)
+
 # --- Inicialização ---
 init_session_state()
 
@@ -560,10 +577,10 @@ Por favor, **quantos minutos** deve durar nosso debate Flamengo vs Fluminense?
                                         "query": query.strip()[:100]
                                     }
                                 )
-                                
-                                # Usa pesquisador para solicitar dados
-                                prompt = get_debate_prompt("research_query", query=query.strip())
-                                research_result = run_agent_sync(researcher, prompt)
+                            
+                            # Todas as pesquisas do turno numa só chamada ao pesquisador
+                            prompts = [get_debate_prompt("research_query", query=query.strip()) for query in matches]
+                            for query, research_result in zip(matches, run_research_batch(researcher, prompts)):
                                 add_message("Pesquisador", research_result, "research")
                                 add_backstage_log(f"A2A: {agent_name} solicitou pesquisa: '{query[:30]}...'", "info")
                         
@@ -771,10 +788,13 @@ with col_toggle:
 with col_metrics:
     # Mostra métricas rápidas
     metrics = enhanced_logger.get_performance_metrics()
+    agent_p95 = (metrics.get("latency", {}).get("agent", {}).get("*") or {}).get("p95_ms")
+    p95_label = f"{agent_p95:.1f}ms" if agent_p95 is not None else "—"
     st.markdown(f"""
     📊 **Métricas:** {metrics['total_events']} eventos | 
     🤖 **Agentes:** {metrics['agent_executions']} execuções | 
     ⚡ **Média:** {metrics['avg_response_time']:.1f}ms |
+    🐢 **p95:** {p95_label} |
     ❌ **Erros:** {metrics['errors']}
     """)
 
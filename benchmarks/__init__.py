@@ -0,0 +1,4 @@
+"""
+Benchmarks do pipeline de debate FlaFludeAgentes
+Mede o caminho completo (wrappers ADK, sessões, A2A, logging) contra um modelo stub
+"""
@@ -0,0 +1,91 @@
+"""
+Executa a suíte de benchmarks do pipeline de debate
+
+Uso:
+    uv run python -m benchmarks                       # suíte completa
+    uv run python -m benchmarks --quick               # rodada curta
+    uv run python -m benchmarks --only session_create full_debate_wall_clock
+    uv run python -m benchmarks --output bench.json --compare baseline.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import warnings
+from pathlib import Path
+
+from .harness import DEFAULT_SEED, build_report, compare_reports, write_report
+
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks do pipeline FlaFludeAgentes (LLM stub)")
+    parser.add_argument("--quick", action="store_true", help="Menos iterações (smoke test)")
+    parser.add_argument("--only", nargs="+", metavar="NAME", help="Executa apenas os benchmarks indicados")
+    parser.add_argument("--output", type=Path, default=REPO_ROOT / "bench_output.json",
+                        help="Arquivo do relatório JSON")
+    parser.add_argument("--compare", type=Path, help="Relatório anterior para comparar (p50)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Semente aleatória")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    mode = "quick" if args.quick else "full"
+    output = args.output.resolve()
+    baseline = args.compare.resolve() if args.compare else None
+
+    # Isola logs e arquivos gerados num diretório temporário
+    sys.path.insert(0, str(REPO_ROOT))
+    workdir = tempfile.mkdtemp(prefix="flaflu_bench_")
+    os.chdir(workdir)
+
+    warnings.filterwarnings("ignore")
+    logging.getLogger("google_adk").setLevel(logging.ERROR)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    from .bench_pipeline import BENCHMARKS, ITERATIONS, build_stub_agents
+
+    selected = args.only or list(BENCHMARKS)
+    unknown = [name for name in selected if name not in BENCHMARKS]
+    if unknown:
+        print(f"❌ Benchmarks desconhecidos: {', '.join(unknown)}")
+        print(f"   Disponíveis: {', '.join(BENCHMARKS)}")
+        return 2
+
+    print(f"🏁 Benchmarks FlaFludeAgentes ({mode}) | logs em {workdir}")
+    print("=" * 60)
+
+    agents = build_stub_agents()
+    config = ITERATIONS[mode]
+    results = []
+    for name in selected:
+        produced = BENCHMARKS[name](config, agents)
+        for result in produced if isinstance(produced, list) else [produced]:
+            summary = result.summary()
+            print(f"⏱️  {result.name:<26} p50={summary['p50']:>10.4f}ms  "
+                  f"p95={summary['p95']:>10.4f}ms  mean={summary['mean']:>10.4f}ms")
+            results.append(result)
+
+    report = build_report(results, seed=args.seed, mode=mode)
+    write_report(report, output)
+    print("=" * 60)
+    print(f"📄 Relatório salvo em {output}")
+
+    if baseline:
+        previous = json.loads(baseline.read_text(encoding="utf-8"))
+        print(f"\n📊 Comparação com {baseline} (p50):")
+        for row in compare_reports(previous, report):
+            delta = f"{row['delta_pct']:+.2f}%" if row["delta_pct"] is not None else "novo"
+            print(f"  • {row['name']:<26} {row['baseline']} → {row['current']} ({delta})")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,951 @@
+"""
+Benchmarks ponta a ponta do pipeline de debate
+Cada função recebe a configuração de iterações e retorna um BenchmarkResult
+"""
+
+import asyncio
+import contextlib
+import io
+import itertools
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import requests
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from a2a_orchestrator_old import A2AOrchestrator
+from flamengo_agent.agent import create_flamengo_agent
+from fluminense_agent.agent import create_fluminense_agent
+from researcher_agent.agent import create_researcher_agent, create_a2a_server as create_researcher_server
+from supervisor_agent.agent import create_supervisor_agent
+from utils.admission import AdmissionController, install_admission_control
+from utils.enhanced_logger import enhanced_logger, CompactLogEntry, EnhancedLogger, LogEntry, LogLevel, LogCategory
+from utils.log_export import iter_file_records
+from utils.log_policy import LogPolicy
+from utils.log_shipping import SOCKET_ENV
+from utils.prefork import WORKERS_ENV, memory_usage
+from utils.rate_limiter import PRIORITY_LOW, TokenBucketLimiter, set_llm_limiter
+from utils.replica_set import PORT_ENV
+from utils.resilience import ResiliencePolicy
+from utils.tool_instrumentation import instrument_tool
+
+from .harness import BenchmarkResult, measure, measure_batched
+from .stub_model import install_stub_model
+
+
+RESEARCH_PATTERN = re.compile(r'\[PESQUISA\](.*?)\[/PESQUISA\]', re.IGNORECASE)
+
+# Iterações por modo de execução
+ITERATIONS = {
+    "full": {"runs": 50, "fast": 500, "batches": 30, "batch_size": 1000, "debates": 5, "turns": 6},
+    "quick": {"runs": 10, "fast": 100, "batches": 5, "batch_size": 200, "debates": 2, "turns": 4},
+}
+
+
+UNLIMITED_QUOTA = TokenBucketLimiter(rpm=1e9, tpm=1e12, prioritize=False)
+
+
+def build_stub_agents() -> Dict[str, object]:
+    """Cria os quatro wrappers ADK com o modelo stub instalado"""
+    agents = {
+        "supervisor": create_supervisor_agent(),
+        "flamengo": create_flamengo_agent(),
+        "fluminense": create_fluminense_agent(),
+        "researcher": create_researcher_agent(),
+    }
+    for key, wrapper in agents.items():
+        install_stub_model(wrapper, key)
+    # O stub não tem cota de provedor: o limitador compartilhado não pode ditar o ritmo dos benchmarks
+    set_llm_limiter(UNLIMITED_QUOTA)
+    return agents
+
+
+@contextlib.contextmanager
+def serve_app(app, threaded: bool = True):
+    """Sobe uma aplicação Flask em porta efêmera numa thread de fundo"""
+    server = make_server("127.0.0.1", 0, app, threaded=threaded)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+
+
+def synthetic_debate_history(turns: int) -> str:
+    """Histórico de debate determinístico no formato usado por app.py"""
+    flamengo = "Torcedor Flamengo: Os dados comprovam porque temos 8 títulos no Brasileirão, portanto os números e fatos são nossos."
+    fluminense = "Torcedor Fluminense: A estatística mostra tradição já que somos campeões, mas os fatos e títulos recentes comprovam classe."
+    lines = []
+    for turn in range(turns):
+        lines.append(flamengo if turn % 2 == 0 else fluminense)
+    return "\n\n".join(lines)
+
+
+def run_research_fanout(researcher, message: str) -> List[str]:
+    """Processa as tags [PESQUISA] de uma mensagem como app.py faz"""
+    return [
+        researcher.run(f"Pesquise dados sobre: {query.strip()}")
+        for query in RESEARCH_PATTERN.findall(message)
+    ]
+
+
+def run_full_debate(agents: Dict[str, object], turns: int) -> int:
+    """Simula um debate completo: abertura, turnos, pesquisas e veredito"""
+    messages = [("Supervisor", agents["supervisor"].run(
+        "Inicie um debate de 5 minutos entre torcedores do Flamengo e Fluminense."
+    ))]
+
+    current_turn = "Flamengo"
+    for _ in range(turns):
+        agent = agents[current_turn.lower()]
+        if len(messages) <= 2:
+            prompt = f"Apresente seus argumentos iniciais defendendo o {current_turn}."
+        else:
+            opponent = "fluminense" if current_turn == "Flamengo" else "flamengo"
+            last_opponent = next(
+                (text for name, text in reversed(messages) if opponent in name.lower()), ""
+            )
+            prompt = f"Rebata este argumento do oponente: {last_opponent}"
+
+        argument = agent.run(prompt)
+        messages.append((f"Torcedor {current_turn}", argument))
+        for research in run_research_fanout(agents["researcher"], argument):
+            messages.append(("Pesquisador", research))
+
+        current_turn = "Fluminense" if current_turn == "Flamengo" else "Flamengo"
+
+    history = "\n\n".join(f"{name}: {text}" for name, text in messages)
+    messages.append(("Supervisor", agents["supervisor"].run(
+        f"Analise este debate completo e determine o vencedor: {history}"
+    )))
+    return len(messages)
+
+
+# --- Benchmarks individuais ---
+
+def bench_wrapper_run(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Overhead do wrapper.run (sessão, logging, asyncio.run e Runner) com LLM stub"""
+    flamengo = agents["flamengo"]
+    samples = measure(lambda: flamengo.run("Apresente seus argumentos iniciais defendendo o Flamengo."),
+                      iterations=config["runs"], warmup=2)
+    return BenchmarkResult("wrapper_run_overhead", bench_wrapper_run.__doc__, config["runs"], samples)
+
+
+def bench_session_create(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Criação de sessão no InMemorySessionService (dentro de um único event loop)"""
+    session_service = agents["flamengo"].session_service
+    iterations = config["fast"]
+
+    async def create_sessions() -> List[float]:
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            await session_service.create_session(
+                app_name="flamengo_agent",
+                user_id=f"user_{uuid.uuid4().hex[:8]}",
+                session_id=f"session_{uuid.uuid4().hex[:8]}"
+            )
+            samples.append((time.perf_counter() - start) * 1000)
+        return samples
+
+    samples = asyncio.run(create_sessions())
+    return BenchmarkResult("session_create", bench_session_create.__doc__, iterations, samples)
+
+
+def bench_a2a_http_roundtrip(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Round trips HTTP reais no /run do pesquisador: direto e via A2AOrchestrator"""
+    app = create_researcher_server(agents["researcher"])
+    results = []
+
+    with serve_app(app) as base_url:
+        run_url = f"{base_url}/run"
+        payload = {"prompt": "pesquisa títulos brasileiros flamengo"}
+        samples = measure(lambda: requests.post(run_url, json=payload, timeout=10),
+                          iterations=config["runs"] * 2, warmup=3)
+        results.append(BenchmarkResult(
+            "a2a_http_roundtrip", "POST /run do pesquisador via requests (uma conexão por chamada)",
+            config["runs"] * 2, samples
+        ))
+
+        host, port = base_url.rsplit(":", 1)
+        orchestrator = A2AOrchestrator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.register_agent("researcher", host, int(port))
+
+            def send():
+                asyncio.run(orchestrator.send_a2a_message(
+                    "flamengo", "researcher", "conduct_research",
+                    {"query": "pesquisa títulos brasileiros flamengo"}
+                ))
+
+            samples = measure(send, iterations=config["runs"] * 2, warmup=3)
+        results.append(BenchmarkResult(
+            "a2a_orchestrator_send", "A2AOrchestrator.send_a2a_message até o /run do pesquisador",
+            config["runs"] * 2, samples
+        ))
+
+    return results
+
+
+def stub_agent_app(service_ms: float, capacity: int = 0, error_rate: float = 0.0, slow_rate: float = 0.0,
+                   slow_ms: float = 0.0, seed: int = 7) -> Flask:
+    """
+    Agente A2A mínimo: Agent Card e /run que ocupa o servidor por service_ms
+    capacity > 0 limita quantos /run avançam ao mesmo tempo (como a cota do provedor do LLM)
+    error_rate e slow_rate injetam falhas: fração de /run com HTTP 500 e fração que demora slow_ms
+    """
+    app = Flask("stub_agent")
+    hits = app.extensions["run_hits"] = itertools.count()
+    quota = threading.Semaphore(capacity) if capacity else contextlib.nullcontext()
+    faults = random.Random(seed)
+    faults_lock = threading.Lock()
+
+    @app.route("/.well-known/agent.json")
+    def agent_card():
+        return jsonify({"name": "stub_agent"})
+
+    @app.route("/run", methods=["POST"])
+    def run():
+        next(hits)
+        with faults_lock:
+            roll = faults.random()
+        if roll < error_rate:
+            return jsonify({"error": "falha injetada"}), 500
+        with quota:
+            time.sleep((slow_ms if roll < error_rate + slow_rate else service_ms) / 1000)
+        return jsonify({"response": "ok"})
+
+    return app
+
+
+def bench_replica_scaling(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Vazão do A2AOrchestrator com 1, 2 e 4 réplicas de um agente serial (20ms por /run, 8 clientes)"""
+    clients, service_ms = 8, 20.0
+    requests_per_burst = clients * 4
+    results = []
+    for replicas in (1, 2, 4):
+        with contextlib.ExitStack() as stack:
+            # Servidor sem threads: cada réplica atende uma requisição por vez, como um agente ocupado
+            urls = [stack.enter_context(serve_app(stub_agent_app(service_ms), threaded=False))
+                    for _ in range(replicas)]
+            # Consultas iguais: sem single-flight, para medir só o balanceamento
+            orchestrator = A2AOrchestrator(coalesce=False)
+            with contextlib.redirect_stdout(io.StringIO()):
+                orchestrator.register_replicas("researcher", urls)
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=clients))
+
+            def send(_):
+                return asyncio.run(orchestrator.send_a2a_message(
+                    "flamengo", "researcher", "conduct_research", {"query": "títulos"}
+                ))
+
+            def burst():
+                assert all(pool.map(send, range(requests_per_burst)))
+
+            samples = measure(burst, iterations=max(3, config["runs"] // 2), warmup=1)
+            served = [replica["requests"] for replica in orchestrator.replica_sets["researcher"].snapshot()]
+        results.append(BenchmarkResult(
+            f"replica_scaling_{replicas}", bench_replica_scaling.__doc__, len(samples), samples, extra={
+                "requests_per_burst": requests_per_burst,
+                "requests_per_sec": round(requests_per_burst * 1000 / sorted(samples)[len(samples) // 2], 1),
+                "requests_per_replica": served,
+            }
+        ))
+    return results
+
+
+def bench_a2a_coalescing(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """8 debates pedem a mesma pesquisa ao mesmo tempo (agente serial, 20ms por /run): com e sem single-flight"""
+    clients = 8
+    results = []
+    for name, coalesce in (("a2a_coalescing_off", False), ("a2a_coalescing_on", True)):
+        app = stub_agent_app(20.0)
+        with serve_app(app, threaded=False) as url, ThreadPoolExecutor(max_workers=clients) as pool:
+            orchestrator = A2AOrchestrator(coalesce=coalesce)
+            with contextlib.redirect_stdout(io.StringIO()):
+                orchestrator.register_replicas("researcher", [url])
+            barrier = threading.Barrier(clients)
+
+            def send(_):
+                barrier.wait()
+                return asyncio.run(orchestrator.send_a2a_message(
+                    "flamengo", "researcher", "conduct_research", {"query": "títulos brasileiros"}
+                ))
+
+            def burst():
+                assert all(pool.map(send, range(clients)))
+
+            iterations = max(3, config["runs"] // 2)
+            with contextlib.redirect_stdout(io.StringIO()):
+                samples = measure(burst, iterations=iterations, warmup=1)
+            flight = orchestrator.run_flight.snapshot()
+            served = next(app.extensions["run_hits"])
+        results.append(BenchmarkResult(name, bench_a2a_coalescing.__doc__, iterations, samples, extra={
+            "calls_per_burst": clients,
+            "agent_requests_per_burst": round(served / (iterations + 1), 2),
+            "collapsed": flight["collapsed"],
+        }))
+    return results
+
+
+def bench_a2a_fault_injection(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """
+    Chamadas A2A a 2 réplicas (10ms por /run) com falhas injetadas numa delas (20% HTTP 500, 10% lentas de 300ms)
+    e a um agente fora do ar (503 após 50ms): uma tentativa só vs novas tentativas, hedge e circuit breaker
+    """
+    calls = config["runs"] * 12
+    single_attempt = dict(max_attempts=1, hedge=False, breaker_failures=10 ** 9)
+    resilient = dict(backoff_base=0.01, hedge_min_samples=10, breaker_reset=30.0)
+    results = []
+    for name, faulty, policy in (
+        ("a2a_faults_off", True, single_attempt),
+        ("a2a_faults_on", True, resilient),
+        ("a2a_agent_down_off", False, dict(single_attempt, max_attempts=3, backoff_base=0.01)),
+        ("a2a_agent_down_on", False, resilient),
+    ):
+        if faulty:
+            apps = [stub_agent_app(10.0), stub_agent_app(10.0, error_rate=0.2, slow_rate=0.1, slow_ms=300.0)]
+        else:
+            apps = [_unavailable_app(50.0) for _ in range(2)]
+        with contextlib.ExitStack() as stack:
+            urls = [stack.enter_context(serve_app(app)) for app in apps]
+            orchestrator = A2AOrchestrator(coalesce=False, resilience=ResiliencePolicy(**policy))
+            with contextlib.redirect_stdout(io.StringIO()):
+                orchestrator.register_replicas("researcher", urls)
+            answers = []
+
+            def send():
+                answers.append(asyncio.run(orchestrator.send_a2a_message(
+                    name, "researcher", "conduct_research", {"query": "títulos"}
+                )))
+
+            with contextlib.redirect_stdout(io.StringIO()):
+                samples = measure(send, iterations=calls, warmup=0)
+            stats = orchestrator.resilience.snapshot()
+        results.append(BenchmarkResult(name, bench_a2a_fault_injection.__doc__, calls, samples, extra={
+            "error_rate": round(answers.count(None) / len(answers), 3),
+            "retries": stats["retries"],
+            "hedges": stats["hedges"],
+            "hedge_wins": stats["hedge_wins"],
+            "circuit_rejected": sum(breaker["rejected"] for breaker in stats["breakers"].values()),
+        }))
+    return results
+
+
+def _unavailable_app(delay_ms: float) -> Flask:
+    """Agente fora do ar atrás de um proxy: Agent Card ok, /run responde 503 após delay_ms"""
+    app = Flask("unavailable_agent")
+
+    @app.route("/run", methods=["POST"])
+    def run():
+        time.sleep(delay_ms / 1000)
+        return jsonify({"error": "indisponível"}), 503
+
+    return app
+
+
+def bench_admission_control(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Rajada de 24 /run simultâneos num agente com cota de 2 (20ms cada): sem limite vs admissão (2 vagas, fila 4)"""
+    clients = 24
+    results = []
+    for name, controller in (
+        ("admission_off", None),
+        ("admission_on", AdmissionController("stub", max_in_flight=2, max_queue=4, queue_timeout=1.0)),
+    ):
+        app = stub_agent_app(20.0, capacity=2)
+        if controller is not None:
+            install_admission_control(app, controller)
+        latencies, rejected_ms, statuses = [], [], []
+        with serve_app(app) as url, ThreadPoolExecutor(max_workers=clients) as pool:
+            barrier = threading.Barrier(clients)
+
+            def call(_):
+                barrier.wait()
+                start = time.perf_counter()
+                status = requests.post(f"{url}/run", json={"prompt": "títulos"}, timeout=30).status_code
+                return status, (time.perf_counter() - start) * 1000
+
+            for _ in range(max(3, config["runs"] // 2)):
+                for status, elapsed_ms in pool.map(call, range(clients)):
+                    statuses.append(status)
+                    (latencies if status == 200 else rejected_ms).append(elapsed_ms)
+        results.append(BenchmarkResult(name, bench_admission_control.__doc__, len(latencies), latencies, extra={
+            "requests": len(statuses),
+            "ok": statuses.count(200),
+            "rejected_429": statuses.count(429),
+            "rejected_p50_ms": round(sorted(rejected_ms)[len(rejected_ms) // 2], 2) if rejected_ms else None,
+        }))
+    return results
+
+
+def bench_llm_rate_limit(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Veredito do supervisor com a cota (600 RPM) esgotada por pesquisas e 6 delas ainda disputando: sem e com prioridade"""
+    background = 6
+    results = []
+    for name, prioritize in (("llm_rate_limit_fifo", False), ("llm_rate_limit_priority", True)):
+        limiter = TokenBucketLimiter(rpm=600, tpm=1e9, prioritize=prioritize, timeout=10.0)
+        set_llm_limiter(limiter)
+        # Rajada anterior de pesquisas consome tudo o que a classe baixa pode usar
+        while not limiter.try_acquire(1, PRIORITY_LOW):
+            pass
+        stop = threading.Event()
+        research_calls = itertools.count()
+
+        def research_loop():
+            while not stop.is_set():
+                agents["researcher"].run("Pesquise títulos brasileiros de Flamengo e Fluminense")
+                next(research_calls)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=research_loop, daemon=True) for _ in range(background)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        iterations = max(3, config["runs"] // 2)
+        samples = measure(lambda: agents["supervisor"].run("Declare o vencedor do debate"),
+                          iterations=iterations, warmup=0)
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        results.append(BenchmarkResult(name, bench_llm_rate_limit.__doc__, iterations, samples, extra={
+            "research_calls_per_s": round(next(research_calls) / elapsed, 1),
+            "quota_waits": limiter.stats["waited"],
+            "quota_timeouts": limiter.stats["timeouts"],
+        }))
+    set_llm_limiter(UNLIMITED_QUOTA)
+    return results
+
+
+def bench_research_fanout(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Fan-out de 3 solicitações [PESQUISA] atendidas pelo pesquisador (sequencial, como app.py)"""
+    message = " ".join(f"[PESQUISA]consulta {i} títulos Fla-Flu[/PESQUISA]" for i in range(3))
+    researcher = agents["researcher"]
+    samples = measure(lambda: run_research_fanout(researcher, message),
+                      iterations=config["runs"], warmup=1)
+    return BenchmarkResult("research_fanout", bench_research_fanout.__doc__, config["runs"], samples,
+                           extra={"queries_per_fanout": 3})
+
+
+RESEARCH_TURN_QUERIES = [
+    "pesquisa títulos brasileirão flamengo",
+    "pesquisa libertadores fluminense 2023",
+    "buscar fundação dos clubes",
+    "pesquisa torcida e orçamentos",
+    "estatisticas flamengo",
+    "estatisticas fluminense",
+    "verificar: Flamengo tem 8 títulos brasileiros",
+    "verificar: Fluminense campeão da Libertadores 2023",
+]
+
+
+def bench_research_batch(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """
+    Turno com 8 pesquisas de tool via A2A (/run por consulta vs um /run_batch) e 4 pesquisas
+    de LLM com 20ms por chamada ao modelo (researcher.run por consulta vs run_batch)
+    """
+    queries = RESEARCH_TURN_QUERIES
+    iterations = config["runs"] * 2
+    results = []
+    with serve_app(create_researcher_server(agents["researcher"])) as url:
+        orchestrator = A2AOrchestrator(coalesce=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.register_replicas("researcher", [url])
+
+            def one_by_one():
+                for query in queries:
+                    assert asyncio.run(orchestrator.send_a2a_message(
+                        "flamengo", "researcher", "conduct_research", {"query": query}))
+
+            def batched():
+                answer = asyncio.run(orchestrator.send_a2a_batch("flamengo", "researcher", "conduct_research", queries))
+                assert len(answer["responses"]) == len(queries)
+
+            for name, turn in (("research_turn_a2a_per_query", one_by_one), ("research_turn_a2a_batch", batched)):
+                samples = measure(turn, iterations=iterations, warmup=2)
+                results.append(BenchmarkResult(name, bench_research_batch.__doc__, iterations, samples, extra={
+                    "queries": len(queries),
+                    "per_query_ms": round(sorted(samples)[len(samples) // 2] / len(queries), 3),
+                }))
+
+    researcher = install_stub_model(create_researcher_agent(), "researcher", latency_s=0.02)
+    prompts = [f"Pesquise dados sobre: {query}" for query in ("títulos", "torcidas", "estádios", "ídolos")]
+    for name, turn in (
+        ("research_turn_llm_per_query", lambda: [researcher.run(prompt) for prompt in prompts]),
+        ("research_turn_llm_batch", lambda: researcher.run_batch(prompts)),
+    ):
+        samples = measure(turn, iterations=config["runs"], warmup=1)
+        results.append(BenchmarkResult(name, bench_research_batch.__doc__, config["runs"], samples, extra={
+            "queries": len(prompts),
+            "per_query_ms": round(sorted(samples)[len(samples) // 2] / len(prompts), 3),
+        }))
+    return results
+
+
+def bench_analyze_debate(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Pontuação do analyze_debate_tool sobre um histórico sintético de 40 turnos"""
+    analyze = agents["supervisor"].tools[1].func
+    history = synthetic_debate_history(40)
+    samples = measure(lambda: analyze(history), iterations=config["fast"], warmup=5)
+    return BenchmarkResult("analyze_debate_tool", bench_analyze_debate.__doc__, config["fast"], samples,
+                           extra={"history_chars": len(history)})
+
+
+def bench_tool_instrumentation(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Custo por chamada de uma tool trivial: função pura, instrument_tool desligado e ligado"""
+    def get_status(team: str) -> str:
+        return f"{team}: ok"
+
+    logger = EnhancedLogger(log_dir=tempfile.mkdtemp(prefix="flaflu_bench_logs_"))
+    variants = [
+        ("tool_call_raw", get_status),
+        ("tool_call_instrumentation_off", instrument_tool(get_status, "benchmark", logger=logger, enabled=False)),
+        ("tool_call_instrumentation_on", instrument_tool(get_status, "benchmark", logger=logger, enabled=True)),
+    ]
+    results = []
+    for name, tool in variants:
+        samples = measure_batched(lambda: tool("flamengo"), batches=config["batches"], batch_size=config["batch_size"])
+        results.append(BenchmarkResult(name, bench_tool_instrumentation.__doc__, config["batches"], samples,
+                                       extra={"batch_size": config["batch_size"]}))
+    logger.shutdown()
+    return results
+
+
+def _log_turn(logger: EnhancedLogger, prompt: str):
+    """Sequência de logs de um wrapper.run (início, sessão, processamento ADK e resposta)"""
+    session_id = "session_bench"
+    correlation_id = logger.log_agent_start("flamengo", session_id, "user_bench", prompt)
+    if logger.is_enabled(LogLevel.DEBUG, LogCategory.SESSION):
+        logger.log(LogLevel.DEBUG, LogCategory.SESSION, "Criando sessão para torcedor Flamengo",
+                   agent_name="flamengo", session_id=session_id, user_id="user_bench",
+                   event_type="session_create", correlation_id=correlation_id)
+    if logger.is_enabled(LogLevel.DEBUG, LogCategory.AGENT):
+        logger.log(LogLevel.DEBUG, LogCategory.AGENT, f"Torcedor Flamengo processando: {prompt[:50]}...",
+                   agent_name="flamengo", session_id=session_id, event_type="adk_processing_start",
+                   details={"prompt_type": "fan_argument", "content_length": len(prompt)},
+                   correlation_id=correlation_id)
+    logger.log_agent_response("flamengo", session_id, "🔴 8 Brasileirões!", 12.5, correlation_id)
+
+
+AGENT_MODULES = ("supervisor_agent", "flamengo_agent", "fluminense_agent", "researcher_agent")
+
+# Servidor pronto para as rotas /run; a variante first_llm também monta o Runner (importa ADK e genai)
+COLD_START_SCRIPTS = {
+    "server": "from {module}.agent import create_a2a_server\ncreate_a2a_server()",
+    "first_llm": "from {module}.agent import create_a2a_server, create_{agent}_agent\n"
+                 "wrapper = create_{agent}_agent()\ncreate_a2a_server(wrapper)\nwrapper.runner",
+}
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _cold_start(script: str) -> float:
+    """Executa o script num interpretador novo com -X importtime; retorna o tempo total de import em ms"""
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", script], cwd=ROOT_DIR,
+                               capture_output=True, text=True, check=True)
+    # Linhas "import time: self | cumulative | módulo": a soma dos self é o total de imports
+    return sum(int(line.split("|")[0].split(":")[1]) for line in completed.stderr.splitlines()
+               if line.startswith("import time:") and line.split("|")[0].split(":")[1].strip().isdigit()) / 1000
+
+
+def bench_cold_start(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Partida a frio de cada servidor A2A (processo novo): até o app Flask pronto e até o primeiro uso do LLM"""
+    iterations = max(3, config["runs"] // 3)
+    results = []
+    for module in AGENT_MODULES:
+        agent = module.split("_")[0]
+        for variant, template in COLD_START_SCRIPTS.items():
+            script = template.format(module=module, agent=agent)
+            import_ms = []
+            samples = measure(lambda: import_ms.append(_cold_start(script)), iterations=iterations, warmup=1)
+            results.append(BenchmarkResult(f"cold_start_{agent}_{variant}", bench_cold_start.__doc__, iterations,
+                                           samples, extra={"import_ms": round(sorted(import_ms)[len(import_ms) // 2], 1)}))
+    return results
+
+
+# Linhas do relatório do PreforkServer (pai aquecido e cada worker pronto)
+PREFORK_WARM = re.compile(r"aquecido em ([\d.]+)s \(([\d.]+)MB no pai\)")
+PREFORK_WORKER = re.compile(r"Worker \d+ \(pid (\d+)\) pronto em ([\d.]+)ms — RSS ([\d.]+)MB")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def bench_prefork_workers(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Pesquisador em pré-fork com 4 workers: do fork ao worker pronto (o aquecimento do ADK fica no pai)"""
+    workers = 4
+    ready_ms, warm_ms, parent_mb, rss_mb, private_mb = [], [], [], [], []
+    for _ in range(max(2, config["runs"] // 5)):
+        port = _free_port()
+        env = {**os.environ, WORKERS_ENV: f"researcher={workers}", PORT_ENV: str(port), "PYTHONUNBUFFERED": "1"}
+        env.pop(SOCKET_ENV, None)
+        proc = subprocess.Popen([sys.executable, "-m", "researcher_agent.agent"], cwd=ROOT_DIR, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            pids = []
+            for line in proc.stdout:
+                warm = PREFORK_WARM.search(line)
+                if warm:
+                    warm_ms.append(float(warm[1]) * 1000)
+                    parent_mb.append(float(warm[2]))
+                worker = PREFORK_WORKER.search(line)
+                if worker:
+                    pids.append(int(worker[1]))
+                    ready_ms.append(float(worker[2]))
+                    if len(pids) == workers:
+                        break
+            # Memória privada de cada worker depois de atender requisições (páginas copiadas na escrita)
+            for _ in range(workers * 10):
+                requests.post(f"http://127.0.0.1:{port}/run", json={"prompt": "pesquisa títulos"}, timeout=10)
+            for pid in pids:
+                usage = memory_usage(pid)
+                rss_mb.append(usage.get("rss_mb", 0.0))
+                private_mb.append(usage.get("private_mb", 0.0))
+        finally:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    def median(values):
+        return round(sorted(values)[len(values) // 2], 1) if values else None
+
+    return BenchmarkResult("prefork_workers", bench_prefork_workers.__doc__, len(ready_ms), ready_ms, extra={
+        "workers": workers,
+        "parent_warm_ms": median(warm_ms),
+        "parent_rss_mb": median(parent_mb),
+        "worker_rss_mb": median(rss_mb),
+        "worker_private_mb_after_load": median(private_mb),
+    })
+
+
+def bench_logging_per_turn(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Custo de logging por turno do wrapper: tudo registrado, DEBUG desligado e eventos frequentes amostrados"""
+    prompt = "Apresente seus argumentos iniciais defendendo o Flamengo."
+    policies = [
+        ("logging_per_turn_all", LogPolicy()),
+        ("logging_per_turn_info", LogPolicy(level="INFO")),
+        ("logging_per_turn_sampled", LogPolicy(sampling={"session_create": "0.1", "adk_processing_start": "0.1"})),
+    ]
+    results = []
+    for name, policy in policies:
+        logger = EnhancedLogger(log_dir=tempfile.mkdtemp(prefix="flaflu_bench_logs_"), policy=policy)
+        samples = measure_batched(lambda: _log_turn(logger, prompt), batches=config["batches"],
+                                  batch_size=config["batch_size"] // 4)
+        logger.flush()
+        results.append(BenchmarkResult(name, bench_logging_per_turn.__doc__, config["batches"], samples, extra={
+            "batch_size": config["batch_size"] // 4,
+            "entries_per_turn": round(logger.metrics["total_events"] / ((config["batches"] + 1) * (config["batch_size"] // 4)), 2),
+            "policy": policy.describe(),
+        }))
+        logger.shutdown()
+
+    # wrapper.run real com o logger global em INFO (compare com wrapper_run_overhead)
+    flamengo = agents["flamengo"]
+    previous = enhanced_logger.policy
+    enhanced_logger.set_policy(LogPolicy(level="INFO"))
+    try:
+        samples = measure(lambda: flamengo.run(prompt), iterations=config["runs"], warmup=2)
+    finally:
+        enhanced_logger.set_policy(previous)
+    results.append(BenchmarkResult("wrapper_run_logging_info", bench_logging_per_turn.__doc__, config["runs"], samples))
+    return results
+
+
+def bench_logger_throughput(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Custo por chamada de enhanced_logger.log (entrada em memória + escrita em arquivo)"""
+    def log_once():
+        enhanced_logger.log(
+            LogLevel.INFO,
+            LogCategory.PERFORMANCE,
+            "Evento de benchmark",
+            agent_name="benchmark",
+            event_type="bench_log",
+            details={"payload": "x" * 32}
+        )
+
+    samples = measure_batched(log_once, batches=config["batches"], batch_size=config["batch_size"])
+    return BenchmarkResult("logger_log_throughput", bench_logger_throughput.__doc__, config["batches"],
+                           samples, extra={"batch_size": config["batch_size"]})
+
+
+def bench_logger_latency(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Latência individual de enhanced_logger.log no thread chamador (I/O fica no escritor em lote)"""
+    def log_once():
+        enhanced_logger.log(
+            LogLevel.INFO,
+            LogCategory.PERFORMANCE,
+            "Evento de latência",
+            agent_name="benchmark",
+            event_type="bench_latency",
+            details={"payload": "x" * 32}
+        )
+
+    iterations = config["batch_size"] * 5
+    samples = measure(log_once, iterations=iterations, warmup=50)
+    flush_start = time.perf_counter()
+    enhanced_logger.flush()
+    flush_ms = (time.perf_counter() - flush_start) * 1000
+
+    ordered = sorted(samples)
+    return BenchmarkResult("logger_log_latency", bench_logger_latency.__doc__, iterations, samples, extra={
+        "p50_us": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p99_us": round(ordered[int(len(ordered) * 0.99)] * 1000, 2),
+        "flush_ms": round(flush_ms, 3),
+    })
+
+
+_RUN_IDS: Dict[int, tuple] = {}
+
+
+def _sample_entry_fields(i: int) -> Dict[str, object]:
+    """Campos típicos de uma entrada de agente: cada execução gera 4 entradas com os mesmos IDs"""
+    run = i // 4
+    if run not in _RUN_IDS:
+        _RUN_IDS.clear()
+        _RUN_IDS[run] = (f"session_{run:08x}", f"user_{run:08x}", f"{run:08x}")
+    session_id, user_id, correlation_id = _RUN_IDS[run]
+    agent = ("supervisor", "flamengo", "fluminense", "researcher")[run % 4]
+    return {
+        "level": LogLevel.AGENT_ACTION.value,
+        "category": LogCategory.AGENT.value,
+        "agent_name": agent,
+        "session_id": session_id,
+        "user_id": user_id,
+        "event_type": "agent_response",
+        "message": f"Agent {agent} completou execução",
+        "details": {"response_length": 180 + i % 50, "response_preview": f"🔴 Somos maiores: {i % 8} Brasileirões"},
+        "duration_ms": 12.5,
+        "correlation_id": correlation_id,
+        "thread_id": "MainThread",
+    }
+
+
+def _bytes_per_entry(build, count: int) -> float:
+    """Memória alocada por entrada retida, medida com tracemalloc"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    retained = [build(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del retained
+    return (after - before) / count
+
+
+def bench_logger_memory(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Custo de construção e memória por entrada: LogEntry (dataclass) vs CompactLogEntry"""
+    count = config["batch_size"] * 10
+
+    def build_legacy(i):
+        fields = _sample_entry_fields(i)
+        return LogEntry(timestamp=f"2025-01-01T12:00:{i % 60:02d}.123456", **fields)
+
+    def build_compact(i):
+        entry = CompactLogEntry(ts=1735732800.0 + i, **_sample_entry_fields(i))
+        # Estado retido após a passagem pelo escritor (detalhes já serializados)
+        entry.details_blob
+        return entry
+
+    legacy_bytes = _bytes_per_entry(build_legacy, count)
+    compact_bytes = _bytes_per_entry(build_compact, count)
+    samples = measure_batched(lambda: build_compact(7), batches=config["batches"], batch_size=config["batch_size"])
+    return BenchmarkResult("logger_memory_per_entry", bench_logger_memory.__doc__, config["batches"], samples, extra={
+        "entries": count,
+        "legacy_bytes_per_entry": round(legacy_bytes, 1),
+        "compact_bytes_per_entry": round(compact_bytes, 1),
+        "reduction_factor": round(legacy_bytes / compact_bytes, 2) if compact_bytes else None,
+    })
+
+
+def _filled_logger(count: int, capacity: int = 0) -> EnhancedLogger:
+    """Logger isolado com o buffer cheio de entradas típicas (1 erro a cada 100)"""
+    logger = EnhancedLogger(log_dir=tempfile.mkdtemp(prefix="flaflu_bench_logs_"), max_entries=capacity or count)
+    for i in range(count + count // 10):
+        fields = _sample_entry_fields(i)
+        if i % 100 == 0:
+            level, category = LogLevel.ERROR, LogCategory.ERROR_HANDLING
+        else:
+            level, category = LogLevel.AGENT_ACTION, LogCategory.AGENT
+        logger.log(level, category, fields["message"], agent_name=fields["agent_name"],
+                   session_id=fields["session_id"], user_id=fields["user_id"],
+                   event_type=fields["event_type"], details=fields["details"],
+                   duration_ms=fields["duration_ms"], correlation_id=fields["correlation_id"])
+    return logger
+
+
+def bench_logger_queries(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Consultas do dashboard sobre um buffer cheio (get_recent_logs, get_agent_flow e search_logs)"""
+    count = config["batch_size"] * 100
+    logger = _filled_logger(count)
+    newest = logger.entries.get(logger.entries.next_seq - 1)
+
+    def recent_errors():
+        logger.get_recent_logs(limit=50, agent_name="flamengo", level=LogLevel.ERROR)
+
+    def agent_flow():
+        logger.get_agent_flow(newest.session_id)
+
+    def text_search():
+        logger.search_logs("brasileiroes somos* agent:flamengo level:error", limit=50)
+
+    iterations = config["fast"]
+    results = [
+        BenchmarkResult("logger_query_filtered", "get_recent_logs(limit=50, agent_name, level) com índice secundário",
+                        iterations, measure(recent_errors, iterations=iterations), extra={"entries": count}),
+        BenchmarkResult("logger_query_flow", "get_agent_flow(session_id) com índice secundário",
+                        iterations, measure(agent_flow, iterations=iterations), extra={"entries": count}),
+        BenchmarkResult("logger_search", "search_logs com termos, prefixo e filtros de campo (índice invertido)",
+                        iterations, measure(text_search, iterations=iterations),
+                        extra={"entries": count, "vocabulary": len(logger.text_index)}),
+    ]
+    logger.shutdown()
+    return results
+
+
+def _peak_bytes(fn) -> int:
+    """Pico de memória alocada durante fn, medido com tracemalloc"""
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench_logger_export(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Exportação do buffer inteiro: export_logs materializado vs export_logs_stream (NDJSON)"""
+    count = config["batch_size"] * 20
+    logger = _filled_logger(count)
+
+    def drain_stream():
+        for _ in logger.export_logs_stream("ndjson", source="memory"):
+            pass
+
+    materialized_peak = _peak_bytes(lambda: logger.export_logs("json"))
+    stream_peak = _peak_bytes(drain_stream)
+    samples = measure(drain_stream, iterations=max(3, config["debates"]), warmup=1)
+    logger.shutdown()
+    return BenchmarkResult("logger_export_stream", bench_logger_export.__doc__, len(samples), samples, extra={
+        "entries": count,
+        "materialized_peak_kb": round(materialized_peak / 1024, 1),
+        "stream_peak_kb": round(stream_peak / 1024, 1),
+    })
+
+
+def bench_logger_history(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Consulta histórica de uma janela estreita: segmentos binários (mmap + índice esparso) vs arquivos de texto"""
+    count = config["batch_size"] * 50
+    logger = _filled_logger(count, capacity=1000)
+    logger.flush()
+
+    # Janela de ~200 entradas no meio do histórico (fora do buffer em memória)
+    history = list(logger.segment_reader.iter_range(0, float("inf")))
+    start_ts, end_ts = history[count // 2][0], history[count // 2 + 200][0]
+    del history
+
+    def from_segments():
+        return sum(1 for _ in logger.iter_history(start_ts, end_ts))
+
+    def from_text_files():
+        return sum(1 for _ in iter_file_records(logger.log_dir, start_ts, end_ts))
+
+    iterations = max(5, config["debates"] * 2)
+    results = [
+        BenchmarkResult("logger_history_segments", "Janela histórica via segmentos binários", iterations,
+                        measure(from_segments, iterations=iterations, warmup=1),
+                        extra={"entries": count, "window": from_segments(), "segments": logger.segments.stats["segments"]}),
+        BenchmarkResult("logger_history_text_files", "Janela histórica via parsing dos arquivos .log", iterations,
+                        measure(from_text_files, iterations=iterations, warmup=1),
+                        extra={"entries": count, "window": from_text_files()}),
+    ]
+    logger.shutdown()
+    return results
+
+
+def bench_log_frame_refresh(config: Dict[str, int], agents: Dict[str, object]) -> List[BenchmarkResult]:
+    """Rerun do dashboard com 10 logs novos: DataFrame reconstruído vs LogFrameCache incremental"""
+    import pandas as pd
+    from utils.log_frame import LogFrameCache
+
+    count = config["batch_size"] * 50
+    logger = _filled_logger(count)
+    cache = LogFrameCache(logger)
+    cache.refresh()
+    counter = iter(range(10 ** 9))
+
+    def log_new_rows():
+        for _ in range(10):
+            i = next(counter)
+            logger.log(LogLevel.INFO, LogCategory.AGENT, f"novo {i}", agent_name="flamengo", duration_ms=float(i % 50))
+
+    def rebuild():
+        log_new_rows()
+        df = pd.DataFrame([entry.to_dict() for entry in logger.entries])
+        df["timestamp"] = pd.to_datetime(df["timestamp"])
+        df = df.sort_values("timestamp")
+        df.groupby("agent_name")["duration_ms"].agg(["count", "mean", "max", "min"])
+
+    def incremental():
+        log_new_rows()
+        cache.refresh()
+        cache.recent(limit=100)
+        cache.summary()
+
+    iterations = max(5, config["debates"] * 2)
+    results = [
+        BenchmarkResult("log_frame_rebuild", "pd.DataFrame + to_datetime + sort de toda a janela a cada rerun",
+                        iterations, measure(rebuild, iterations=iterations, warmup=1), extra={"entries": count}),
+        BenchmarkResult("log_frame_incremental", "LogFrameCache.refresh + recent + summary a cada rerun",
+                        iterations * 4, measure(incremental, iterations=iterations * 4, warmup=2), extra={"entries": count}),
+    ]
+    logger.shutdown()
+    return results
+
+
+def bench_full_debate(config: Dict[str, int], agents: Dict[str, object]) -> BenchmarkResult:
+    """Tempo de parede de um debate completo com LLM stub"""
+    turns = config["turns"]
+    samples = measure(lambda: run_full_debate(agents, turns), iterations=config["debates"], warmup=1)
+    return BenchmarkResult("full_debate_wall_clock", bench_full_debate.__doc__, config["debates"], samples,
+                           extra={"turns": turns})
+
+
+BENCHMARKS: Dict[str, Callable] = {
+    "wrapper_run_overhead": bench_wrapper_run,
+    "session_create": bench_session_create,
+    "a2a_http_roundtrip": bench_a2a_http_roundtrip,
+    "replica_scaling": bench_replica_scaling,
+    "a2a_coalescing": bench_a2a_coalescing,
+    "admission_control": bench_admission_control,
+    "a2a_fault_injection": bench_a2a_fault_injection,
+    "llm_rate_limit": bench_llm_rate_limit,
+    "research_fanout": bench_research_fanout,
+    "research_batch": bench_research_batch,
+    "analyze_debate_tool": bench_analyze_debate,
+    "tool_instrumentation": bench_tool_instrumentation,
+    "cold_start": bench_cold_start,
+    "prefork_workers": bench_prefork_workers,
+    "logger_log_throughput": bench_logger_throughput,
+    "logger_log_latency": bench_logger_latency,
+    "logging_per_turn": bench_logging_per_turn,
+    "logger_memory_per_entry": bench_logger_memory,
+    "logger_queries": bench_logger_queries,
+    "logger_export_stream": bench_logger_export,
+    "logger_history": bench_logger_history,
+    "log_frame_refresh": bench_log_frame_refresh,
+    "full_debate_wall_clock": bench_full_debate,
+}
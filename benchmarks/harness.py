@@ -0,0 +1,154 @@
+"""
+Infraestrutura de medição dos benchmarks
+Cronometragem, estatísticas e relatório JSON comparável entre commits
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+
+REPORT_SCHEMA_VERSION = 1
+DEFAULT_SEED = 1895
+
+
+@dataclass
+class BenchmarkResult:
+    """Resultado agregado de um benchmark (tempos em milissegundos)"""
+    name: str
+    description: str
+    iterations: int
+    samples_ms: List[float]
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        """Resumo estatístico arredondado para um diff estável"""
+        samples = sorted(self.samples_ms)
+        mean = statistics.fmean(samples)
+        summary = {
+            "description": self.description,
+            "iterations": self.iterations,
+            "unit": "ms",
+            "mean": round(mean, 4),
+            "p50": round(percentile(samples, 50), 4),
+            "p95": round(percentile(samples, 95), 4),
+            "p99": round(percentile(samples, 99), 4),
+            "min": round(samples[0], 4),
+            "max": round(samples[-1], 4),
+            "stdev": round(statistics.pstdev(samples), 4),
+            "ops_per_sec": round(1000.0 / mean, 2) if mean > 0 else None,
+        }
+        if self.extra:
+            summary["extra"] = self.extra
+        return summary
+
+
+def percentile(sorted_samples: List[float], pct: float) -> float:
+    """Percentil com interpolação linear sobre amostras já ordenadas"""
+    if not sorted_samples:
+        return 0.0
+    if len(sorted_samples) == 1:
+        return sorted_samples[0]
+    rank = (pct / 100) * (len(sorted_samples) - 1)
+    low = int(rank)
+    high = min(low + 1, len(sorted_samples) - 1)
+    return sorted_samples[low] + (sorted_samples[high] - sorted_samples[low]) * (rank - low)
+
+
+def measure(fn: Callable[[], Any], iterations: int, warmup: int = 1,
+            seed: int = DEFAULT_SEED) -> List[float]:
+    """Executa fn repetidamente e retorna a duração de cada chamada em ms"""
+    random.seed(seed)
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def measure_batched(fn: Callable[[], Any], batches: int, batch_size: int,
+                    warmup: int = 1, seed: int = DEFAULT_SEED) -> List[float]:
+    """Mede lotes de chamadas rápidas e retorna o tempo médio por chamada em ms"""
+    random.seed(seed)
+    for _ in range(warmup * batch_size):
+        fn()
+
+    samples = []
+    for _ in range(batches):
+        start = time.perf_counter()
+        for _ in range(batch_size):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / batch_size)
+    return samples
+
+
+def environment_info() -> Dict[str, Any]:
+    """Metadados do ambiente para contextualizar o relatório"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent.parent,
+            capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        commit = None
+
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": commit,
+    }
+
+
+def build_report(results: List[BenchmarkResult], seed: int, mode: str) -> Dict[str, Any]:
+    """Monta o relatório JSON com chaves estáveis"""
+    return {
+        "schema_version": REPORT_SCHEMA_VERSION,
+        "suite": "flaflu-debate-pipeline",
+        "mode": mode,
+        "seed": seed,
+        "environment": environment_info(),
+        "results": {result.name: result.summary() for result in results},
+    }
+
+
+def write_report(report: Dict[str, Any], output: Path):
+    """Grava relatório ordenado e indentado (diff amigável)"""
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, sort_keys=True, ensure_ascii=False) + "\n",
+                      encoding="utf-8")
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    metric: str = "p50") -> List[Dict[str, Any]]:
+    """Compara dois relatórios e retorna a variação percentual por benchmark"""
+    rows = []
+    base_results = baseline.get("results", {})
+    for name, result in sorted(current.get("results", {}).items()):
+        base = base_results.get(name)
+        old_value = base.get(metric) if base else None
+        new_value = result.get(metric)
+        delta_pct: Optional[float] = None
+        if old_value and new_value is not None:
+            delta_pct = round((new_value - old_value) / old_value * 100, 2)
+        rows.append({
+            "name": name,
+            "metric": metric,
+            "baseline": old_value,
+            "current": new_value,
+            "delta_pct": delta_pct,
+        })
+    return rows
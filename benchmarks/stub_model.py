@@ -0,0 +1,73 @@
+"""
+Modelo LLM stub para benchmarks
+Substitui o Gemini por respostas fixas e determinísticas, sem rede
+"""
+
+import asyncio
+from typing import AsyncGenerator, Dict
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from utils.prompt_batch import MARKER_PATTERN
+
+
+# Respostas canônicas por agente (os torcedores sempre pedem uma pesquisa)
+STUB_RESPONSES: Dict[str, str] = {
+    "supervisor": (
+        "⚖️ **DEBATE OFICIAL INICIADO** Critérios: argumentos, dados, retórica e lógica. "
+        "FLAMENGO inicia o debate!"
+    ),
+    "flamengo": (
+        "🔴 Somos maiores porque os números comprovam: 8 Brasileirões, 3 Libertadores e "
+        "a maior torcida do Brasil. Os fatos são dados verificáveis, portanto somos superiores. "
+        "[PESQUISA]títulos brasileiros Flamengo[/PESQUISA]"
+    ),
+    "fluminense": (
+        "🟢 Tradição centenária já que fomos fundados em 1902 e somos campeões da Libertadores 2023. "
+        "Os títulos recentes comprovam nossa classe, portanto a qualidade supera a quantidade. "
+        "[PESQUISA]Libertadores 2023 Fluminense[/PESQUISA]"
+    ),
+    "researcher": (
+        "📊 **RELATÓRIO DE PESQUISA** Dados encontrados: Flamengo 8 títulos brasileiros, "
+        "Fluminense campeão da Libertadores 2023. Fontes: CBF, CONMEBOL."
+    ),
+}
+
+
+class StubLlm(BaseLlm):
+    """LLM falso compatível com o ADK que responde com texto fixo"""
+
+    model: str = "stub-model"
+    text: str = "Resposta stub"
+    latency_s: float = 0.0
+    # Uso informado ao ADK (usage_metadata), como o provedor real faz; 0 omite
+    total_tokens: int = 0
+    # Mensagem de erro: com valor, toda chamada falha (simula erro do provedor)
+    error: str = ""
+
+    async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncGenerator[LlmResponse, None]:
+        """Gera uma única resposta final, com latência simulada opcional"""
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.error:
+            raise RuntimeError(self.error)
+        # Lote de consultas ([R1], [R2], ...): uma resposta marcada por consulta, como o modelo instruído faria
+        prompt = "".join(part.text or "" for part in llm_request.contents[-1].parts) if llm_request.contents else ""
+        numbers = sorted({int(number) for number in MARKER_PATTERN.findall(prompt)})
+        text = "\n\n".join(f"[R{number}] {self.text}" for number in numbers) if len(numbers) > 1 else self.text
+        usage = None
+        if self.total_tokens:
+            usage = types.GenerateContentResponseUsageMetadata(total_token_count=self.total_tokens)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=text)]),
+            usage_metadata=usage
+        )
+
+
+def install_stub_model(wrapper, agent_key: str, latency_s: float = 0.0, total_tokens: int = 0):
+    """Troca o modelo do LlmAgent de um wrapper pelo stub correspondente"""
+    wrapper.agent.model = StubLlm(text=STUB_RESPONSES[agent_key], latency_s=latency_s,
+                                  total_tokens=total_tokens)
+    return wrapper
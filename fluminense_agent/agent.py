@@ -7,11 +7,6 @@ import os
 import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
 from dotenv import load_dotenv
 
 # Sistema de log aprimorado
@@ -19,11 +14,19 @@ from utils.enhanced_logger import (
     enhanced_logger, log_agent_start, log_agent_response, 
     log_tool_execution, log_error, LogLevel, LogCategory
 )
+from utils.a2a_server import instrument_a2a_app
+from utils.adk_runtime import LazyAgentWrapper, load_adk
+from utils.admission import AdmissionController, install_admission_control
+from utils.prefork import serve_prefork, worker_count
+from utils.rate_limiter import llm_rate_limit_callbacks
+from utils.replica_set import server_port
+from utils.tool_instrumentation import instrument_tool
+from utils.tracing import record_span, start_span, traced
 
 # Carrega variáveis do .env
 load_dotenv()
 
-def create_fluminense_agent() -> LlmAgent:
+def create_fluminense_agent() -> LazyAgentWrapper:
     """
     Cria o Agente Torcedor do Fluminense seguindo padrões Google ADK
     Especializado em argumentação elegante com tradição e classe
@@ -141,38 +144,45 @@ Somos ATUAIS CAMPEÕES - fato incontestável da supremacia tricolor!"""
     ✨ LEMBRE-SE: Somos TRADIÇÃO! Somos CLASSE! Somos ATUAIS CAMPEÕES!
     """
     
-    # Cria ferramentas usando FunctionTool do ADK
-    initial_argument_function = FunctionTool(create_initial_argument_tool)
-    counter_argument_function = FunctionTool(create_counter_argument_tool)
-    request_research_function = FunctionTool(request_research_tool)
+    description = "Torcedor orgulhoso do Fluminense especializado em argumentação elegante com tradição e classe"
     
-    # Cria o agente usando Google ADK LlmAgent
-    fluminense_llm_agent = LlmAgent(
-        name="fluminense_agent",
-        model="gemini-2.0-flash",
-        description="Torcedor orgulhoso do Fluminense especializado em argumentação elegante com tradição e classe",
-        instruction=fluminense_instruction,
-        tools=[initial_argument_function, counter_argument_function, request_research_function]
-    )
+    # Funções das tools instrumentadas (duração, tamanhos e exceções), usadas direto pelas rotas /run
+    tool_functions = [
+        instrument_tool(create_initial_argument_tool, "fluminense"),
+        instrument_tool(create_counter_argument_tool, "fluminense"),
+        instrument_tool(request_research_tool, "fluminense"),
+    ]
     
-    # Configura Runner para execução
-    session_service = InMemorySessionService()
-    runner = Runner(
-        agent=fluminense_llm_agent,
-        app_name="fluminense_agent",
-        session_service=session_service
-    )
+    def build_adk(adk):
+        """LlmAgent, Runner e sessões do ADK, montados no primeiro uso do LLM"""
+        # Cria ferramentas usando FunctionTool do ADK
+        initial_argument_function = adk.FunctionTool(tool_functions[0])
+        counter_argument_function = adk.FunctionTool(tool_functions[1])
+        request_research_function = adk.FunctionTool(tool_functions[2])
+        
+        # Cria o agente usando Google ADK LlmAgent
+        fluminense_llm_agent = adk.LlmAgent(
+            name="fluminense_agent",
+            model="gemini-2.0-flash",
+            description=description,
+            instruction=fluminense_instruction,
+            tools=[initial_argument_function, counter_argument_function, request_research_function],
+            **llm_rate_limit_callbacks("fluminense")
+        )
+        
+        # Configura Runner para execução
+        session_service = adk.InMemorySessionService()
+        runner = adk.Runner(
+            agent=fluminense_llm_agent,
+            app_name="fluminense_agent",
+            session_service=session_service
+        )
+        
+        return fluminense_llm_agent, runner, session_service
     
     # Cria classe wrapper para adicionar método run
-    class FluminenseWrapper:
-        def __init__(self, agent, runner, session_service):
-            self.agent = agent
-            self.runner = runner
-            self.session_service = session_service
-            self.name = agent.name
-            self.description = agent.description
-            self.tools = agent.tools
-        
+    class FluminenseWrapper(LazyAgentWrapper):
+        @traced("fluminense.run", service="fluminense")
         def run(self, prompt: str):
             """Executa o fluminense usando Runner ADK com logging aprimorado"""
             import uuid
@@ -192,48 +202,59 @@ Somos ATUAIS CAMPEÕES - fato incontestável da supremacia tricolor!"""
             
             try:
                 async def run_with_session():
-                    # Log criação de sessão
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.SESSION,
-                        f"Criando sessão para torcedor Fluminense",
-                        agent_name="fluminense",
-                        session_id=session_id,
-                        user_id=user_id,
-                        event_type="session_create",
-                        correlation_id=correlation_id
-                    )
+                    # Log criação de sessão (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.SESSION):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.SESSION,
+                            f"Criando sessão para torcedor Fluminense",
+                            agent_name="fluminense",
+                            session_id=session_id,
+                            user_id=user_id,
+                            event_type="session_create",
+                            correlation_id=correlation_id
+                        )
                     
                     # Cria sessão de forma assíncrona
-                    await self.session_service.create_session(
-                        app_name="fluminense_agent",
-                        user_id=user_id,
-                        session_id=session_id
-                    )
+                    with start_span("session.create"):
+                        await self.session_service.create_session(
+                            app_name="fluminense_agent",
+                            user_id=user_id,
+                            session_id=session_id
+                        )
                     
+                    types = load_adk().types
                     content = types.Content(role="user", parts=[types.Part(text=prompt)])
                     response_text = ""
                     
-                    # Log início do processamento ADK
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.AGENT,
-                        f"Torcedor Fluminense processando com classe: {prompt[:50]}...",
-                        agent_name="fluminense",
-                        session_id=session_id,
-                        event_type="adk_processing_start",
-                        details={"prompt_type": "elegant_argument", "content_length": len(prompt)},
-                        correlation_id=correlation_id
-                    )
+                    # Log início do processamento ADK (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.AGENT):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.AGENT,
+                            f"Torcedor Fluminense processando com classe: {prompt[:50]}...",
+                            agent_name="fluminense",
+                            session_id=session_id,
+                            event_type="adk_processing_start",
+                            details={"prompt_type": "elegant_argument", "content_length": len(prompt)},
+                            correlation_id=correlation_id
+                        )
                     
-                    async for event in self.runner.run_async(
-                        user_id=user_id,
-                        session_id=session_id,
-                        new_message=content
-                    ):
-                        if event.is_final_response():
-                            response_text = event.content.parts[0].text
-                            break
+                    # Um span por evento do runner (tempo desde o evento anterior)
+                    with start_span("runner.run_async"):
+                        last_event_at = time.time()
+                        async for event in self.runner.run_async(
+                            user_id=user_id,
+                            session_id=session_id,
+                            new_message=content
+                        ):
+                            now = time.time()
+                            record_span("runner.event", last_event_at, now,
+                                        author=event.author, final=event.is_final_response())
+                            last_event_at = now
+                            if event.is_final_response():
+                                response_text = event.content.parts[0].text
+                                break
                             
                     return response_text or "Sem resposta do agente"
                 
@@ -278,20 +299,25 @@ Somos ATUAIS CAMPEÕES - fato incontestável da supremacia tricolor!"""
                 
                 return f"🟢 Erro no Fluminense: {str(e)}"
     
-    return FluminenseWrapper(fluminense_llm_agent, runner, session_service)
+    return FluminenseWrapper("fluminense_agent", description, tool_functions, build_adk)
 
 
-if __name__ == "__main__":
-    """Executa o agente Fluminense usando Flask e A2A Protocol"""
+def create_a2a_server(fluminense=None):
+    """Cria a aplicação Flask do servidor A2A (Fluminense)"""
     from flask import Flask, request, jsonify
-    import asyncio
     
     # Cria o agente ADK
-    fluminense = create_fluminense_agent()
+    if fluminense is None:
+        fluminense = create_fluminense_agent()
     
     # Cria aplicação Flask
     app = Flask(__name__)
     
+    # Contadores, latência por rota e endpoint /metrics (Prometheus)
+    instrument_a2a_app(app, "fluminense")
+    # Limite de /run simultâneos com fila limitada; saturado responde 429 (FLAFLU_ADMISSION)
+    install_admission_control(app, AdmissionController.from_env("fluminense", enhanced_logger.registry))
+    
     @app.route('/.well-known/agent.json', methods=['GET'])
     def agent_card():
         """Agent Card conforme A2A Protocol especificação"""
@@ -316,7 +342,8 @@ if __name__ == "__main__":
                 }
             ],
             "endpoints": {
-                "run": "/run"
+                "run": "/run",
+                "metrics": "/metrics"
             }
         }
         return jsonify(card)
@@ -330,11 +357,11 @@ if __name__ == "__main__":
             
             # Implementação simplificada usando as tools diretamente
             if 'argumento inicial' in prompt.lower() or 'inicial' in prompt.lower():
-                response = fluminense.tools[0].func()  # create_initial_argument_tool
+                response = fluminense.tool_functions[0]()  # create_initial_argument_tool
             elif 'contra' in prompt.lower() or 'rebater' in prompt.lower():
-                response = fluminense.tools[1].func(prompt)  # create_counter_argument_tool  
+                response = fluminense.tool_functions[1](prompt)  # create_counter_argument_tool  
             elif 'pesquisa' in prompt.lower():
-                response = fluminense.tools[2].func(prompt)  # request_research_tool
+                response = fluminense.tool_functions[2](prompt)  # request_research_tool
             else:
                 response = f"""🟢 **TORCEDOR FLUMINENSE ATIVO**
 
@@ -355,8 +382,23 @@ Use: `argumento inicial`, `contra [rival]`, `pesquisa [tema]`"""
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
-    print("🤖🟢 Fluminense Agent A2A Server iniciando na porta 8004...")
-    print("Agent Card disponível em: http://localhost:8004/.well-known/agent.json")
+    return app
+
+
+if __name__ == "__main__":
+    """Executa o agente Fluminense usando Flask e A2A Protocol"""
+    fluminense = create_fluminense_agent()
+    app = create_a2a_server(fluminense)
+    # Réplicas extras recebem a porta do launcher (FLAFLU_A2A_PORT)
+    port = server_port(8004)
+    workers = worker_count("fluminense")
+    
+    print(f"🤖🟢 Fluminense Agent A2A Server iniciando na porta {port}...")
+    print(f"Agent Card disponível em: http://localhost:{port}/.well-known/agent.json")
     
-    # Inicia servidor Flask
-    app.run(host="0.0.0.0", port=8004, debug=False)
\ No newline at end of file
+    if workers > 1:
+        # Pré-fork: LlmAgent, tools e Runner montados uma vez e compartilhados pelos workers
+        serve_prefork(app, port, workers, warm=lambda: fluminense.runner, source="fluminense_agent")
+    else:
+        # Inicia servidor Flask
+        app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
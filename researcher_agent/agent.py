@@ -7,11 +7,6 @@ import os
 import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
 from dotenv import load_dotenv
 
 # Sistema de log aprimorado
@@ -19,11 +14,22 @@ from utils.enhanced_logger import (
     enhanced_logger, log_agent_start, log_agent_response, 
     log_tool_execution, log_error, LogLevel, LogCategory
 )
+from utils.a2a_server import instrument_a2a_app, register_cache
+from utils.adk_runtime import LazyAgentWrapper, load_adk
+from utils.admission import AdmissionController, install_admission_control
+from utils.fact_index import FactIndex
+from utils.prefork import serve_prefork, worker_count
+from utils.prompt_batch import combine_prompts, split_response
+from utils.rate_limiter import llm_rate_limit_callbacks
+from utils.replica_set import server_port
+from utils.single_flight import SingleFlight
+from utils.tool_instrumentation import instrument_tool
+from utils.tracing import record_span, start_span, traced
 
 # Carrega variáveis do .env
 load_dotenv()
 
-def create_researcher_agent() -> LlmAgent:
+def create_researcher_agent() -> LazyAgentWrapper:
     """
     Cria o Agente Pesquisador seguindo padrões Google ADK
     Especialista neutro em pesquisa objetiva e dados factuais
@@ -56,43 +62,31 @@ def create_researcher_agent() -> LlmAgent:
         }
     }
     
-    # Tools para o pesquisador
-    def search_football_data_tool(query: str) -> str:
-        """Busca dados objetivos sobre futebol brasileiro"""
-        try:
-            query_lower = query.lower()
-            results = []
-            
-            # Busca em diferentes categorias
-            for category, data in football_database.items():
-                if isinstance(data, dict):
-                    for key, value in data.items():
-                        if any(term in key.lower() or term in str(value).lower() 
-                               for term in query_lower.split()):
-                            results.append(f"• {key.replace('_', ' ').title()}: {value}")
-                else:
-                    if any(term in category.lower() or term in str(data).lower() 
-                           for term in query_lower.split()):
-                        results.append(f"• {category.replace('_', ' ').title()}: {data}")
-            
-            # Se não encontrou resultados específicos, retorna dados gerais
-            if not results:
-                if "flamengo" in query_lower:
-                    results = [
-                        "• Brasileirões: 8 títulos",
-                        "• Libertadores: 3 títulos", 
-                        "• Torcida: Maior do Brasil (~43 milhões)"
-                    ]
-                elif "fluminense" in query_lower:
-                    results = [
-                        "• Brasileirões: 4 títulos",
-                        "• Libertadores: 1 título (2023 - atual)",
-                        "• Fundação: 1902 (mais antigo do Rio)"
-                    ]
-                else:
-                    results = ["• Dados não encontrados para esta consulta específica"]
-            
-            research_report = f"""📊 **RELATÓRIO DE PESQUISA**
+    # Fatos achatados uma vez; cada termo percorre a base só na primeira consulta que o usa
+    fact_index = FactIndex(football_database)
+    
+    def research_report(query: str, results: List[str]) -> str:
+        """Relatório de pesquisa com os fatos encontrados (ou dados gerais do time citado)"""
+        query_lower = query.lower()
+        
+        # Se não encontrou resultados específicos, retorna dados gerais
+        if not results:
+            if "flamengo" in query_lower:
+                results = [
+                    "• Brasileirões: 8 títulos",
+                    "• Libertadores: 3 títulos", 
+                    "• Torcida: Maior do Brasil (~43 milhões)"
+                ]
+            elif "fluminense" in query_lower:
+                results = [
+                    "• Brasileirões: 4 títulos",
+                    "• Libertadores: 1 título (2023 - atual)",
+                    "• Fundação: 1902 (mais antigo do Rio)"
+                ]
+            else:
+                results = ["• Dados não encontrados para esta consulta específica"]
+        
+        return f"""📊 **RELATÓRIO DE PESQUISA**
 
 🔍 **Consulta:** {query}
 ⏰ **Timestamp:** {datetime.now().strftime('%H:%M:%S')}
@@ -103,12 +97,23 @@ def create_researcher_agent() -> LlmAgent:
 🔗 **Fontes:** CBF, CONMEBOL, Datafolha, imprensa esportiva
 ⚖️ **Status:** Dados verificados e objetivos
 📝 **Nota:** Pesquisa realizada de forma neutra e imparcial"""
-            
-            return research_report
-            
+    
+    # Tools para o pesquisador
+    def search_football_data_tool(query: str) -> str:
+        """Busca dados objetivos sobre futebol brasileiro"""
+        try:
+            return research_report(query, fact_index.search(query))
         except Exception as e:
             return f"📊 Erro na pesquisa: {str(e)}"
     
+    def search_football_data_batch_tool(queries: List[str]) -> List[str]:
+        """Busca várias consultas numa única passada pelo índice de fatos"""
+        try:
+            return [research_report(query, results)
+                    for query, results in zip(queries, fact_index.search_many(queries))]
+        except Exception as e:
+            return [f"📊 Erro na pesquisa: {str(e)}"] * len(queries)
+    
     def provide_statistics_tool(team: str) -> str:
         """Fornece estatísticas específicas de um time"""
         try:
@@ -218,38 +223,47 @@ def create_researcher_agent() -> LlmAgent:
     Seus dados devem ser factuais, verificáveis e imparciais.
     """
     
-    # Cria ferramentas usando FunctionTool do ADK
-    search_data_function = FunctionTool(search_football_data_tool)
-    provide_stats_function = FunctionTool(provide_statistics_tool)
-    fact_check_function = FunctionTool(fact_check_tool)
+    description = "Especialista neutro em pesquisa objetiva e fornecimento de dados factuais sobre futebol brasileiro"
     
-    # Cria o agente usando Google ADK LlmAgent
-    researcher_llm_agent = LlmAgent(
-        name="researcher_agent", 
-        model="gemini-2.0-flash",
-        description="Especialista neutro em pesquisa objetiva e fornecimento de dados factuais sobre futebol brasileiro",
-        instruction=researcher_instruction,
-        tools=[search_data_function, provide_stats_function, fact_check_function]
-    )
+    # Funções das tools instrumentadas (duração, tamanhos e exceções), usadas direto pelas rotas /run;
+    # a busca em lote (índice 3) atende só o /run_batch e não é exposta ao LLM
+    tool_functions = [
+        instrument_tool(search_football_data_tool, "researcher"),
+        instrument_tool(provide_statistics_tool, "researcher"),
+        instrument_tool(fact_check_tool, "researcher"),
+        instrument_tool(search_football_data_batch_tool, "researcher"),
+    ]
     
-    # Configura Runner para execução
-    session_service = InMemorySessionService()
-    runner = Runner(
-        agent=researcher_llm_agent,
-        app_name="researcher_agent",
-        session_service=session_service
-    )
+    def build_adk(adk):
+        """LlmAgent, Runner e sessões do ADK, montados no primeiro uso do LLM"""
+        # Cria ferramentas usando FunctionTool do ADK
+        search_data_function = adk.FunctionTool(tool_functions[0])
+        provide_stats_function = adk.FunctionTool(tool_functions[1])
+        fact_check_function = adk.FunctionTool(tool_functions[2])
+        
+        # Cria o agente usando Google ADK LlmAgent
+        researcher_llm_agent = adk.LlmAgent(
+            name="researcher_agent", 
+            model="gemini-2.0-flash",
+            description=description,
+            instruction=researcher_instruction,
+            tools=[search_data_function, provide_stats_function, fact_check_function],
+            **llm_rate_limit_callbacks("researcher")
+        )
+        
+        # Configura Runner para execução
+        session_service = adk.InMemorySessionService()
+        runner = adk.Runner(
+            agent=researcher_llm_agent,
+            app_name="researcher_agent",
+            session_service=session_service
+        )
+        
+        return researcher_llm_agent, runner, session_service
     
     # Cria classe wrapper para adicionar método run
-    class ResearcherWrapper:
-        def __init__(self, agent, runner, session_service):
-            self.agent = agent
-            self.runner = runner
-            self.session_service = session_service
-            self.name = agent.name
-            self.description = agent.description
-            self.tools = agent.tools
-        
+    class ResearcherWrapper(LazyAgentWrapper):
+        @traced("researcher.run", service="researcher")
         def run(self, prompt: str):
             """Executa o researcher usando Runner ADK com logging aprimorado"""
             import uuid
@@ -269,48 +283,59 @@ def create_researcher_agent() -> LlmAgent:
             
             try:
                 async def run_with_session():
-                    # Log criação de sessão
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.SESSION,
-                        f"Criando sessão para pesquisador neutro",
-                        agent_name="researcher",
-                        session_id=session_id,
-                        user_id=user_id,
-                        event_type="session_create",
-                        correlation_id=correlation_id
-                    )
+                    # Log criação de sessão (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.SESSION):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.SESSION,
+                            f"Criando sessão para pesquisador neutro",
+                            agent_name="researcher",
+                            session_id=session_id,
+                            user_id=user_id,
+                            event_type="session_create",
+                            correlation_id=correlation_id
+                        )
                     
                     # Cria sessão de forma assíncrona
-                    await self.session_service.create_session(
-                        app_name="researcher_agent",
-                        user_id=user_id,
-                        session_id=session_id
-                    )
+                    with start_span("session.create"):
+                        await self.session_service.create_session(
+                            app_name="researcher_agent",
+                            user_id=user_id,
+                            session_id=session_id
+                        )
                     
+                    types = load_adk().types
                     content = types.Content(role="user", parts=[types.Part(text=prompt)])
                     response_text = ""
                     
-                    # Log início do processamento ADK
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.AGENT,
-                        f"Pesquisador processando consulta: {prompt[:50]}...",
-                        agent_name="researcher",
-                        session_id=session_id,
-                        event_type="adk_processing_start",
-                        details={"prompt_type": "research_query", "content_length": len(prompt)},
-                        correlation_id=correlation_id
-                    )
+                    # Log início do processamento ADK (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.AGENT):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.AGENT,
+                            f"Pesquisador processando consulta: {prompt[:50]}...",
+                            agent_name="researcher",
+                            session_id=session_id,
+                            event_type="adk_processing_start",
+                            details={"prompt_type": "research_query", "content_length": len(prompt)},
+                            correlation_id=correlation_id
+                        )
                     
-                    async for event in self.runner.run_async(
-                        user_id=user_id,
-                        session_id=session_id,
-                        new_message=content
-                    ):
-                        if event.is_final_response():
-                            response_text = event.content.parts[0].text
-                            break
+                    # Um span por evento do runner (tempo desde o evento anterior)
+                    with start_span("runner.run_async"):
+                        last_event_at = time.time()
+                        async for event in self.runner.run_async(
+                            user_id=user_id,
+                            session_id=session_id,
+                            new_message=content
+                        ):
+                            now = time.time()
+                            record_span("runner.event", last_event_at, now,
+                                        author=event.author, final=event.is_final_response())
+                            last_event_at = now
+                            if event.is_final_response():
+                                response_text = event.content.parts[0].text
+                                break
                             
                     return response_text or "Sem resposta do agente"
                 
@@ -354,21 +379,37 @@ def create_researcher_agent() -> LlmAgent:
                 )
                 
                 return f"📈 Erro no Pesquisador: {str(e)}"
+        
+        def run_batch(self, prompts: List[str]) -> List[str]:
+            """Várias consultas numa só chamada ao LLM (marcadores [Rn]); as sem resposta marcada são refeitas sozinhas"""
+            if len(prompts) <= 1:
+                return [self.run(prompt) for prompt in prompts]
+            parts = split_response(self.run(combine_prompts(prompts)), len(prompts))
+            return [part if part is not None else self.run(prompt) for prompt, part in zip(prompts, parts)]
     
-    return ResearcherWrapper(researcher_llm_agent, runner, session_service)
+    wrapper = ResearcherWrapper("researcher_agent", description, tool_functions, build_adk)
+    # Exposto em /metrics (acertos do índice de fatos)
+    wrapper.fact_index = fact_index
+    return wrapper
 
 
-if __name__ == "__main__":
-    """Executa o agente Researcher usando Flask e A2A Protocol"""
+def create_a2a_server(researcher=None):
+    """Cria a aplicação Flask do servidor A2A (Researcher)"""
     from flask import Flask, request, jsonify
-    import asyncio
     
     # Cria o agente ADK
-    researcher = create_researcher_agent()
+    if researcher is None:
+        researcher = create_researcher_agent()
     
     # Cria aplicação Flask
     app = Flask(__name__)
     
+    # Contadores, latência por rota e endpoint /metrics (Prometheus)
+    instrument_a2a_app(app, "researcher")
+    # Limite de /run simultâneos com fila limitada; saturado responde 429 (FLAFLU_ADMISSION)
+    install_admission_control(app, AdmissionController.from_env("researcher", enhanced_logger.registry),
+                              paths=("/run", "/run_batch"))
+    
     @app.route('/.well-known/agent.json', methods=['GET'])
     def agent_card():
         """Agent Card conforme A2A Protocol especificação"""
@@ -393,33 +434,48 @@ if __name__ == "__main__":
                 }
             ],
             "endpoints": {
-                "run": "/run"
+                "run": "/run",
+                "run_batch": "/run_batch",
+                "metrics": "/metrics"
             }
         }
         return jsonify(card)
     
-    @app.route('/run', methods=['POST'])
-    def run_agent():
-        """Endpoint para executar o agente via A2A Protocol"""
-        try:
-            data = request.get_json()
-            prompt = data.get('prompt', data.get('message', ''))
-            
-            # Implementação simplificada usando as tools diretamente
-            if 'pesquisa' in prompt.lower() or 'buscar' in prompt.lower():
-                response = researcher.tools[0].func(prompt)  # search_football_data_tool
-            elif 'estatistica' in prompt.lower() or 'dados' in prompt.lower():
-                # Detecta time na mensagem
-                if 'flamengo' in prompt.lower():
-                    response = researcher.tools[1].func('flamengo')  # provide_statistics_tool
-                elif 'fluminense' in prompt.lower():
-                    response = researcher.tools[1].func('fluminense')
-                else:
-                    response = researcher.tools[1].func('ambos')
-            elif 'verificar' in prompt.lower() or 'fato' in prompt.lower():
-                response = researcher.tools[2].func(prompt)  # fact_check_tool
+    # Pesquisas idênticas em andamento (debates simultâneos) compartilham uma única execução
+    # (espera limitada ao timeout da tentativa do orquestrador, 10s: depois disso ele já desistiu)
+    research_flight = SingleFlight("researcher:/run", enhanced_logger.registry, wait_timeout=10.0)
+    app.extensions["single_flight"] = research_flight
+    register_cache(app, "fact_index", researcher.fact_index.cache_stats)
+    register_cache(app, research_flight.name, research_flight.cache_stats)
+    
+    def route_prompt(prompt: str) -> Optional[str]:
+        """Tool que responde o prompt (None: consulta geral, sem tool)"""
+        if 'pesquisa' in prompt.lower() or 'buscar' in prompt.lower():
+            return "search"
+        elif 'estatistica' in prompt.lower() or 'dados' in prompt.lower():
+            return "statistics"
+        elif 'verificar' in prompt.lower() or 'fato' in prompt.lower():
+            return "fact_check"
+        return None
+    
+    def answer_prompt(prompt: str) -> str:
+        """Resposta do pesquisador para um prompt A2A"""
+        # Implementação simplificada usando as tools diretamente
+        route = route_prompt(prompt)
+        if route == "search":
+            response = researcher.tool_functions[0](prompt)  # search_football_data_tool
+        elif route == "statistics":
+            # Detecta time na mensagem
+            if 'flamengo' in prompt.lower():
+                response = researcher.tool_functions[1]('flamengo')  # provide_statistics_tool
+            elif 'fluminense' in prompt.lower():
+                response = researcher.tool_functions[1]('fluminense')
             else:
-                response = f"""📊 **PESQUISADOR NEUTRO ATIVO**
+                response = researcher.tool_functions[1]('ambos')
+        elif route == "fact_check":
+            response = researcher.tool_functions[2](prompt)  # fact_check_tool
+        else:
+            response = f"""📊 **PESQUISADOR NEUTRO ATIVO**
 
 🔍 **Consulta:** {prompt[:100]}{'...' if len(prompt) > 100 else ''}
 
@@ -435,14 +491,66 @@ if __name__ == "__main__":
 • Neutralidade absoluta
 
 📈 **Status:** Pronto para pesquisa imparcial"""
-                
+        return response
+    
+    @app.route('/run', methods=['POST'])
+    def run_agent():
+        """Endpoint para executar o agente via A2A Protocol"""
+        try:
+            data = request.get_json()
+            prompt = data.get('prompt', data.get('message', ''))
+            response, _ = research_flight.do(prompt, lambda: answer_prompt(prompt))
+            
             return jsonify({"response": response})
             
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
-    print("🤖📊 Researcher Agent A2A Server iniciando na porta 8005...")
-    print("Agent Card disponível em: http://localhost:8005/.well-known/agent.json")
+    def answer_batch(prompts: List[str], use_llm: bool) -> List[str]:
+        """
+        Respostas de um lote: buscas numa passada pelo índice de fatos, demais tools uma vez por prompt distinto
+        e consultas gerais num único pedido ao LLM (use_llm) ou com a mesma resposta do /run
+        """
+        distinct = list(dict.fromkeys(prompts))
+        routes = {prompt: route_prompt(prompt) for prompt in distinct}
+        searches = [prompt for prompt in distinct if routes[prompt] == "search"]
+        answers = dict(zip(searches, researcher.tool_functions[3](searches))) if searches else {}
+        general = [prompt for prompt in distinct if routes[prompt] is None]
+        if use_llm and general:
+            answers.update(zip(general, researcher.run_batch(general)))
+        for prompt in distinct:
+            if prompt not in answers:
+                answers[prompt] = answer_prompt(prompt)
+        return [answers[prompt] for prompt in prompts]
+    
+    @app.route('/run_batch', methods=['POST'])
+    def run_batch():
+        """Várias consultas de pesquisa numa requisição A2A: {"queries": [...], "use_llm": false}"""
+        try:
+            data = request.get_json()
+            queries = [str(query) for query in data.get('queries', [])]
+            return jsonify({"responses": answer_batch(queries, bool(data.get('use_llm', False)))})
+            
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+    
+    return app
+
+
+if __name__ == "__main__":
+    """Executa o agente Researcher usando Flask e A2A Protocol"""
+    researcher = create_researcher_agent()
+    app = create_a2a_server(researcher)
+    # Réplicas extras recebem a porta do launcher (FLAFLU_A2A_PORT)
+    port = server_port(8005)
+    workers = worker_count("researcher")
+    
+    print(f"🤖📊 Researcher Agent A2A Server iniciando na porta {port}...")
+    print(f"Agent Card disponível em: http://localhost:{port}/.well-known/agent.json")
     
-    # Inicia servidor Flask
-    app.run(host="0.0.0.0", port=8005, debug=False)
\ No newline at end of file
+    if workers > 1:
+        # Pré-fork: LlmAgent, tools e Runner montados uma vez e compartilhados pelos workers
+        serve_prefork(app, port, workers, warm=lambda: researcher.runner, source="researcher_agent")
+    else:
+        # Inicia servidor Flask
+        app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
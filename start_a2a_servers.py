@@ -1,128 +1,111 @@
 #!/usr/bin/env python3
 """
 Script para iniciar todos os servidores A2A usando Google ADK oficial
-Refatorado para usar apenas implementações oficiais do ADK
+Sobe os agentes em paralelo sob supervisão: prontidão por Agent Card e reinício com backoff
+Réplicas por agente via FLAFLU_REPLICAS (ex.: researcher=3) nas portas base, base+100, ...
 """
 
 import os
-import sys
 import time
-import asyncio
-import subprocess
-from multiprocessing import Process
-from typing import List
 import signal
+from dataclasses import replace
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from utils.log_shipping import DEFAULT_SOCKET, SOCKET_ENV, SOURCE_ENV
+from utils.process_supervisor import AgentSpec, ProcessSupervisor, probe_agent_card
+from utils.rate_limiter import DEFAULT_STATE_FILE, STATE_ENV
+from utils.replica_set import PORT_ENV, parse_replicas, replica_ports
+
+# Configuração dos agentes com ADK oficial
+AGENTS = [
+    AgentSpec("Supervisor Agent", "supervisor_agent.agent", 8002, "🤖⚖️"),
+    AgentSpec("Flamengo Agent", "flamengo_agent.agent", 8003, "🤖🔴"),
+    AgentSpec("Fluminense Agent", "fluminense_agent.agent", 8004, "🤖🟢"),
+    AgentSpec("Researcher Agent", "researcher_agent.agent", 8005, "🤖📊"),
+]
+
+# Prazo para todos os agentes responderem o Agent Card
+READY_TIMEOUT_S = 60.0
 
-def start_agent_server(agent_module: str, port: int, agent_name: str):
-    """Inicia um servidor A2A individual usando ADK oficial"""
-    try:
-        print(f"🚀 Iniciando servidor {agent_name} na porta {port}...")
-        
-        # Executa o módulo do agente
-        result = subprocess.run([
-            sys.executable, "-m", agent_module
-        ], check=True)
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erro ao iniciar servidor {agent_name}: {e}")
-    except Exception as e:
-        print(f"❌ Erro inesperado no servidor {agent_name}: {e}")
 
 def check_agent_health(port: int, agent_name: str) -> bool:
     """Verifica se o agente está rodando corretamente"""
-    try:
-        import httpx
-        response = httpx.get(f"http://localhost:{port}/.well-known/agent.json", timeout=5)
-        return response.status_code == 200
-    except:
-        return False
+    return probe_agent_card(AgentSpec(agent_name, "", port), timeout=5)
+
+
+def agent_key(spec: AgentSpec) -> str:
+    """Nome do agente usado em FLAFLU_REPLICAS e no orquestrador (ex.: researcher)"""
+    return spec.module.split(".")[0].replace("_agent", "")
+
+
+def expand_replicas(agents: List[AgentSpec], replicas: Optional[Dict[str, int]] = None) -> List[AgentSpec]:
+    """Uma especificação por réplica; a réplica #1 mantém nome e porta originais"""
+    replicas = parse_replicas() if replicas is None else replicas
+    specs = []
+    for spec in agents:
+        source = spec.module.split(".")[0]
+        for index, port in enumerate(replica_ports(spec.port, replicas.get(agent_key(spec), 1)), start=1):
+            suffix = f" #{index}" if index > 1 else ""
+            env = {**spec.env, PORT_ENV: str(port),
+                   # Logs enviados ao agregador do dashboard com o nome do módulo (e da réplica)
+                   SOURCE_ENV: source + (f"#{index}" if index > 1 else "")}
+            specs.append(replace(spec, name=spec.name + suffix, port=port, env=env))
+    return specs
+
+
+def _stop_on_sigterm(signum, frame):
+    raise KeyboardInterrupt
+
 
 def main():
     """Função principal para iniciar todos os servidores A2A"""
     print("🤖 Iniciando Sistema Multi-Agente com Google ADK oficial")
     print("=" * 60)
     
-    # Configuração dos agentes com ADK oficial
-    agents_config = [
-        {
-            "name": "Supervisor Agent",
-            "module": "supervisor_agent.agent",
-            "port": 8002,
-            "emoji": "🤖⚖️"
-        },
-        {
-            "name": "Flamengo Agent", 
-            "module": "flamengo_agent.agent",
-            "port": 8003,
-            "emoji": "🤖🔴"
-        },
-        {
-            "name": "Fluminense Agent",
-            "module": "fluminense_agent.agent", 
-            "port": 8004,
-            "emoji": "🤖🟢"
-        },
-        {
-            "name": "Researcher Agent",
-            "module": "researcher_agent.agent",
-            "port": 8005,
-            "emoji": "🤖📊"
-        }
-    ]
+    load_dotenv()
+    # Socket do agregador de logs (aberto pelo dashboard; os servidores reconectam sozinhos)
+    os.environ.setdefault(SOCKET_ENV, os.path.abspath(DEFAULT_SOCKET))
+    # Cota do provedor do LLM compartilhada por todos os agentes, réplicas e workers (uma só API key)
+    os.environ.setdefault(STATE_ENV, os.path.abspath(DEFAULT_STATE_FILE))
+    specs = expand_replicas(AGENTS)
     
-    processes: List[Process] = []
+    supervisor = ProcessSupervisor(specs, report=print)
+    signal.signal(signal.SIGTERM, _stop_on_sigterm)
     
     try:
-        # Inicia cada servidor A2A em processo separado
-        for agent in agents_config:
-            print(f"{agent['emoji']} Iniciando {agent['name']} na porta {agent['port']}...")
-            
-            process = Process(
-                target=start_agent_server,
-                args=(agent['module'], agent['port'], agent['name'])
-            )
-            process.start()
-            processes.append(process)
-            time.sleep(2)  # Aguarda um pouco entre inicializações
+        # Todos sobem em paralelo; a prontidão é sondada com backoff
+        start = time.monotonic()
+        supervisor.start_all()
+        for spec in specs:
+            print(f"{spec.emoji} Iniciando {spec.name} na porta {spec.port}...")
         
-        print("\n✅ Todos os servidores A2A iniciados!")
-        print("=" * 60)
-        
-        # Verifica status dos agentes
-        print("🔍 Verificando status dos agentes...")
-        time.sleep(5)  # Aguarda servidores iniciarem
+        print("🔍 Aguardando Agent Cards...")
+        readiness = supervisor.wait_ready(timeout=READY_TIMEOUT_S)
         
-        for agent in agents_config:
-            if check_agent_health(agent['port'], agent['name']):
-                print(f"✅ {agent['emoji']} {agent['name']}: Online na porta {agent['port']}")
-                print(f"   Agent Card: http://localhost:{agent['port']}/.well-known/agent.json")
+        print("\n" + "=" * 60)
+        print(f"⏱️  Partida completa em {time.monotonic() - start:.2f}s")
+        for spec in specs:
+            seconds = readiness[spec.name]
+            if seconds is not None:
+                print(f"   {spec.emoji} {spec.name}: {seconds:.2f}s — Agent Card: {spec.url}/.well-known/agent.json")
             else:
-                print(f"❌ {agent['emoji']} {agent['name']}: Offline ou com problemas")
+                print(f"❌ {spec.emoji} {spec.name}: não ficou pronto em {READY_TIMEOUT_S:.0f}s")
         
         print("\n" + "=" * 60)
         print("🎯 Sistema A2A pronto! Execute: uv run streamlit run app.py")
         print("💡 Pressione Ctrl+C para parar todos os servidores")
         print("=" * 60)
         
-        # Aguarda sinal de interrupção
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("\n🛑 Parando todos os servidores A2A...")
-            
+        # Supervisão contínua: agentes que caírem são reiniciados com backoff exponencial
+        supervisor.run()
+    except KeyboardInterrupt:
+        print("\n🛑 Parando todos os servidores A2A...")
     except Exception as e:
         print(f"❌ Erro geral: {e}")
-        
     finally:
-        # Para todos os processos
-        for process in processes:
-            if process.is_alive():
-                process.terminate()
-                process.join(timeout=5)
-                if process.is_alive():
-                    process.kill()
-        
+        supervisor.stop_all()
         print("✅ Todos os servidores A2A foram parados")
 
 if __name__ == "__main__":
@@ -8,11 +8,6 @@ import random
 import time
 from typing import Dict, Any, List, Optional
 from datetime import datetime
-from google.adk.agents import LlmAgent
-from google.adk.tools import FunctionTool
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
 from dotenv import load_dotenv
 
 # Sistema de log aprimorado
@@ -20,11 +15,19 @@ from utils.enhanced_logger import (
     enhanced_logger, log_agent_start, log_agent_response, 
     log_tool_execution, log_error, LogLevel, LogCategory
 )
+from utils.a2a_server import instrument_a2a_app
+from utils.adk_runtime import LazyAgentWrapper, load_adk
+from utils.admission import AdmissionController, install_admission_control
+from utils.prefork import serve_prefork, worker_count
+from utils.rate_limiter import llm_rate_limit_callbacks
+from utils.replica_set import server_port
+from utils.tool_instrumentation import instrument_tool
+from utils.tracing import record_span, start_span, traced
 
 # Carrega variáveis do .env
 load_dotenv()
 
-def create_supervisor_agent() -> LlmAgent:
+def create_supervisor_agent() -> LazyAgentWrapper:
     """
     Cria o Agente Supervisor seguindo padrões Google ADK
     Especialista neutro em moderação de debates
@@ -33,19 +36,7 @@ def create_supervisor_agent() -> LlmAgent:
     # Tools para o supervisor usando FunctionTool do ADK
     def start_debate_tool(duration_minutes: int) -> str:
         """Inicia debate com duração específica e sorteia primeiro torcedor"""
-        tool_start = time.time()
-        
         try:
-            # Log início da ferramenta
-            enhanced_logger.log(
-                LogLevel.INFO,
-                LogCategory.TOOL_EXECUTION,
-                "Executando start_debate_tool",
-                agent_name="supervisor",
-                event_type="tool_start",
-                details={"duration_minutes": duration_minutes}
-            )
-            
             if duration_minutes < 2 or duration_minutes > 30:
                 error_msg = "❌ Duração deve ser entre 2 e 30 minutos"
                 enhanced_logger.log(
@@ -82,20 +73,9 @@ def create_supervisor_agent() -> LlmAgent:
 
 {starting_emoji} Torcedor do {starting_team}, você tem {turn_duration/60:.1f} minutos. Apresente seus argumentos iniciais!"""
             
-            # Log sucesso da ferramenta
-            duration_ms = (time.time() - tool_start) * 1000
-            log_tool_execution(
-                agent_name="supervisor",
-                tool_name="start_debate_tool",
-                parameters={"duration_minutes": duration_minutes},
-                result=f"Debate iniciado - {starting_team} começa",
-                duration_ms=duration_ms
-            )
-            
             return result
             
         except Exception as e:
-            duration_ms = (time.time() - tool_start) * 1000
             log_error(
                 error=e,
                 context="start_debate_tool",
@@ -289,38 +269,45 @@ Avaliação fundamentada em expertise acadêmica em psicologia cognitiva, lingu
     Mantenha sempre neutralidade absoluta e foque nos critérios técnicos de avaliação.
     """
     
-    # Cria ferramentas usando FunctionTool do ADK
-    start_debate_function = FunctionTool(start_debate_tool)
-    analyze_debate_function = FunctionTool(analyze_debate_tool)
-    get_time_status_function = FunctionTool(get_time_status_tool)
+    description = "Especialista neutro em moderação de debates entre torcedores, com expertise em retórica, psicologia cognitiva e linguística aplicada"
     
-    # Cria o agente usando Google ADK LlmAgent
-    supervisor_agent = LlmAgent(
-        name="supervisor_agent",
-        model="gemini-2.0-flash",
-        description="Especialista neutro em moderação de debates entre torcedores, com expertise em retórica, psicologia cognitiva e linguística aplicada",
-        instruction=supervisor_instruction,
-        tools=[start_debate_function, analyze_debate_function, get_time_status_function]
-    )
+    # Funções das tools instrumentadas (duração, tamanhos e exceções), usadas direto pelas rotas /run
+    tool_functions = [
+        instrument_tool(start_debate_tool, "supervisor"),
+        instrument_tool(analyze_debate_tool, "supervisor"),
+        instrument_tool(get_time_status_tool, "supervisor"),
+    ]
     
-    # Configura Runner para execução
-    session_service = InMemorySessionService()
-    runner = Runner(
-        agent=supervisor_agent,
-        app_name="supervisor_agent",
-        session_service=session_service
-    )
+    def build_adk(adk):
+        """LlmAgent, Runner e sessões do ADK, montados no primeiro uso do LLM"""
+        # Cria ferramentas usando FunctionTool do ADK
+        start_debate_function = adk.FunctionTool(tool_functions[0])
+        analyze_debate_function = adk.FunctionTool(tool_functions[1])
+        get_time_status_function = adk.FunctionTool(tool_functions[2])
+        
+        # Cria o agente usando Google ADK LlmAgent
+        supervisor_agent = adk.LlmAgent(
+            name="supervisor_agent",
+            model="gemini-2.0-flash",
+            description=description,
+            instruction=supervisor_instruction,
+            tools=[start_debate_function, analyze_debate_function, get_time_status_function],
+            **llm_rate_limit_callbacks("supervisor")
+        )
+        
+        # Configura Runner para execução
+        session_service = adk.InMemorySessionService()
+        runner = adk.Runner(
+            agent=supervisor_agent,
+            app_name="supervisor_agent",
+            session_service=session_service
+        )
+        
+        return supervisor_agent, runner, session_service
     
     # Cria classe wrapper para adicionar método run
-    class SupervisorWrapper:
-        def __init__(self, agent, runner, session_service):
-            self.agent = agent
-            self.runner = runner
-            self.session_service = session_service
-            self.name = agent.name
-            self.description = agent.description
-            self.tools = agent.tools
-        
+    class SupervisorWrapper(LazyAgentWrapper):
+        @traced("supervisor.run", service="supervisor")
         def run(self, prompt: str):
             """Executa o supervisor usando Runner ADK com logging aprimorado"""
             import uuid
@@ -340,48 +327,59 @@ Avaliação fundamentada em expertise acadêmica em psicologia cognitiva, lingu
             
             try:
                 async def run_with_session():
-                    # Log criação de sessão
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.SESSION,
-                        f"Criando sessão para supervisor",
-                        agent_name="supervisor",
-                        session_id=session_id,
-                        user_id=user_id,
-                        event_type="session_create",
-                        correlation_id=correlation_id
-                    )
+                    # Log criação de sessão (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.SESSION):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.SESSION,
+                            f"Criando sessão para supervisor",
+                            agent_name="supervisor",
+                            session_id=session_id,
+                            user_id=user_id,
+                            event_type="session_create",
+                            correlation_id=correlation_id
+                        )
                     
                     # Cria sessão de forma assíncrona
-                    await self.session_service.create_session(
-                        app_name="supervisor_agent",
-                        user_id=user_id,
-                        session_id=session_id
-                    )
+                    with start_span("session.create"):
+                        await self.session_service.create_session(
+                            app_name="supervisor_agent",
+                            user_id=user_id,
+                            session_id=session_id
+                        )
                     
+                    types = load_adk().types
                     content = types.Content(role="user", parts=[types.Part(text=prompt)])
                     response_text = ""
                     
-                    # Log início do processamento ADK
-                    enhanced_logger.log(
-                        LogLevel.INFO,
-                        LogCategory.AGENT,
-                        f"Processando prompt com ADK Runner",
-                        agent_name="supervisor",
-                        session_id=session_id,
-                        event_type="adk_processing_start",
-                        details={"content_length": len(prompt)},
-                        correlation_id=correlation_id
-                    )
+                    # Log início do processamento ADK (DEBUG: checado antes de montar a mensagem)
+                    if enhanced_logger.is_enabled(LogLevel.DEBUG, LogCategory.AGENT):
+                        enhanced_logger.log(
+                            LogLevel.DEBUG,
+                            LogCategory.AGENT,
+                            f"Processando prompt com ADK Runner",
+                            agent_name="supervisor",
+                            session_id=session_id,
+                            event_type="adk_processing_start",
+                            details={"content_length": len(prompt)},
+                            correlation_id=correlation_id
+                        )
                     
-                    async for event in self.runner.run_async(
-                        user_id=user_id,
-                        session_id=session_id,
-                        new_message=content
-                    ):
-                        if event.is_final_response():
-                            response_text = event.content.parts[0].text
-                            break
+                    # Um span por evento do runner (tempo desde o evento anterior)
+                    with start_span("runner.run_async"):
+                        last_event_at = time.time()
+                        async for event in self.runner.run_async(
+                            user_id=user_id,
+                            session_id=session_id,
+                            new_message=content
+                        ):
+                            now = time.time()
+                            record_span("runner.event", last_event_at, now,
+                                        author=event.author, final=event.is_final_response())
+                            last_event_at = now
+                            if event.is_final_response():
+                                response_text = event.content.parts[0].text
+                                break
                             
                     return response_text or "Sem resposta do agente"
                 
@@ -413,20 +411,25 @@ Avaliação fundamentada em expertise acadêmica em psicologia cognitiva, lingu
                 
                 return f"⚠️ Erro no Supervisor: {str(e)}"
     
-    return SupervisorWrapper(supervisor_agent, runner, session_service)
+    return SupervisorWrapper("supervisor_agent", description, tool_functions, build_adk)
 
 
-if __name__ == "__main__":
-    """Executa o agente supervisor usando Flask e A2A Protocol"""
+def create_a2a_server(supervisor=None):
+    """Cria a aplicação Flask do servidor A2A (Supervisor)"""
     from flask import Flask, request, jsonify
-    import asyncio
     
     # Cria o agente ADK
-    supervisor = create_supervisor_agent()
+    if supervisor is None:
+        supervisor = create_supervisor_agent()
     
     # Cria aplicação Flask
     app = Flask(__name__)
     
+    # Contadores, latência por rota e endpoint /metrics (Prometheus)
+    instrument_a2a_app(app, "supervisor")
+    # Limite de /run simultâneos com fila limitada; saturado responde 429 (FLAFLU_ADMISSION)
+    install_admission_control(app, AdmissionController.from_env("supervisor", enhanced_logger.registry))
+    
     @app.route('/.well-known/agent.json', methods=['GET'])
     def agent_card():
         """Agent Card conforme A2A Protocol especificação"""
@@ -451,7 +454,8 @@ if __name__ == "__main__":
                 }
             ],
             "endpoints": {
-                "run": "/run"
+                "run": "/run",
+                "metrics": "/metrics"
             }
         }
         return jsonify(card)
@@ -471,13 +475,13 @@ if __name__ == "__main__":
                 import re
                 duration_match = re.search(r'(\d+)\s*minutos?', prompt.lower())
                 duration = int(duration_match.group(1)) if duration_match else 5
-                response = supervisor.tools[0].func(duration)  # start_debate_tool
+                response = supervisor.tool_functions[0](duration)  # start_debate_tool
                 
             elif 'analisar' in prompt.lower() and 'debate' in prompt.lower():
-                response = supervisor.tools[1].func(prompt)  # analyze_debate_tool
+                response = supervisor.tool_functions[1](prompt)  # analyze_debate_tool
                 
             elif 'tempo' in prompt.lower() or 'status' in prompt.lower():
-                response = supervisor.tools[2].func()  # get_time_status_tool
+                response = supervisor.tool_functions[2]()  # get_time_status_tool
                 
             else:
                 # Resposta padrão do supervisor
@@ -503,8 +507,23 @@ if __name__ == "__main__":
         except Exception as e:
             return jsonify({"error": str(e)}), 500
     
-    print("🤖⚖️ Supervisor Agent A2A Server iniciando na porta 8002...")
-    print("Agent Card disponível em: http://localhost:8002/.well-known/agent.json")
+    return app
+
+
+if __name__ == "__main__":
+    """Executa o agente supervisor usando Flask e A2A Protocol"""
+    supervisor = create_supervisor_agent()
+    app = create_a2a_server(supervisor)
+    # Réplicas extras recebem a porta do launcher (FLAFLU_A2A_PORT)
+    port = server_port(8002)
+    workers = worker_count("supervisor")
+    
+    print(f"🤖⚖️ Supervisor Agent A2A Server iniciando na porta {port}...")
+    print(f"Agent Card disponível em: http://localhost:{port}/.well-known/agent.json")
     
-    # Inicia servidor Flask
-    app.run(host="0.0.0.0", port=8002, debug=False)
\ No newline at end of file
+    if workers > 1:
+        # Pré-fork: LlmAgent, tools e Runner montados uma vez e compartilhados pelos workers
+        serve_prefork(app, port, workers, warm=lambda: supervisor.runner, source="supervisor_agent")
+    else:
+        # Inicia servidor Flask
+        app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
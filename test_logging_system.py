@@ -4,8 +4,19 @@ Script de Teste do Sistema de Logging Aprimorado
 Demonstra todas as funcionalidades implementadas
 """
 
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
 import time
+from datetime import datetime
+from pathlib import Path
 from utils.enhanced_logger import (
+    EnhancedLogger,
+    CompactLogEntry,
+    LogEntry,
     enhanced_logger, 
     LogLevel, 
     LogCategory,
@@ -16,6 +27,9 @@ from utils.enhanced_logger import (
     log_debate_event,
     log_error
 )
+from utils.log_buffer import RingBuffer
+from utils.log_segments import SegmentReader, SegmentWriter
+from utils.log_writer import AsyncLogWriter, OVERFLOW_DROP
 
 def test_basic_logging():
     """Testa logging básico"""
@@ -157,6 +171,1482 @@ def test_export():
     
     print("✅ Exportação funcionando!")
 
+def test_async_file_writer():
+    """Testa escrita em lote assíncrona e flush"""
+    print("💾 Testando escritor assíncrono...")
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        logger.log(LogLevel.INFO, LogCategory.SYSTEM, "Mensagem de sistema", details={"k": "v"})
+        logger.log(LogLevel.ERROR, LogCategory.AGENT, "Falha do agente", agent_name="flamengo")
+        logger.log(LogLevel.A2A_MESSAGE, LogCategory.A2A_PROTOCOL, "flamengo → researcher")
+        
+        assert logger.flush(timeout=5)
+        
+        system_lines = next(Path(log_dir).glob("system_*.log")).read_text(encoding="utf-8").splitlines()
+        agent_lines = next(Path(log_dir).glob("agents_*.log")).read_text(encoding="utf-8").splitlines()
+        a2a_lines = next(Path(log_dir).glob("a2a_*.log")).read_text(encoding="utf-8").splitlines()
+        
+        assert system_lines[0].endswith('| INFO | FlaFludeSystem | Mensagem de sistema | {"k": "v"}')
+        assert "| ERROR | FlaFludeAgents | Falha do agente |" in agent_lines[0]
+        assert "| INFO | FlaFludeA2A |" in a2a_lines[0]
+        
+        logger.shutdown()
+        assert logger.get_performance_metrics()["file_writer"]["written"] == 3
+        
+        # Hook de encerramento único: escritor fechado sai do registro, o não iniciado é coletável
+        import gc
+        import weakref
+        from utils.log_writer import _open_writers
+        assert logger.writer not in _open_writers
+        unused = weakref.ref(AsyncLogWriter(Path(log_dir), lambda entry: ("x.log", str(entry))))
+        gc.collect()
+        assert unused() is None
+        
+        # Escritor iniciado e descartado sem close(): a thread grava o pendente, fecha os arquivos e termina
+        started = AsyncLogWriter(Path(log_dir), lambda entry: ("descartado.log", str(entry)), flush_interval=10)
+        started.submit("pendente")
+        thread, core = started._thread, started._core
+        del started
+        gc.collect()
+        thread.join(5)
+        assert not thread.is_alive() and not core.files
+        assert (Path(log_dir) / "descartado.log").read_text(encoding="utf-8") == "pendente\n"
+        
+        # Logger descartado: a thread do seu escritor não o mantém vivo
+        dropped = EnhancedLogger(log_dir=log_dir)
+        dropped.log(LogLevel.INFO, LogCategory.SYSTEM, "último registro")
+        dropped.flush()
+        thread, alive = dropped.writer._thread, weakref.ref(dropped)
+        del dropped
+        gc.collect()
+        thread.join(5)
+        assert alive() is None and not thread.is_alive()
+    
+    print("✅ Escritor assíncrono funcionando!")
+
+def test_writer_drops_under_overload():
+    """Testa descarte quando a fila do escritor está cheia"""
+    print("🚦 Testando política de sobrecarga...")
+    
+    release = threading.Event()
+    
+    def slow_formatter(entry):
+        release.wait(5)
+        return "slow.log", str(entry)
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        writer = AsyncLogWriter(Path(log_dir), slow_formatter, batch_size=1,
+                                max_queue=2, overflow=OVERFLOW_DROP)
+        results = [writer.submit(i) for i in range(10)]
+        release.set()
+        writer.close()
+        
+        assert not all(results)
+        assert writer.stats["dropped"] == results.count(False)
+        assert writer.stats["written"] == results.count(True)
+    
+    print("✅ Política de sobrecarga funcionando!")
+
+def test_ring_buffer_eviction():
+    """Testa buffer circular com evicção O(1) e iteração sem cópia"""
+    print("🔁 Testando buffer circular...")
+    
+    buffer = RingBuffer(3)
+    evicted = [buffer.append(i)[1] for i in range(5)]
+    assert evicted == [None, None, None, 0, 1]
+    assert list(buffer.iter_newest()) == [4, 3, 2]
+    assert list(buffer) == [2, 3, 4]
+    assert buffer.get(1) is None and buffer.get(3) == 3
+    
+    # Iteração iniciada antes de novas escritas não devolve slots sobrescritos
+    iterator = buffer.iter_newest()
+    assert next(iterator) == 4
+    buffer.append(5)
+    buffer.append(6)
+    assert list(iterator) == []
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=5)
+        for i in range(12):
+            logger.log(LogLevel.INFO, LogCategory.SYSTEM, f"evento {i}", event_type="ring_test")
+        recent = logger.get_recent_logs(limit=3)
+        assert [log["message"] for log in recent] == ["evento 11", "evento 10", "evento 9"]
+        assert logger.get_performance_metrics()["memory_entries"] == 5
+        logger.shutdown()
+    
+    print("✅ Buffer circular funcionando!")
+
+def test_compact_entry_roundtrip():
+    """Testa que a entrada compacta preserva a visão pública do LogEntry"""
+    print("🗜️ Testando entradas compactas...")
+    
+    entry = CompactLogEntry(
+        ts=1722450000.5, level="INFO", category="agent", agent_name="flamengo",
+        session_id="session_1", user_id="user_1", event_type="agent_response",
+        message="Agent flamengo respondeu", details={"preview": "Mengão ❤️", "size": 3},
+        duration_ms=12.5, correlation_id="abc12345", thread_id="MainThread",
+    )
+    as_dict = entry.to_dict()
+    assert list(as_dict) == list(LogEntry.__dataclass_fields__)
+    assert as_dict["details"] == {"preview": "Mengão ❤️", "size": 3}
+    assert isinstance(entry.details_blob, bytes)
+    assert entry.to_log_entry().timestamp == as_dict["timestamp"]
+    assert not hasattr(entry, "__dict__")
+    
+    print("✅ Entradas compactas funcionando!")
+
+def test_secondary_indexes():
+    """Testa consultas indexadas consistentes com a evicção do buffer"""
+    print("🗂️ Testando índices secundários...")
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=50)
+        for i in range(200):
+            level = LogLevel.ERROR if i % 10 == 0 else LogLevel.INFO
+            logger.log(level, LogCategory.AGENT, f"evento {i}",
+                       agent_name=("flamengo", "fluminense")[i % 2],
+                       session_id=f"sessao_{i // 20}", correlation_id=f"corr_{i // 5}")
+        
+        retained = [entry.to_dict() for entry in logger.entries.iter_newest()]
+        expected = [log for log in retained if log["agent_name"] == "flamengo" and log["level"] == "ERROR"]
+        assert logger.get_recent_logs(limit=100, agent_name="flamengo", level=LogLevel.ERROR) == expected
+        assert [log["message"] for log in expected] == ["evento 190", "evento 180", "evento 170", "evento 160", "evento 150"]
+        
+        flow = logger.get_agent_flow("sessao_9")
+        assert [log["message"] for log in flow] == [f"evento {i}" for i in range(180, 200)]
+        assert [log["message"] for log in logger.get_agent_flow("", correlation_id="corr_39")] == \
+            [f"evento {i}" for i in range(195, 200)]
+        
+        # Chaves totalmente despejadas saem do índice
+        assert logger.get_agent_flow("sessao_0") == []
+        assert "sessao_0" not in logger.index.values("session_id")
+        logger.shutdown()
+    
+    print("✅ Índices secundários funcionando!")
+
+def test_full_text_search():
+    """Testa índice invertido: AND, prefixo, acentos, filtros de campo e evicção"""
+    print("🔤 Testando busca textual indexada...")
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=20)
+        logger.log(LogLevel.INFO, LogCategory.AGENT, "Primeiro evento despejado", agent_name="flamengo",
+                   details={"nota": "arquivado"})
+        for i in range(30):
+            agent = ("flamengo", "fluminense", "researcher")[i % 3]
+            logger.log(LogLevel.ERROR if i % 5 == 0 else LogLevel.INFO, LogCategory.AGENT,
+                       f"Resposta {i} sobre títulos", agent_name=agent,
+                       details={"tool": {"name": "get_statistics", "args": ["Maracanã", i]}})
+        
+        def messages(query, limit=50):
+            return [log["message"] for log in logger.search_logs(query, limit=limit)]
+        
+        assert messages("titulos", limit=3) == ["Resposta 29 sobre títulos", "Resposta 28 sobre títulos",
+                                                "Resposta 27 sobre títulos"]
+        assert messages("MARACANA agent:fluminense level:error") == ["Resposta 25 sobre títulos",
+                                                                      "Resposta 10 sobre títulos"]
+        assert messages("get_stat*") == messages("titulos")
+        assert messages("resp* 17") == ["Resposta 17 sobre títulos"]
+        assert messages("fluminense 12") == []
+        assert messages("arquivado") == [] and messages("despejado") == []
+        assert messages("") == [] and messages("inexistente*") == []
+        logger.shutdown()
+    
+    print("✅ Busca textual indexada funcionando!")
+
+def test_streaming_export():
+    """Testa exportação em streaming (NDJSON/CSV/JSON, gzip) combinando arquivos e memória"""
+    print("📤 Testando exportação em streaming...")
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=5)
+        start = time.time() - 1
+        for i in range(20):
+            category = (LogCategory.AGENT, LogCategory.A2A_PROTOCOL, LogCategory.SYSTEM)[i % 3]
+            logger.log(LogLevel.INFO, category, f"exportado {i}", agent_name="flamengo",
+                       details={"linha": i, "texto": "vírgula, \"aspas\""})
+            time.sleep(0.002)  # arquivos diários têm precisão de milissegundos
+        time_range = (start, time.time() + 1)
+        
+        ndjson = b"".join(logger.export_logs_stream("ndjson", time_range, chunk_size=4)).decode("utf-8")
+        records = [json.loads(line) for line in ndjson.splitlines()]
+        assert [record["message"] for record in records] == [f"exportado {i}" for i in range(20)]
+        assert records[-1]["agent_name"] == "flamengo" and records[0]["details"]["linha"] == 0
+        
+        # Leitura direta dos arquivos de texto diários
+        from_files = [json.loads(line) for line in b"".join(
+            logger.export_logs_stream("ndjson", time_range, source="files")).decode("utf-8").splitlines()]
+        assert [record["message"] for record in from_files] == [f"exportado {i}" for i in range(20)]
+        assert from_files[0]["details"]["texto"] == "vírgula, \"aspas\""
+        
+        compressed = b"".join(logger.export_logs_stream("ndjson", time_range, compress=True))
+        assert gzip.decompress(compressed).decode("utf-8") == ndjson
+        
+        as_json = json.loads(b"".join(logger.export_logs_stream("json", time_range, chunk_size=3)))
+        assert [record["message"] for record in as_json] == [record["message"] for record in records]
+        
+        rows = list(csv.DictReader(io.StringIO(
+            b"".join(logger.export_logs_stream("csv", time_range, source="memory")).decode("utf-8"))))
+        assert [row["message"] for row in rows] == [f"exportado {i}" for i in range(15, 20)]
+        logger.shutdown()
+    
+    print("✅ Exportação em streaming funcionando!")
+
+def test_binary_segments():
+    """Testa segmentos binários: rodapés, índice esparso, segmento aberto e histórico do logger"""
+    print("🧱 Testando segmentos binários...")
+    
+    with tempfile.TemporaryDirectory() as segment_dir:
+        writer = SegmentWriter(segment_dir, max_bytes=2048, index_interval=8)
+        writer.write_batch((1000.0 + i, f"registro {i}".encode("utf-8")) for i in range(300))
+        # Último segmento fica aberto (sem rodapé) e termina com registro truncado
+        reader = SegmentReader(segment_dir)
+        segments = reader.segments()
+        assert len(segments) > 3 and reader.first_ts() == 1000.0
+        with open(segments[-1], "ab") as handle:
+            handle.write(b"\x40\x00")
+        
+        window = [payload.decode("utf-8") for _, payload in reader.iter_range(1100.0, 1110.0)]
+        assert window == [f"registro {i}" for i in range(100, 111)]
+        assert len(list(reader.iter_range(0, 5000))) == 300
+        assert list(reader.iter_range(2000.0, 3000.0)) == []
+    
+    # Dois processos no mesmo diretório: segmentos sobrepostos no tempo, selados e abertos
+    with tempfile.TemporaryDirectory() as segment_dir:
+        first = SegmentWriter(segment_dir, max_bytes=256, index_interval=4)
+        second = SegmentWriter(segment_dir, max_bytes=256, index_interval=4)
+        first.write_batch((100.0 + i * 10, f"a{i}".encode("utf-8")) for i in range(30))
+        second.write_batch((105.0 + i * 10, f"b{i}".encode("utf-8")) for i in range(30))
+        reader = SegmentReader(segment_dir)
+        
+        window = list(reader.iter_range(150.0, 250.0))
+        timestamps = [ts for ts, _ in window]
+        assert timestamps == sorted(timestamps) and len(window) == 21
+        assert (200.0, b"a10") in window and (205.0, b"b10") in window
+        everything = [ts for ts, _ in reader.iter_range(0, float("inf"))]
+        assert len(everything) == 60 and everything == sorted(everything)
+        first.close()
+        second.close()
+        assert [ts for ts, _ in reader.iter_range(0, float("inf"))] == everything
+    
+    # Segmento abandonado sem rodapé (worker encerrado após fork): limitado pelo último registro
+    with tempfile.TemporaryDirectory() as segment_dir:
+        abandoned = SegmentWriter(segment_dir, index_interval=4)
+        abandoned.write_batch((10.0 + i, f"velho {i}".encode("utf-8")) for i in range(20))
+        abandoned_path = abandoned._path
+        abandoned.reset_after_fork()
+        assert abandoned_path.stat().st_size == abandoned.stats["bytes"]
+        
+        later = SegmentWriter(segment_dir, index_interval=4)
+        later.write_batch((100.0 + i, f"novo {i}".encode("utf-8")) for i in range(20))
+        reader = SegmentReader(segment_dir)
+        merged_groups = []
+        iter_group = reader._iter_group
+        reader._iter_group = lambda group, *bounds: merged_groups.append(len(group)) or iter_group(group, *bounds)
+        
+        window = [payload.decode("utf-8") for _, payload in reader.iter_range(25.0, 105.0)]
+        assert window == [f"velho {i}" for i in range(15, 20)] + [f"novo {i}" for i in range(6)]
+        assert merged_groups == [1, 1]
+        recovered = reader._recovered[abandoned_path]
+        assert (recovered["count"], recovered["min_ts"], recovered["max_ts"]) == (20, 10.0, 29.0)
+        
+        # O segmento aberto de outro processo continua crescendo: a recuperação é incremental
+        later.write_batch((120.0 + i, f"novo {20 + i}".encode("utf-8")) for i in range(5))
+        assert [ts for ts, _ in reader.iter_range(119.0, 200.0)] == [119.0] + [120.0 + i for i in range(5)]
+        later.close()
+        assert len(list(reader.iter_range(0, float("inf")))) == 45
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=5)
+        start = time.time() - 1
+        for i in range(12):
+            logger.log(LogLevel.WARNING, LogCategory.TOOL_EXECUTION, f"histórico {i}", agent_name="researcher",
+                       session_id="sessao_hist", details={"i": i}, duration_ms=1.5)
+        time_range = (start, time.time() + 1)
+        
+        history = logger.get_history_logs(time_range, agent_name="researcher", level=LogLevel.WARNING)
+        assert [log["message"] for log in history] == [f"histórico {i}" for i in range(12)]
+        assert history[0]["details"] == {"i": 0} and history[0]["session_id"] == "sessao_hist"
+        assert history[0]["category"] == "tool_execution" and history[0]["duration_ms"] == 1.5
+        
+        # Exportação "auto": histórico fiel vindo dos segmentos + janela em memória
+        exported = [json.loads(line) for line in
+                    b"".join(logger.export_logs_stream("ndjson", time_range)).decode("utf-8").splitlines()]
+        assert exported == history
+        logger.shutdown()
+    
+    print("✅ Segmentos binários funcionando!")
+
+def test_log_frame_cache():
+    """Testa DataFrame incremental do LogViewer: append por sequência, evicção e agregados"""
+    print("🧮 Testando cache incremental de DataFrame...")
+    
+    from utils.log_frame import LogFrameCache
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, max_entries=50)
+        cache = LogFrameCache(logger, chunk_rows=8)
+        
+        def log_batch(start, count):
+            for i in range(start, start + count):
+                logger.log(LogLevel.ERROR if i % 4 == 0 else LogLevel.INFO, LogCategory.AGENT, f"linha {i}",
+                           agent_name=("flamengo", "fluminense", None)[i % 3],
+                           duration_ms=float(i) if i % 2 else None)
+        
+        log_batch(0, 30)
+        assert cache.refresh() == 30 and cache.refresh() == 0
+        log_batch(30, 45)
+        assert cache.refresh() == 45
+        
+        frame = cache.frame
+        assert len(frame) == 50 and frame["seq"].tolist() == list(range(25, 75))
+        assert str(frame["timestamp"].dtype).startswith("datetime64")
+        assert frame["timestamp"].is_monotonic_increasing
+        assert frame["agent_name"].iloc[-1] == "system"
+        
+        recent = cache.recent(limit=5, agent_name="flamengo", level="ERROR")
+        assert recent["message"].tolist() == ["linha 36", "linha 48", "linha 60", "linha 72"]
+        
+        summary = cache.summary().set_index("agent_name")
+        retained = frame[frame["agent_name"] == "fluminense"]
+        assert summary.loc["fluminense", "events"] == len(retained)
+        assert summary.loc["fluminense", "max_ms"] == retained["duration_ms"].max()
+        assert abs(summary.loc["fluminense", "avg_ms"] - retained["duration_ms"].mean()) < 1e-9
+        logger.shutdown()
+    
+    print("✅ Cache incremental de DataFrame funcionando!")
+
+def test_rolling_metrics():
+    """Testa quantis pré-agregados, taxas em janelas e a média só sobre eventos cronometrados"""
+    print("⏱️ Testando métricas pré-agregadas...")
+    
+    import random
+    from utils.metrics import ALL, MetricsRegistry, QuantileSketch, RateMeter
+    
+    # Sketch: erro relativo <= 1% em qualquer quantil, mesmo após merge
+    rng = random.Random(7)
+    values = sorted(rng.lognormvariate(4, 1) for _ in range(20000))
+    left, right = QuantileSketch(), QuantileSketch()
+    for i, value in enumerate(values):
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+    for q in (0.5, 0.95, 0.99):
+        exact = values[int(q * (len(values) - 1))]
+        assert abs(left.quantile(q) - exact) / exact <= 0.011, (q, left.quantile(q), exact)
+    assert left.count == len(values) and left.quantile(1.0) == values[-1]
+    
+    # Taxas EWMA com relógio controlado: 60 eventos/min estáveis, depois silêncio
+    now = [0.0]
+    meter = RateMeter(clock=lambda: now[0])
+    for i in range(600):
+        now[0] = i + 0.5
+        meter.mark()
+    rates = meter.rates()
+    assert abs(rates["1m"] - 60) < 1 and abs(rates["15m"] - 60) < 1, rates
+    now[0] += 300
+    rates = meter.rates()
+    assert rates["1m"] < 1 < rates["5m"] < rates["15m"] < 60, rates
+    
+    registry = MetricsRegistry(clock=lambda: now[0])
+    registry.observe("tool", "search", 10.0)
+    registry.observe("tool", "analyze", 30.0)
+    assert registry.series("tool", ALL)["count"] == 2
+    assert registry.series("tool", "search")["p95_ms"] == 10.0
+    first = registry.snapshot()
+    assert registry.snapshot()["latency"]["tool"]["search"] is first["latency"]["tool"]["search"]
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        logger.log_agent_start("flamengo", "s1", "u1", "pergunta")
+        logger.log_agent_response("flamengo", "s1", "resposta", 100.0, "c1")
+        logger.log_agent_response("flamengo", "s1", "resposta", 300.0, "c1")
+        logger.log_tool_execution("flamengo", "search", {}, {}, 50.0)
+        logger.log_a2a_message("supervisor", "flamengo", "debate", {}, "c1", duration_ms=20.0)
+        
+        metrics = logger.get_performance_metrics()
+        # Média sobre os 4 eventos cronometrados, não sobre os 5 eventos totais
+        assert metrics["avg_response_time"] == (100 + 300 + 50 + 20) / 4
+        agent = metrics["latency"]["agent"]["flamengo"]
+        assert agent["count"] == 2 and 99 <= agent["p50_ms"] <= 101 and agent["max_ms"] == 300.0
+        assert metrics["latency"]["tool"]["search"]["count"] == 1
+        assert metrics["latency"]["a2a_route"]["supervisor->flamengo"]["count"] == 1
+        assert metrics["rates"]["events"]["count"] == 5
+        logger.shutdown()
+    
+    print("✅ Métricas pré-agregadas funcionando!")
+
+def test_metrics_endpoint():
+    """Testa /metrics: contadores HTTP, histogramas de /run e tools, sessões e caches"""
+    print("📡 Testando endpoint /metrics...")
+    
+    from flask import Flask, jsonify
+    from utils.a2a_server import CONTENT_TYPE, instrument_a2a_app, register_cache
+    from utils.fact_index import FactIndex
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        app = Flask(__name__)
+        stats = instrument_a2a_app(app, "flamengo", logger=logger)
+        index = FactIndex({"titulos": {"libertadores": "3"}})
+        register_cache(app, "fact_index", index.cache_stats)
+        index.search_many(["libertadores", "libertadores mundial"])
+        
+        @app.route("/run", methods=["POST"])
+        def run_agent():
+            assert stats.in_flight == 1
+            logger.log_agent_start("flamengo", "s1", "u1", "oi")
+            logger.log_tool_execution("flamengo", "search", {}, "ok", 40.0)
+            return jsonify({"response": "ok"})
+        
+        client = app.test_client()
+        for _ in range(3):
+            assert client.post("/run", json={"prompt": "oi"}).status_code == 200
+        assert client.get("/inexistente").status_code == 404
+        
+        response = client.get("/metrics")
+        assert response.status_code == 200 and response.headers["Content-Type"] == CONTENT_TYPE
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if line and not line.startswith("#"):
+                key, value = line.rsplit(" ", 1)
+                samples[key] = float(value)
+        
+        assert samples['flaflu_http_requests_total{agent="flamengo",method="POST",path="/run",status="200"}'] == 3
+        assert samples['flaflu_http_requests_total{agent="flamengo",method="GET",path="<unmatched>",status="404"}'] == 1
+        # O próprio scrape ainda está em andamento
+        assert samples['flaflu_http_requests_in_flight{agent="flamengo"}'] == 1
+        assert samples['flaflu_http_request_duration_seconds_count{agent="flamengo",path="/run"}'] == 3
+        assert samples['flaflu_http_request_duration_seconds_bucket{agent="flamengo",path="/run",le="+Inf"}'] == 3
+        assert samples['flaflu_tool_duration_seconds_bucket{tool="search",le="0.025"}'] == 0
+        assert samples['flaflu_tool_duration_seconds_bucket{tool="search",le="0.05"}'] == 3
+        assert abs(samples['flaflu_tool_duration_seconds_sum{tool="search"}'] - 0.12) < 1e-9
+        assert samples["flaflu_sessions_created_total"] == 3 and samples["flaflu_sessions_active"] == 1
+        # Caches do agente (não o pool interno de strings do logger)
+        assert samples['flaflu_cache_hits_total{cache="fact_index"}'] == 0
+        assert samples['flaflu_cache_misses_total{cache="fact_index"}'] == 2
+        index.search("mundial")
+        assert 'flaflu_cache_hit_ratio{cache="fact_index"} 0.3333333333333333' in client.get("/metrics").get_data(as_text=True)
+        assert not any("string_pool" in key for key in samples)
+        assert stats.snapshot()[0] == 0
+        logger.shutdown()
+    
+    print("✅ Endpoint /metrics funcionando!")
+
+def test_distributed_tracing():
+    """Testa propagação traceparent até o servidor A2A, spans de tools e export com caminho crítico"""
+    print("🧵 Testando rastreamento distribuído...")
+    
+    from flask import Flask, jsonify
+    from utils.a2a_server import instrument_a2a_app
+    from utils.tracing import (collect_trace, critical_path, inject_headers, parse_traceparent,
+                               start_span, to_chrome_trace, trace_store)
+    
+    assert parse_traceparent("00-" + "a" * 32 + "-" + "b" * 16 + "-01") == ("a" * 32, "b" * 16)
+    assert parse_traceparent("00-" + "0" * 32 + "-" + "b" * 16 + "-01") is None
+    assert parse_traceparent("lixo") is None and inject_headers() == {}
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        app = Flask(__name__)
+        instrument_a2a_app(app, "researcher", logger=logger)
+        
+        @app.route("/run", methods=["POST"])
+        def run_agent():
+            correlation_id = logger.log_agent_start("researcher", "s1", "u1", "pesquisa")
+            time.sleep(0.01)
+            logger.log_tool_execution("researcher", "search", {}, "ok", 5.0)
+            return jsonify({"correlation_id": correlation_id})
+        
+        client = app.test_client()
+        with start_span("debate.turn", service="app") as turn:
+            with start_span("a2a supervisor->researcher", service="orchestrator"):
+                response = client.post("/run", json={"prompt": "oi"}, headers=inject_headers())
+            with start_span("supervisor.summary"):
+                time.sleep(0.002)
+        
+        # O correlation_id dos logs do servidor é o trace_id do turno
+        assert response.get_json()["correlation_id"] == turn.trace_id
+        assert len(logger.get_agent_flow("", correlation_id=turn.trace_id)) == 2
+        
+        remote = client.get(f"/traces/{turn.trace_id}").get_json()["spans"]
+        spans = collect_trace(turn.trace_id)
+        by_name = {span["name"]: span for span in spans}
+        assert remote and {span["span_id"] for span in remote} <= {span["span_id"] for span in spans}
+        assert by_name["POST /run"]["parent_id"] == by_name["a2a supervisor->researcher"]["span_id"]
+        assert by_name["POST /run"]["service"] == "researcher"
+        assert by_name["tool.search"]["parent_id"] == by_name["POST /run"]["span_id"]
+        
+        path = critical_path(spans)
+        names = [next(span["name"] for span in spans if span["span_id"] == span_id) for span_id in path]
+        assert names[:3] == ["debate.turn", "supervisor.summary", "a2a supervisor->researcher"]
+        assert "POST /run" in names
+        
+        trace = to_chrome_trace(spans)
+        complete = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+        assert len(complete) == len(spans) + len(path)
+        assert trace["otherData"]["critical_path"] == names
+        assert all(event["dur"] >= 0 for event in complete)
+        json.dumps(trace)
+        trace_store.clear()
+        logger.shutdown()
+    
+    print("✅ Rastreamento distribuído funcionando!")
+
+def test_tool_instrumentation():
+    """Testa instrument_tool: duração, tamanhos, exceções, assinatura preservada e desligamento"""
+    print("🔧 Testando instrumentação de tools...")
+    
+    import inspect
+    import os
+    from utils.tool_instrumentation import TOOL_METRICS_ENV, instrument_tool
+    
+    def fact_check_tool(claim: str) -> str:
+        """Verifica uma afirmação"""
+        if claim == "erro":
+            raise ValueError("afirmação inválida")
+        return "✅ " + claim
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        
+        # Desligada: a própria função, sem nenhum custo por chamada
+        assert instrument_tool(fact_check_tool, "researcher", logger=logger, enabled=False) is fact_check_tool
+        previous = os.environ.get(TOOL_METRICS_ENV)
+        os.environ[TOOL_METRICS_ENV] = "0"
+        try:
+            assert instrument_tool(fact_check_tool, "researcher", logger=logger) is fact_check_tool
+        finally:
+            if previous is None:
+                del os.environ[TOOL_METRICS_ENV]
+            else:
+                os.environ[TOOL_METRICS_ENV] = previous
+        
+        tool = instrument_tool(fact_check_tool, "researcher", logger=logger, enabled=True)
+        assert tool.__name__ == "fact_check_tool" and tool.__doc__ == fact_check_tool.__doc__
+        assert list(inspect.signature(tool).parameters) == ["claim"]
+        
+        assert tool(claim="Flamengo tem 8 títulos") == "✅ Flamengo tem 8 títulos"
+        assert tool("é" * 300).startswith("✅")
+        try:
+            tool(claim="erro")
+            raise AssertionError("exceção deveria ser propagada")
+        except ValueError:
+            pass
+        
+        metrics = logger.get_performance_metrics()
+        assert metrics["latency"]["tool"]["fact_check_tool"]["count"] == 3
+        args = metrics["sizes"]["tool_args"]["fact_check_tool"]
+        assert args["count"] == 3 and args["max_bytes"] == 600
+        assert metrics["sizes"]["tool_result"]["fact_check_tool"]["count"] == 2
+        assert metrics["counters"]["tool_errors"]["fact_check_tool"] == 1
+        assert metrics["errors"] == 1
+        
+        executions = logger.get_recent_logs(limit=10, category=LogCategory.TOOL_EXECUTION)
+        assert len(executions) == 3
+        # Argumentos longos entram no log apenas como prévia
+        assert all(len(entry["details"]["parameters"].get("args", [""])[0]) <= 103 for entry in executions)
+        logger.shutdown()
+    
+    print("✅ Instrumentação de tools funcionando!")
+
+def test_log_policy():
+    """Testa limiares por categoria, amostragem e contagem de eventos suprimidos"""
+    print("🎚️ Testando política de emissão de logs...")
+    
+    from utils.log_policy import LogPolicy, ProbabilisticSampler, RateLimitSampler
+    
+    policy = LogPolicy.from_env({
+        "FLAFLU_LOG_LEVEL": "info",
+        "FLAFLU_LOG_LEVELS": "session=WARNING, agent=DEBUG",
+        "FLAFLU_LOG_SAMPLE": "session_create=0.1,adk_processing_start=5/s",
+    })
+    assert policy.describe() == {
+        "level": "INFO",
+        "category_levels": {"session": "WARNING", "agent": "DEBUG"},
+        "sampling": {"session_create": 0.1, "adk_processing_start": "5/s"},
+    }
+    assert isinstance(policy.samplers["adk_processing_start"], RateLimitSampler)
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir, policy=LogPolicy(level="INFO", category_levels={"session": "WARNING"}))
+        assert not logger.is_enabled(LogLevel.DEBUG, LogCategory.SYSTEM)
+        assert not logger.is_enabled(LogLevel.INFO, LogCategory.SESSION)
+        assert logger.is_enabled(LogLevel.WARNING, LogCategory.SESSION)
+        assert logger.is_enabled(LogLevel.AGENT_ACTION, LogCategory.AGENT)
+        
+        logger.log(LogLevel.DEBUG, LogCategory.SYSTEM, "detalhe", event_type="debug_detail")
+        logger.log(LogLevel.INFO, LogCategory.SESSION, "sessão", event_type="session_create")
+        correlation_id = logger.log_agent_start("flamengo", "s1", "u1", "oi")
+        logger.log(LogLevel.WARNING, LogCategory.SESSION, "sessão lenta", event_type="session_slow")
+        assert logger.suppressed == {"debug_detail": 1, "session_create": 1}
+        assert [entry["event_type"] for entry in logger.get_recent_logs(limit=10)] == ["session_slow", "agent_start"]
+        assert correlation_id
+        
+        # Amostragem: taxa 0 descarta tudo abaixo de WARNING, erros nunca são amostrados
+        logger.set_policy(LogPolicy(sampling={"agent_start": ProbabilisticSampler(0.0),
+                                              "tool_call": "0", "a2a_burst": RateLimitSampler(2)}))
+        for i in range(5):
+            logger.log_agent_start("flamengo", f"s{i}", "u1", "oi")
+            logger.log(LogLevel.ERROR, LogCategory.SYSTEM, "falhou", event_type="tool_call")
+            logger.log(LogLevel.INFO, LogCategory.A2A_PROTOCOL, "rajada", event_type="a2a_burst")
+        assert logger.suppressed["agent_start"] == 5
+        assert logger.suppressed["a2a_burst"] == 3
+        assert "tool_call" not in logger.suppressed
+        
+        metrics = logger.get_performance_metrics()
+        # Sessões contadas mesmo com agent_start amostrado
+        assert metrics["session_count"] == 6
+        assert metrics["suppressed_events"]["agent_start"] == 5
+        assert metrics["log_policy"]["sampling"]["tool_call"] == 0.0
+        logger.shutdown()
+    
+    print("✅ Política de emissão de logs funcionando!")
+
+def test_lazy_entry_path():
+    """Testa IDs de correlação por contador, detalhes serializados sob demanda e busca textual tardia"""
+    print("⚡ Testando caminho barato de registro...")
+    
+    from utils.enhanced_logger import _correlation_ids
+    
+    first, second = _correlation_ids.next(), _correlation_ids.next()
+    prefix, _, counter = first.rpartition("-")
+    assert second == f"{prefix}-{int(counter, 16) + 1:x}"
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = EnhancedLogger(log_dir=log_dir)
+        ids = {logger.log(LogLevel.INFO, LogCategory.SYSTEM, f"evento {i}") for i in range(50)}
+        assert len(ids) == 50 and all(i.startswith(prefix) for i in ids)
+        
+        entry = CompactLogEntry(ts=time.time(), level="INFO", category="system", agent_name=None,
+                                session_id=None, user_id=None, event_type="lazy", message="m",
+                                details={"quando": datetime(2025, 1, 1), "placar": 3})
+        assert entry._details_blob is None
+        assert entry.details == {"quando": "2025-01-01 00:00:00", "placar": 3}
+        assert entry._details is None and isinstance(entry.details_blob, bytes)
+        
+        logger.log(LogLevel.INFO, LogCategory.AGENT, "Mengão campeão", agent_name="flamengo",
+                   details={"titulo": "libertadores"})
+        assert [e["message"] for e in logger.search_logs("libertadores")] == ["Mengão campeão"]
+        assert logger.text_indexed_seq == logger.entries.next_seq
+        
+        # Serialização e tokenização ficam para a thread do escritor, sem busca pendente
+        logger.flush()
+        logger.log(LogLevel.INFO, LogCategory.AGENT, "Nova libertadores", agent_name="flamengo",
+                   details={"fase": "final"})
+        assert logger.entries.get(logger.entries.next_seq - 1)._details_blob is None
+        logger.flush()
+        assert logger.entries.get(logger.entries.next_seq - 1)._details_blob is not None
+        assert logger.text_indexed_seq == logger.entries.next_seq
+        assert len(logger.search_logs("libertadores agent:flamengo")) == 2
+        
+        # Busca com 100k entradas já indexadas pelo escritor não refaz a tokenização
+        for i in range(100000):
+            logger.log(LogLevel.INFO, LogCategory.SYSTEM, f"evento {i}", details={"rodada": i % 38})
+        logger.flush(timeout=60)
+        assert logger.text_indexed_seq == logger.entries.next_seq
+        started = time.perf_counter()
+        assert [e["message"] for e in logger.search_logs("evento 99999")] == ["evento 99999"]
+        assert time.perf_counter() - started < 0.05
+        logger.shutdown()
+    
+    print("✅ Caminho barato de registro funcionando!")
+
+def test_log_shipping():
+    """Testa o envio de logs de outro processo para o agregador via socket Unix"""
+    print("🛰️ Testando agregação de logs entre processos...")
+    
+    import os
+    from utils.log_shipping import SOCKET_ENV, SOURCE_ENV, LogAggregator, LogShipper
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        path = os.path.join(log_dir, "agg.sock")
+        dashboard = EnhancedLogger(log_dir=os.path.join(log_dir, "dashboard"))
+        
+        # Sem agregador os frames aguardam na fila limitada
+        shipper = LogShipper(path, source="teste", retry_interval=0.0, max_backlog=2)
+        shipper.write_batch([(time.time(), b"x"), (time.time(), b"y"), (time.time(), b"z")])
+        assert not shipper.connected and shipper.backlog == 2 and shipper.stats["dropped"] == 1
+        
+        aggregator = LogAggregator(path, dashboard.ingest_record).start()
+        previous = {key: os.environ.get(key) for key in (SOCKET_ENV, SOURCE_ENV)}
+        os.environ[SOCKET_ENV] = path
+        os.environ[SOURCE_ENV] = "flamengo_agent"
+        try:
+            agent_logger = EnhancedLogger(log_dir=os.path.join(log_dir, "flamengo"))
+        finally:
+            for key, value in previous.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        
+        try:
+            correlation_id = agent_logger.log_agent_start("flamengo", "s1", "u1", "Mengão")
+            agent_logger.log_tool_execution("flamengo", "get_flamengo_facts", {"topic": "títulos"}, "8 Brasileirões", 12.0)
+            agent_logger.log_agent_response("flamengo", "s1", "Somos maiores", 40.0, correlation_id)
+            agent_logger.flush()
+            
+            deadline = time.time() + 5
+            while dashboard.metrics["total_events"] < 3 and time.time() < deadline:
+                time.sleep(0.01)
+            
+            assert agent_logger.get_performance_metrics()["log_shipping"]["shipped"] == 3
+            flow = dashboard.get_agent_flow("s1")
+            assert [e["event_type"] for e in flow] == ["agent_start", "agent_response"]
+            assert flow[0]["correlation_id"] == correlation_id
+            assert flow[0]["thread_id"].startswith("flamengo_agent/")
+            
+            metrics = dashboard.get_performance_metrics()
+            assert metrics["session_count"] == 1
+            assert metrics["latency"]["tool"]["get_flamengo_facts"]["count"] == 1
+            assert metrics["latency"]["agent"]["flamengo"]["count"] == 1
+            assert dashboard.search_logs("brasileirões")[0]["event_type"] == "tool_execution"
+            
+            sources = aggregator.snapshot()
+            assert sources["flamengo_agent"]["entries"] == 3 and sources["flamengo_agent"]["connected"]
+        finally:
+            agent_logger.shutdown()
+            aggregator.close()
+            dashboard.shutdown()
+        assert not os.path.exists(path)
+    
+    # Envio parcial: só os frames que não chegaram inteiros ao agregador são reenviados
+    class PartialSocket:
+        def __init__(self, sock):
+            self.sock = sock
+            self.calls = 0
+        
+        def send(self, data):
+            self.calls += 1
+            if self.calls > 1:
+                raise OSError("conexão interrompida")
+            return self.sock.send(data[:len(data) // 2])
+        
+        def close(self):
+            self.sock.close()
+    
+    with tempfile.TemporaryDirectory() as log_dir:
+        path = os.path.join(log_dir, "agg.sock")
+        received = []
+        aggregator = LogAggregator(path, lambda source, ts, payload: received.append(payload)).start()
+        shipper = LogShipper(path, source="parcial", retry_interval=0.0)
+        try:
+            shipper.write_batch([(time.time(), b"p0")])
+            assert shipper.connected
+            shipper._sock = PartialSocket(shipper._sock)
+            shipper.write_batch([(time.time(), f"p{i}".encode("utf-8")) for i in range(1, 5)])
+            assert not shipper.connected and 0 < shipper.backlog < 4 and shipper.stats["send_errors"] == 1
+            shipper.write_batch([(time.time(), b"p5")])
+            assert shipper.backlog == 0
+            
+            deadline = time.time() + 5
+            while len(received) < 6 and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            assert sorted(received) == [f"p{i}".encode("utf-8") for i in range(6)]
+            assert shipper.stats["shipped"] == 6
+        finally:
+            shipper.close()
+            aggregator.close()
+    
+    # Lotes de processos diferentes chegam depois da entrada local e intercalados no tempo
+    with tempfile.TemporaryDirectory() as log_dir:
+        dashboard = EnhancedLogger(log_dir=os.path.join(log_dir, "dashboard"))
+        remote = EnhancedLogger(log_dir=os.path.join(log_dir, "remoto"))
+        for i in range(4):
+            remote.log(LogLevel.INFO, LogCategory.SYSTEM, f"remoto {i}", session_id="s2")
+        records = [entry.to_segment_record()[1] for entry in remote.entries.iter_oldest()]
+        base = time.time() - 10
+        dashboard.log(LogLevel.INFO, LogCategory.SYSTEM, "local", session_id="s2")
+        for i in (1, 3, 0, 2):
+            dashboard.ingest_record("a" if i % 2 else "b", base + i, records[i])
+        
+        expected = [f"remoto {i}" for i in range(4)] + ["local"]
+        assert [e["message"] for e in dashboard.get_agent_flow("s2")] == expected
+        window = dashboard.iter_export_records((base - 1, time.time() + 1), source="memory")
+        assert [record["message"] for record in window] == expected
+        window = dashboard.iter_export_records((base + 0.5, base + 2.5), source="memory")
+        assert [record["message"] for record in window] == ["remoto 1", "remoto 2"]
+        remote.shutdown()
+        dashboard.shutdown()
+    
+    print("✅ Agregação de logs entre processos funcionando!")
+
+def test_lazy_startup():
+    """Testa a inicialização preguiçosa: logger sem I/O até a primeira gravação e ADK só no uso do LLM"""
+    print("🚀 Testando inicialização preguiçosa...")
+    
+    import os
+    import subprocess
+    import sys
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        log_dir = Path(tmp) / "logs"
+        logger = EnhancedLogger(log_dir=str(log_dir))
+        assert not log_dir.exists() and logger.writer._thread is None
+        assert logger.flush()
+        
+        logger.log(LogLevel.INFO, LogCategory.SYSTEM, "primeira entrada")
+        logger.flush()
+        assert logger.writer._thread is not None
+        assert list(log_dir.glob("system_*.log"))
+        logger.shutdown()
+    
+    # Processo novo: servidor A2A pronto e rota /run atendida sem importar google.adk / google.genai
+    script = (
+        "import sys\n"
+        "from flamengo_agent.agent import create_a2a_server\n"
+        "app = create_a2a_server()\n"
+        "response = app.test_client().post('/run', json={'prompt': 'argumento inicial'})\n"
+        "assert response.status_code == 200, response.status_code\n"
+        "assert not [m for m in sys.modules if m.startswith(('google.adk', 'google.genai'))]\n"
+    )
+    completed = subprocess.run([sys.executable, "-c", script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                               capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    
+    print("✅ Inicialização preguiçosa funcionando!")
+
+def test_process_supervisor():
+    """Testa o supervisor: partida paralela, sondagem com backoff e reinício exponencial após quedas"""
+    print("🧭 Testando supervisor de processos...")
+    
+    import sys
+    from utils.process_supervisor import READY, AgentSpec, ProcessSupervisor
+    
+    probes = {"sleepy": 0}
+    
+    def probe(spec):
+        # Fica pronto na terceira sondagem
+        probes[spec.name] = probes.get(spec.name, 0) + 1
+        return spec.name == "sleepy" and probes["sleepy"] >= 3
+    
+    specs = [
+        AgentSpec("sleepy", "", 0, command=[sys.executable, "-c", "import time; time.sleep(30)"]),
+        AgentSpec("crashy", "", 0, command=[sys.executable, "-c", "raise SystemExit(3)"]),
+    ]
+    reports = []
+    supervisor = ProcessSupervisor(specs, probe=probe, probe_initial=0.01, probe_max=0.05,
+                                   restart_initial=0.05, restart_max=0.2, report=reports.append)
+    try:
+        start = time.monotonic()
+        supervisor.start_all()
+        readiness = supervisor.wait_ready(timeout=1.0)
+        elapsed = time.monotonic() - start
+        
+        assert readiness["sleepy"] is not None and readiness["sleepy"] < 1.0
+        assert readiness["crashy"] is None and elapsed >= 1.0
+        assert probes["sleepy"] == 3
+        
+        state = supervisor.snapshot()
+        assert state["sleepy"]["state"] == READY
+        crashy = supervisor.processes["crashy"]
+        assert state["crashy"]["restarts"] >= 3 and set(state["crashy"]["exit_codes"]) == {3}
+        # Atraso de reinício dobra até o teto
+        assert crashy.restart_delay == 0.2
+        assert any("reiniciando" in message for message in reports)
+    finally:
+        supervisor.stop_all(timeout=2.0)
+    
+    assert all(proc.popen.poll() is not None for proc in supervisor.processes.values())
+    print("✅ Supervisor de processos funcionando!")
+
+def test_replica_set():
+    """Testa o balanceamento por menos requisições em andamento, a ejeção e a readmissão de réplicas"""
+    print("🧮 Testando réplicas e balanceamento...")
+    
+    import asyncio
+    import contextlib
+    import io
+    import threading
+    from flask import Flask, jsonify
+    from werkzeug.serving import make_server
+    from a2a_orchestrator_old import A2AOrchestrator
+    from utils.replica_set import ReplicaSet, parse_replicas, replica_ports
+    
+    assert parse_replicas("researcher=3, flamengo=0,lixo") == {"researcher": 3, "flamengo": 1}
+    assert replica_ports(8005, 3) == [8005, 8105, 8205]
+    
+    now = [0.0]
+    replicas = ReplicaSet(["http://a", "http://b", "http://c"], eject_after=3, ejection_base=1.0,
+                          ejection_max=4.0, clock=lambda: now[0])
+    a, b, c = replicas.replicas
+    
+    # Menos requisições em andamento vence; empates são distribuídos em rodízio
+    first, second, third = replicas.acquire(), replicas.acquire(), replicas.acquire()
+    assert {first.url, second.url, third.url} == {"http://a", "http://b", "http://c"}
+    replicas.release(b)
+    assert replicas.acquire() is b
+    for replica in (a, b, c):
+        replicas.release(replica)
+    
+    # Falha de conexão ejeta na hora, com janela exponencial até o teto
+    a.outstanding += 1
+    replicas.release(a, ok=False, connection_error=True)
+    assert a.ejected_until == 1.0 and replicas.healthy_count() == 2
+    assert all(replicas.acquire() is not a for _ in range(6))
+    for replica in (b, c):
+        replica.outstanding = 0
+    
+    # 5xx só ejeta após três falhas seguidas
+    for _ in range(2):
+        b.outstanding += 1
+        replicas.release(b, ok=False)
+    assert b.ejected_until == 0.0
+    b.outstanding += 1
+    replicas.release(b, ok=False)
+    assert b.ejected_until == 1.0 and replicas.healthy_count() == 1
+    
+    # Readmissão ao fim da janela; nova falha dobra a janela
+    now[0] = 1.5
+    assert replicas.healthy_count() == 3
+    a.outstanding += 1
+    replicas.release(a, ok=False, connection_error=True)
+    assert a.ejected_until == 1.5 + 2.0
+    
+    # Sem réplicas saudáveis, usa a que sai da ejeção primeiro; sonda saudável readmite
+    for replica in (b, c):
+        replica.outstanding += 1
+        replicas.release(replica, ok=False, connection_error=True)
+    assert replicas.healthy_count() == 0
+    assert replicas.acquire() is min((a, b, c), key=lambda replica: replica.ejected_until)
+    replicas.mark_health(c, True)
+    assert replicas.healthy_count() == 1 and replicas.snapshot()[2]["healthy"]
+    
+    # Orquestrador: a réplica morta é ejetada e o tráfego segue para a viva
+    app = Flask("replica_test")
+    
+    @app.route("/run", methods=["POST"])
+    def run():
+        return jsonify({"response": "ok"})
+    
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        orchestrator = A2AOrchestrator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.register_replicas("researcher", ["http://127.0.0.1:1", f"http://127.0.0.1:{server.server_port}"])
+            answers = [asyncio.run(orchestrator.send_a2a_message("flamengo", "researcher", "conduct_research",
+                                                                 {"query": "títulos"}))
+                       for _ in range(4)]
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+    dead, live = orchestrator.get_agent_status()["replicas"]["researcher"]
+    # A primeira chamada cai na réplica morta e a nova tentativa vai para a viva
+    assert all(answer["response"] == "ok" for answer in answers)
+    assert dead["requests"] == 1 and not dead["healthy"] and live["requests"] == 4
+    
+    print("✅ Réplicas e balanceamento funcionando!")
+
+def test_prefork_workers():
+    """Testa o pré-fork: estado aquecido no pai, workers no mesmo socket e novo fork de worker que caiu"""
+    print("🍴 Testando workers pré-fork...")
+    
+    import gc
+    import os
+    import signal
+    import tempfile
+    import warnings
+    import requests
+    from flask import Flask, jsonify
+    from utils.enhanced_logger import EnhancedLogger
+    from utils.prefork import PreforkServer, memory_usage, worker_count
+    
+    assert worker_count("researcher", "researcher=4") == 4
+    assert worker_count("flamengo", "researcher=4") == 1
+    assert memory_usage().get("rss_mb", 0) > 0
+    
+    # Logger no filho: fila e thread novas, entradas pendentes do pai não são regravadas
+    logger = EnhancedLogger(log_dir=tempfile.mkdtemp())
+    logger.log(LogLevel.INFO, LogCategory.SYSTEM, "antes do fork")
+    inherited = logger.writer._core.queue
+    logger.after_fork_in_child()
+    assert logger.writer._core.queue is not inherited and logger.writer._thread is None
+    logger.log(LogLevel.INFO, LogCategory.SYSTEM, "depois do fork")
+    assert logger.flush() and logger.writer.stats["written"] >= 1
+    logger.shutdown()
+    
+    warmed = []
+    app = Flask("prefork_test")
+    
+    @app.route("/pid")
+    def pid():
+        return jsonify({"pid": os.getpid(), "warmed": len(warmed)})
+    
+    server = PreforkServer(app, 0, 2, host="127.0.0.1", warm=lambda: warmed.append("adk"),
+                           restart_delay=0.05, report=lambda message: None)
+    try:
+        with warnings.catch_warnings():
+            # Fork com as threads do pytest/logger ativas (o worker só usa o próprio estado)
+            warnings.simplefilter("ignore", DeprecationWarning)
+            server.prepare()
+            url = f"http://127.0.0.1:{server.server.port}/pid"
+            for index in (1, 2):
+                server.spawn(index)
+            deadline = time.monotonic() + 10
+            while len(server.ready) < 2 and time.monotonic() < deadline:
+                server.poll(0.1)
+            assert set(server.ready) == {1, 2} and warmed == ["adk"]
+            assert all(ready["ready_ms"] < 1000 for ready in server.ready.values())
+            
+            answers = [requests.get(url, timeout=5).json() for _ in range(20)]
+            assert all(answer["warmed"] == 1 for answer in answers)
+            assert {answer["pid"] for answer in answers} <= set(server.pids)
+            
+            # Worker morto volta por fork, sem novo aquecimento
+            victim = next(pid for pid, index in server.pids.items() if index == 1)
+            os.kill(victim, signal.SIGKILL)
+            deadline = time.monotonic() + 10
+            while (victim in server.pids or len(server.pids) < 2) and time.monotonic() < deadline:
+                server.poll(0.05)
+            assert victim not in server.pids and sorted(server.pids.values()) == [1, 2]
+            assert requests.get(url, timeout=5).json()["warmed"] == 1 and warmed == ["adk"]
+    finally:
+        server.stop(timeout=5)
+        gc.unfreeze()
+    assert not server.pids
+    
+    print("✅ Workers pré-fork funcionando!")
+
+def test_single_flight():
+    """Testa a coalescência: chamadas idênticas concorrentes compartilham uma execução e são contadas"""
+    print("🛫 Testando single-flight...")
+    
+    import asyncio
+    import contextlib
+    import io
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from flask import Flask, jsonify
+    from werkzeug.serving import make_server
+    from a2a_orchestrator_old import A2AOrchestrator
+    from utils.metrics import COALESCED, MetricsRegistry
+    from utils.single_flight import SingleFlight
+    
+    def wait_for(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.005)
+        assert condition()
+    
+    registry = MetricsRegistry()
+    flight = SingleFlight("teste", registry)
+    release = threading.Event()
+    executions = []
+    
+    def slow():
+        executions.append(1)
+        release.wait(5)
+        return {"dados": 42}
+    
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(flight.do, "consulta", slow) for _ in range(5)]
+        wait_for(lambda: flight.stats["calls"] == 5)
+        assert flight.in_flight() == 1
+        release.set()
+        outcomes = [future.result() for future in futures]
+    assert len(executions) == 1
+    assert all(result is outcomes[0][0] for result, _ in outcomes)
+    assert sorted(shared for _, shared in outcomes) == [False, True, True, True, True]
+    assert flight.snapshot() == {"calls": 5, "executions": 1, "collapsed": 4, "wait_timeouts": 0, "in_flight": 0}
+    assert registry.counters()[(COALESCED, "teste")] == 4
+    
+    # Exceção da execução chega a todas as chamadas coalescidas; depois dela, nova execução
+    release.clear()
+    
+    def failing():
+        release.wait(5)
+        raise ValueError("agente fora")
+    
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(flight.do, "falha", failing) for _ in range(3)]
+        wait_for(lambda: flight.stats["calls"] == 8)
+        release.set()
+        errors = [future.exception() for future in futures]
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert flight.do("consulta", lambda: "nova")[0] == "nova"
+    
+    # Execução travada: quem espera desiste após o timeout e faz a própria chamada
+    release.clear()
+    stuck = threading.Thread(target=flight.do, args=("travada", lambda: release.wait(5)))
+    stuck.start()
+    wait_for(lambda: flight.in_flight() == 1)
+    started = time.monotonic()
+    assert flight.do("travada", lambda: "própria", timeout=0.05) == ("própria", False)
+    assert time.monotonic() - started < 1 and flight.stats["wait_timeouts"] == 1
+    release.set()
+    stuck.join(5)
+    
+    # Orquestrador: a mesma pesquisa pedida por 4 debates vira um único POST /run
+    hits = []
+    gate = threading.Event()
+    app = Flask("single_flight_test")
+    
+    @app.route("/run", methods=["POST"])
+    def run():
+        hits.append(1)
+        gate.wait(5)
+        return jsonify({"response": "8 títulos"})
+    
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        orchestrator = A2AOrchestrator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.register_replicas("researcher", [f"http://127.0.0.1:{server.server_port}"])
+            
+            def send(sender):
+                return asyncio.run(orchestrator.send_a2a_message(sender, "researcher", "conduct_research",
+                                                                 {"query": "títulos brasileiros"}))
+            
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                futures = [pool.submit(send, sender) for sender in ("flamengo", "fluminense", "flamengo", "supervisor")]
+                wait_for(lambda: orchestrator.run_flight.stats["calls"] == 4)
+                gate.set()
+                answers = [future.result() for future in futures]
+            # Terminada a execução, a mesma consulta volta a ir ao agente (não é cache)
+            again = send("flamengo")
+            other = asyncio.run(orchestrator.send_a2a_message("flamengo", "researcher", "conduct_research",
+                                                              {"query": "libertadores"}))
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+    assert len(hits) == 3  # 1 coalescido + 2 consultas sequenciais
+    assert [answer["to_agent"] for answer in answers] == ["flamengo", "fluminense", "flamengo", "supervisor"]
+    assert all(answer["response"] == "8 títulos" for answer in answers + [again, other])
+    assert orchestrator.get_agent_status()["single_flight"]["orchestrator:/run"]["collapsed"] == 3
+    
+    print("✅ Single-flight funcionando!")
+
+def test_admission_control():
+    """Testa a admissão: vagas limitadas, fila FIFO com tempo máximo e 429 com Retry-After quando saturado"""
+    print("🚦 Testando controle de admissão...")
+    
+    import threading
+    from flask import Flask, jsonify
+    from utils.a2a_server import instrument_a2a_app
+    from utils.admission import QUEUE_FULL, QUEUE_TIMEOUT, AdmissionController, install_admission_control
+    from utils.enhanced_logger import enhanced_logger
+    from utils.metrics import ADMISSION_QUEUE, ADMISSION_REJECTED, ADMISSION_WAIT, MetricsRegistry
+    
+    assert AdmissionController.from_env("x", environ={"FLAFLU_ADMISSION": "max_in_flight=8,queue_timeout=0.5"}).snapshot()[
+        "max_in_flight"] == 8
+    
+    registry = MetricsRegistry()
+    controller = AdmissionController("teste", max_in_flight=1, max_queue=1, queue_timeout=0.2, registry=registry)
+    assert controller.acquire() == (True, 0.0, None)
+    
+    # Segunda espera na fila; terceira é recusada na hora (fila cheia)
+    queued = []
+    waiter = threading.Thread(target=lambda: queued.append(controller.acquire()))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while controller.queue_depth == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert registry.gauges()[(ADMISSION_QUEUE, "teste")] == 1
+    start = time.monotonic()
+    assert controller.acquire()[::2] == (False, QUEUE_FULL) and time.monotonic() - start < 0.05
+    
+    # Vaga liberada passa direto para a primeira da fila
+    time.sleep(0.02)
+    controller.release(0.04)
+    waiter.join(5)
+    admitted, waited_ms, _ = queued[0]
+    assert admitted and waited_ms >= 20 and controller.in_flight == 1
+    assert registry.series(ADMISSION_WAIT, "teste")["count"] == 1
+    
+    # Sem vaga dentro de queue_timeout: recusa por tempo esgotado
+    admitted, waited_ms, reason = controller.acquire()
+    assert not admitted and reason == QUEUE_TIMEOUT and waited_ms >= 200
+    controller.release()
+    assert controller.snapshot()["in_flight"] == 0 and controller.retry_after() >= 1
+    assert registry.counters()[(ADMISSION_REJECTED, "teste")] == 2
+    
+    # Servidor: /run saturado responde 429 com Retry-After; outras rotas não passam pela admissão
+    gate = threading.Event()
+    app = Flask("admission_test")
+    instrument_a2a_app(app, "admission_test")
+    install_admission_control(app, AdmissionController("admission_test", max_in_flight=1, max_queue=0,
+                                                       registry=enhanced_logger.registry))
+    
+    @app.route("/run", methods=["POST"])
+    def run():
+        gate.wait(5)
+        return jsonify({"response": "ok"})
+    
+    busy = []
+    first = threading.Thread(target=lambda: busy.append(app.test_client().post("/run", json={"prompt": "a"})))
+    first.start()
+    deadline = time.monotonic() + 5
+    while app.extensions["admission"].in_flight == 0 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    client = app.test_client()
+    rejected = client.post("/run", json={"prompt": "b"})
+    assert rejected.status_code == 429 and int(rejected.headers["Retry-After"]) >= 1
+    assert rejected.get_json()["reason"] == QUEUE_FULL
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert 'flaflu_admission_rejected_total{agent="admission_test"} 1' in metrics
+    assert 'flaflu_admission_in_flight{agent="admission_test"} 1' in metrics
+    gate.set()
+    first.join(5)
+    assert busy[0].status_code == 200 and app.extensions["admission"].in_flight == 0
+    
+    print("✅ Controle de admissão funcionando!")
+
+def test_llm_rate_limiter():
+    """Testa a cota do LLM: baldes RPM/TPM, reservas por prioridade, prazo, estado entre processos e callbacks do ADK"""
+    print("🪣 Testando limitador de cota do LLM...")
+    
+    import os
+    from benchmarks.stub_model import install_stub_model
+    from researcher_agent.agent import create_researcher_agent
+    from utils.metrics import LLM_QUOTA_TIMEOUTS, LLM_QUOTA_WAIT, MetricsRegistry
+    from utils.rate_limiter import (
+        PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, RateLimitTimeout, TokenBucketLimiter, agent_priority,
+        set_llm_limiter,
+    )
+    
+    assert agent_priority("supervisor") == agent_priority("Supervisor") == PRIORITY_HIGH
+    assert agent_priority("Torcedor Fluminense") == PRIORITY_NORMAL
+    assert agent_priority("Pesquisador") == agent_priority("researcher") == PRIORITY_LOW
+    
+    now = [1000.0]
+    clock = lambda: now[0]
+    def sleep(seconds):
+        now[0] += seconds
+    
+    # 10 RPM: a classe baixa para em 7 (reserva de 30%), a normal em 9 e a alta esgota o balde
+    registry = MetricsRegistry()
+    limiter = TokenBucketLimiter(rpm=10, tpm=100_000, registry=registry, clock=clock, sleep=sleep)
+    granted = {priority: 0 for priority in (PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH)}
+    for priority in granted:
+        while not limiter.try_acquire(100, priority):
+            granted[priority] += 1
+    assert granted == {PRIORITY_LOW: 7, PRIORITY_NORMAL: 2, PRIORITY_HIGH: 1}
+    
+    # Balde vazio: espera a reposição (6s por requisição) e desiste além do prazo
+    assert abs(limiter.acquire(100, PRIORITY_HIGH) - 6.0) < 0.01
+    try:
+        limiter.acquire(100, PRIORITY_LOW, timeout=5.0)
+        assert False, "Deveria estourar o prazo"
+    except RateLimitTimeout:
+        pass
+    assert registry.series(LLM_QUOTA_WAIT, "high")["count"] == 1
+    assert registry.counters()[(LLM_QUOTA_TIMEOUTS, "low")] == 1
+    
+    # TPM: chamada grande espera tokens; o uso real menor que a estimativa devolve a diferença
+    tokens = TokenBucketLimiter(rpm=1000, tpm=6000, clock=clock, sleep=sleep)
+    assert tokens.acquire(5000, PRIORITY_HIGH) == 0.0
+    assert abs(tokens.acquire(2000, PRIORITY_HIGH) - 10.0) < 0.01
+    tokens.settle(2000, 500)
+    assert tokens.snapshot()["tokens_available"] == 1500
+    
+    # Estimativa acima da cota: consome só o balde acima da reserva e o settle parte desse valor
+    oversized = TokenBucketLimiter(rpm=1000, tpm=6000, clock=clock, sleep=sleep)
+    assert oversized.acquire(20000, PRIORITY_NORMAL) == 0.0
+    charged = oversized.charged_tokens(20000, PRIORITY_NORMAL)
+    assert charged == 5400 and oversized.snapshot()["tokens_available"] == 600
+    oversized.settle(charged, 1000)
+    assert oversized.snapshot()["tokens_available"] == 5000
+    
+    # Estado em arquivo: dois limitadores (processos) dividem a mesma cota
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "quota.json")
+        first = TokenBucketLimiter(rpm=4, state_path=path, clock=clock, prioritize=False)
+        second = TokenBucketLimiter(rpm=4, state_path=path, clock=clock, prioritize=False)
+        assert [first.try_acquire(10) == 0.0, second.try_acquire(10) == 0.0] == [True, True]
+        assert [first.try_acquire(10) == 0.0, second.try_acquire(10) == 0.0] == [True, True]
+        assert second.try_acquire(10) > 0 and first.snapshot()["shared"]
+    
+    # Stub: toda chamada de modelo do LlmAgent passa pelo limitador; cota esgotada vira erro do agente
+    researcher = install_stub_model(create_researcher_agent(), "researcher", total_tokens=300)
+    exhausted = TokenBucketLimiter(rpm=60, registry=registry, timeout=0.1)
+    set_llm_limiter(exhausted)
+    try:
+        while not exhausted.try_acquire(1, PRIORITY_HIGH):
+            pass
+        assert "Erro no Pesquisador" in researcher.run("Títulos do Flamengo")
+        assert exhausted.stats["timeouts"] == 1
+    
+        available = TokenBucketLimiter(rpm=60, registry=registry)
+        set_llm_limiter(available)
+        assert "RELATÓRIO DE PESQUISA" in researcher.run("Títulos do Flamengo")
+        assert available.stats["acquired"] == 1 and available.stats["tokens_settled"] == 300
+        
+        # Erro do modelo: on_model_error_callback devolve os tokens reservados, sem estimativa pendente
+        refunded = TokenBucketLimiter(rpm=60, tpm=100000, registry=registry)
+        set_llm_limiter(refunded)
+        researcher.agent.model.error = "503 indisponível"
+        assert "Erro no Pesquisador" in researcher.run("Títulos do Flamengo")
+        snapshot = refunded.snapshot()
+        assert snapshot["acquired"] == 1 and snapshot["tokens_available"] == 100000
+        assert snapshot["requests_available"] < 60
+    finally:
+        set_llm_limiter(None)
+    
+    print("✅ Limitador de cota do LLM funcionando!")
+
+def test_a2a_resilience():
+    """Testa a resiliência A2A: backoff com jitter, orçamento de tentativas, circuit breaker e hedge"""
+    print("🛡️ Testando resiliência das chamadas A2A...")
+    
+    from utils.metrics import A2A_RETRIES, CIRCUIT_REJECTED, CIRCUIT_STATE, MetricsRegistry
+    from utils.resilience import (
+        CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ResiliencePolicy, RetryBudget, backoff_delay,
+    )
+    
+    assert backoff_delay(0, 0.1, 1.0, rng=lambda: 1.0) == 0.1
+    assert backoff_delay(3, 0.1, 1.0, rng=lambda: 0.5) == 0.4
+    assert backoff_delay(10, 0.1, 1.0, rng=lambda: 1.0) == 1.0
+    assert ResiliencePolicy.from_env(environ={"FLAFLU_A2A_RESILIENCE": "attempts=5,hedge=0"}).max_attempts == 5
+    
+    # Orçamento: 20% das requisições da janela mais o mínimo por segundo
+    now = [0.0]
+    budget = RetryBudget(ratio=0.2, min_per_s=0.1, ttl=10.0, clock=lambda: now[0])
+    for _ in range(10):
+        budget.record_request()
+    assert [budget.try_retry() for _ in range(4)] == [True, True, True, False]
+    now[0] = 11.0
+    assert budget.try_retry() and budget.snapshot() == {"requests": 0, "retries": 1}
+    
+    # Circuit breaker: abre após 2 falhas, recusa, deixa uma chamada de teste e fecha com sucesso
+    registry = MetricsRegistry()
+    breaker = CircuitBreaker("researcher", failure_threshold=2, reset_timeout=5.0, registry=registry,
+                             clock=lambda: now[0])
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN and not breaker.allow()
+    now[0] += 5.0
+    assert breaker.allow() and breaker.state == HALF_OPEN and not breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    now[0] += 5.0
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED and registry.gauges()[(CIRCUIT_STATE, "researcher")] == 0
+    assert registry.counters()[(CIRCUIT_REJECTED, "researcher")] == 2
+    
+    # Novas tentativas só em chamadas idempotentes, com backoff entre elas
+    sleeps = []
+    policy = ResiliencePolicy(max_attempts=3, breaker_failures=3, registry=registry, sleep=sleeps.append,
+                              rng=lambda: 1.0)
+    outcomes = iter([500, 500, 200])
+    assert policy.call("flamengo", lambda: next(outcomes), retryable=lambda status: status >= 500) == 200
+    assert sleeps == [0.1, 0.2] and registry.counters()[(A2A_RETRIES, "flamengo")] == 2
+    
+    attempts = []
+    def failing():
+        attempts.append(1)
+        raise ConnectionError("recusada")
+    try:
+        policy.call("fluminense", failing, idempotent=False)
+        assert False, "Deveria propagar o erro"
+    except ConnectionError:
+        pass
+    assert len(attempts) == 1
+    
+    # Três falhas seguidas abrem o circuito: a próxima chamada falha sem executar
+    try:
+        policy.call("fluminense", failing)
+    except ConnectionError:
+        pass
+    assert policy.breaker("fluminense").state == OPEN and len(attempts) == 3
+    try:
+        policy.call("fluminense", failing)
+        assert False, "Circuito deveria estar aberto"
+    except CircuitOpenError:
+        pass
+    assert len(attempts) == 3 and policy.snapshot()["breakers"]["fluminense"]["state"] == OPEN
+    
+    # Hedge: a cópia enviada após o atraso responde antes da primeira, que está lenta
+    delays = iter([0.5, 0.0])
+    def attempt():
+        delay = next(delays)
+        time.sleep(delay)
+        return "lenta" if delay else "rápida"
+    start = time.monotonic()
+    assert policy.call("researcher", attempt, hedge_after=0.05) == "rápida"
+    assert time.monotonic() - start < 0.4 and policy.stats["hedges"] == policy.stats["hedge_wins"] == 1
+    
+    print("✅ Resiliência das chamadas A2A funcionando!")
+
+def test_research_batch():
+    """Testa o lote de pesquisas: índice de fatos, /run_batch, send_a2a_batch e run_batch num só pedido ao LLM"""
+    print("📦 Testando pesquisas em lote...")
+
+    import asyncio
+    import contextlib
+    import io
+    from werkzeug.serving import make_server
+    from a2a_orchestrator_old import A2AOrchestrator
+    from benchmarks.stub_model import STUB_RESPONSES, install_stub_model
+    from researcher_agent.agent import create_a2a_server, create_researcher_agent
+    from utils.fact_index import FactIndex
+    from utils.prompt_batch import combine_prompts, split_response
+    from utils.rate_limiter import TokenBucketLimiter, set_llm_limiter
+
+    # Índice: mesmo resultado da varredura termo a termo, e um lote percorre a base uma vez
+    database = {"titulos": {"brasileirao": "8 títulos", "libertadores": "3 títulos (2019)"},
+                "fundacao": "1902"}
+    index = FactIndex(database)
+    assert index.search("libertadores 1902") == ["• Libertadores: 3 títulos (2019)", "• Fundacao: 1902"]
+    assert index.search_many(["títulos", "2019", "mundial"]) == [
+        ["• Brasileirao: 8 títulos", "• Libertadores: 3 títulos (2019)"], ["• Libertadores: 3 títulos (2019)"], []
+    ]
+    assert index.stats["scans"] == 2
+    index.search_many(["títulos 2019", "libertadores"])
+    assert index.stats["scans"] == 2
+
+    # Marcadores: respostas fora de ordem são separadas; consulta sem resposta fica None
+    prompt = combine_prompts(["a", "b", "c"])
+    assert "[R1] a" in prompt and "[R3] c" in prompt
+    assert split_response("[R2] segunda\n[R1] primeira [R9] fora", 3) == ["primeira", "segunda", None]
+
+    # /run_batch: respostas na ordem das consultas (inclusive repetidas), iguais às do /run
+    researcher = install_stub_model(create_researcher_agent(), "researcher")
+    app = create_a2a_server(researcher)
+    client = app.test_client()
+    queries = ["pesquisa libertadores 2023", "estatisticas fluminense", "verificar: Flamengo 8 brasileiros",
+               "pesquisa libertadores 2023", "olá"]
+    batch = client.post("/run_batch", json={"queries": queries}).get_json()["responses"]
+    single = [client.post("/run", json={"prompt": query}).get_json()["response"] for query in queries]
+    strip_time = lambda text: "\n".join(line for line in text.splitlines() if "⏰" not in line)
+    assert [strip_time(answer) for answer in batch] == [strip_time(answer) for answer in single]
+    assert "Libertadores 2023: Fluminense campeão" in batch[0]
+
+    # Consultas gerais com use_llm: uma única chamada ao modelo para o lote
+    limiter = TokenBucketLimiter(rpm=1000)
+    set_llm_limiter(limiter)
+    try:
+        answers = client.post("/run_batch", json={"queries": ["olá", "quem é maior?", "pesquisa torcida"],
+                                                  "use_llm": True}).get_json()["responses"]
+        assert answers[:2] == [STUB_RESPONSES["researcher"]] * 2 and "RELATÓRIO DE PESQUISA" in answers[2]
+        assert limiter.stats["acquired"] == 1
+    finally:
+        set_llm_limiter(None)
+
+    # Orquestrador: um POST /run_batch para o lote todo
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        orchestrator = A2AOrchestrator(coalesce=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrator.register_replicas("researcher", [f"http://127.0.0.1:{server.server_port}"])
+            answer = asyncio.run(orchestrator.send_a2a_batch("flamengo", "researcher", "conduct_research", queries))
+    finally:
+        server.shutdown()
+        thread.join(timeout=5)
+    assert [strip_time(text) for text in answer["responses"]] == [strip_time(text) for text in single]
+    assert orchestrator.get_agent_status()["replicas"]["researcher"][0]["requests"] == 1
+
+    print("✅ Pesquisas em lote funcionando!")
+
 def main():
     """Executa todos os testes"""
     print("🚀 Iniciando testes do Sistema de Logging Aprimorado")
@@ -170,6 +1660,31 @@ def main():
     test_error_logging()
     test_search_and_retrieval()
     test_export()
+    test_async_file_writer()
+    test_writer_drops_under_overload()
+    test_ring_buffer_eviction()
+    test_compact_entry_roundtrip()
+    test_secondary_indexes()
+    test_full_text_search()
+    test_streaming_export()
+    test_binary_segments()
+    test_log_frame_cache()
+    test_rolling_metrics()
+    test_metrics_endpoint()
+    test_distributed_tracing()
+    test_tool_instrumentation()
+    test_log_policy()
+    test_lazy_entry_path()
+    test_log_shipping()
+    test_lazy_startup()
+    test_process_supervisor()
+    test_replica_set()
+    test_prefork_workers()
+    test_single_flight()
+    test_admission_control()
+    test_llm_rate_limiter()
+    test_a2a_resilience()
+    test_research_batch()
     
     print("=" * 60)
     print("🎉 Todos os testes concluídos com sucesso!")
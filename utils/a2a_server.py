@@ -0,0 +1,251 @@
+"""
+Instrumentação dos Servidores A2A (Flask)
+Contadores de requisições, requisições em andamento e endpoint /metrics no formato
+texto de exposição do Prometheus, alimentado pelas métricas do EnhancedLogger
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .enhanced_logger import enhanced_logger
+from .metrics import (
+    A2A_HEDGES, A2A_RETRIES, A2A_ROUTE, ADMISSION_IN_FLIGHT, ADMISSION_QUEUE, ADMISSION_REJECTED, ADMISSION_WAIT,
+    AGENT, CIRCUIT_REJECTED, CIRCUIT_STATE, COALESCED, HTTP, LLM_QUOTA_TIMEOUTS, LLM_QUOTA_WAIT, TOOL, TOOL_ARGS,
+    TOOL_ERRORS, TOOL_RESULT,
+)
+from .tracing import TRACEPARENT_HEADER, close_span, open_span, parse_traceparent, trace_store
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "flaflu"
+
+# Tipo de série do registry -> (nome da métrica, rótulo do nome da série, descrição, divisor da unidade)
+HISTOGRAM_METRICS = {
+    HTTP: ("http_request_duration_seconds", "path", "Latência das requisições HTTP dos servidores A2A", 1000),
+    AGENT: ("agent_duration_seconds", "agent_name", "Duração das execuções de agentes", 1000),
+    TOOL: ("tool_duration_seconds", "tool", "Duração das execuções de tools", 1000),
+    A2A_ROUTE: ("a2a_route_duration_seconds", "route", "Latência das chamadas A2A por rota", 1000),
+    TOOL_ARGS: ("tool_args_bytes", "tool", "Tamanho dos argumentos das tools", 1),
+    TOOL_RESULT: ("tool_result_bytes", "tool", "Tamanho dos resultados das tools", 1),
+    ADMISSION_WAIT: ("admission_wait_seconds", "agent", "Espera na fila de admissão do /run", 1000),
+    LLM_QUOTA_WAIT: ("llm_quota_wait_seconds", "priority", "Espera pela cota do provedor do LLM", 1000),
+}
+
+# Contadores do registry -> (nome da métrica, rótulo do nome, descrição)
+COUNTER_METRICS = {
+    TOOL_ERRORS: ("tool_errors_total", "tool", "Exceções levantadas por tools"),
+    COALESCED: ("single_flight_collapsed_total", "flight", "Chamadas idênticas que aguardaram uma execução em andamento"),
+    ADMISSION_REJECTED: ("admission_rejected_total", "agent", "Requisições recusadas com 429 (fila cheia ou espera esgotada)"),
+    LLM_QUOTA_TIMEOUTS: ("llm_quota_timeouts_total", "priority", "Chamadas ao LLM que desistiram de esperar pela cota"),
+    A2A_RETRIES: ("a2a_retries_total", "agent", "Novas tentativas de chamadas A2A"),
+    A2A_HEDGES: ("a2a_hedges_total", "agent", "Chamadas A2A repetidas em hedge em outra réplica"),
+    CIRCUIT_REJECTED: ("circuit_rejected_total", "agent", "Chamadas A2A recusadas com o circuito aberto"),
+}
+
+# Valores instantâneos do registry -> (nome da métrica, rótulo do nome, descrição)
+GAUGE_METRICS = {
+    ADMISSION_IN_FLIGHT: ("admission_in_flight", "agent", "Requisições admitidas em execução"),
+    ADMISSION_QUEUE: ("admission_queue_depth", "agent", "Requisições aguardando admissão"),
+    CIRCUIT_STATE: ("circuit_state", "agent", "Circuit breaker do agente (0 fechado, 1 meio aberto, 2 aberto)"),
+}
+
+# Rotas sem latência nem span registrados (endpoints de observabilidade)
+UNTIMED_PATHS = ("/metrics", "/traces/<trace_id>")
+
+
+class RequestStats:
+    """Contadores HTTP de um app: requisições por (método, rota, status) e em andamento"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+
+    def start(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def count(self, method: str, path: str, status: int):
+        key = (method, path, str(status))
+        with self._lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def snapshot(self) -> Tuple[int, Dict[Tuple[str, str, str], int]]:
+        with self._lock:
+            return self.in_flight, dict(self.requests)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels: Any) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+class _Exposition:
+    """Acumula famílias de métricas (HELP/TYPE uma única vez por nome)"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._declared = set()
+
+    def declare(self, name: str, kind: str, help_text: str) -> str:
+        name = f"{METRIC_PREFIX}_{name}"
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def sample(self, name: str, value: float, **labels: Any):
+        self.lines.append(f"{name}{_labels(**labels)} {value!r}")
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+def register_cache(app, name: str, cache_stats: Callable[[], Dict[str, int]]):
+    """Expõe em /metrics um cache do agente; cache_stats() retorna {"hits": ..., "misses": ...}"""
+    app.extensions.setdefault("caches", {})[name] = cache_stats
+
+
+def render_metrics(agent_name: str, stats: RequestStats, logger=enhanced_logger,
+                   caches: Optional[Dict[str, Callable[[], Dict[str, int]]]] = None) -> str:
+    """Texto de exposição Prometheus com os contadores HTTP do app, as métricas do logger e os caches do agente"""
+    out = _Exposition()
+
+    in_flight, requests = stats.snapshot()
+    name = out.declare("http_requests_total", "counter", "Requisições HTTP atendidas")
+    for (method, path, status), count in sorted(requests.items()):
+        out.sample(name, count, agent=agent_name, method=method, path=path, status=status)
+    name = out.declare("http_requests_in_flight", "gauge", "Requisições HTTP em andamento")
+    out.sample(name, in_flight, agent=agent_name)
+
+    for kind, series_name, bounds, cumulative, total in sorted(logger.registry.histograms()):
+        if kind not in HISTOGRAM_METRICS:
+            continue
+        metric, label, help_text, scale = HISTOGRAM_METRICS[kind]
+        if kind == HTTP:
+            # Séries HTTP são nomeadas "agente:rota"
+            series_agent, _, path = series_name.partition(":")
+            labels = {"agent": series_agent, "path": path}
+        else:
+            labels = {label: series_name}
+        name = out.declare(metric, "histogram", help_text)
+        for bound, count in zip(bounds, cumulative):
+            out.sample(f"{name}_bucket", count, **labels, le=repr(bound / scale))
+        out.sample(f"{name}_bucket", cumulative[-1], **labels, le="+Inf")
+        out.sample(f"{name}_sum", total / scale, **labels)
+        out.sample(f"{name}_count", cumulative[-1], **labels)
+
+    for (kind, series_name), total in sorted(logger.registry.counters().items()):
+        if kind in COUNTER_METRICS:
+            metric, label, help_text = COUNTER_METRICS[kind]
+            out.sample(out.declare(metric, "counter", help_text), total, **{label: series_name})
+
+    for (kind, series_name), value in sorted(logger.registry.gauges().items()):
+        if kind in GAUGE_METRICS:
+            metric, label, help_text = GAUGE_METRICS[kind]
+            out.sample(out.declare(metric, "gauge", help_text), value, **{label: series_name})
+
+    metrics = logger.get_performance_metrics()
+    for key, metric, help_text in (
+        ("total_events", "log_events_total", "Eventos registrados pelo EnhancedLogger"),
+        ("errors", "log_errors_total", "Eventos de nível ERROR ou CRITICAL"),
+        ("agent_executions", "agent_events_total", "Eventos da categoria agent"),
+        ("a2a_messages", "a2a_messages_total", "Mensagens A2A registradas"),
+        ("session_count", "sessions_created_total", "Sessões ADK criadas"),
+    ):
+        out.sample(out.declare(metric, "counter", help_text), metrics[key])
+    out.sample(out.declare("sessions_active", "gauge", "Sessões distintas retidas no buffer em memória"),
+               metrics["active_sessions"])
+
+    writer = metrics["file_writer"]
+    out.sample(out.declare("log_writer_pending", "gauge", "Entradas aguardando o escritor em lote"),
+               writer["pending"])
+    out.sample(out.declare("log_writer_dropped_total", "counter", "Entradas descartadas pelo escritor"),
+               writer["dropped"])
+
+    caches = sorted((cache, cache_stats()) for cache, cache_stats in (caches or {}).items())
+    hits = out.declare("cache_hits_total", "counter", "Acertos de cache")
+    for cache, cache_stats in caches:
+        out.sample(hits, cache_stats["hits"], cache=cache)
+    misses = out.declare("cache_misses_total", "counter", "Faltas de cache")
+    for cache, cache_stats in caches:
+        out.sample(misses, cache_stats["misses"], cache=cache)
+    ratio = out.declare("cache_hit_ratio", "gauge", "Proporção de acertos de cache")
+    for cache, cache_stats in caches:
+        lookups = cache_stats["hits"] + cache_stats["misses"]
+        out.sample(ratio, float(cache_stats["hits"] / lookups if lookups else 0.0), cache=cache)
+
+    return out.render()
+
+
+def instrument_a2a_app(app, agent_name: str, logger=enhanced_logger) -> RequestStats:
+    """
+    Registra hooks de contagem/latência/tracing no app Flask e expõe GET /metrics e GET /traces/<id>
+    A latência de cada rota alimenta o registry do logger (série HTTP "agente:rota");
+    requisições com cabeçalho traceparent continuam o trace de quem chamou
+    """
+    from flask import Response, g, jsonify, request
+
+    stats = RequestStats()
+    app.extensions["a2a_metrics"] = stats
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_start = time.perf_counter()
+        stats.start()
+        path = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        if path not in UNTIMED_PATHS:
+            g.trace_span, g.trace_token = open_span(
+                f"{request.method} {path}", service=agent_name,
+                parent=parse_traceparent(request.headers.get(TRACEPARENT_HEADER)),
+            )
+
+    @app.after_request
+    def _metrics_record(response):
+        start = g.pop("metrics_start", None)
+        if start is None:
+            return response
+        # Rota registrada (não o caminho bruto) para manter a cardinalidade baixa
+        path = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+        stats.count(request.method, path, response.status_code)
+        if "trace_span" in g:
+            g.trace_span.set_attribute("status", response.status_code)
+        if path not in UNTIMED_PATHS:
+            logger.registry.observe(HTTP, f"{agent_name}:{path}", (time.perf_counter() - start) * 1000)
+        g.metrics_counted = True
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc=None):
+        if g.pop("metrics_counted", False) or "metrics_start" in g:
+            g.pop("metrics_start", None)
+            stats.finish()
+        span = g.pop("trace_span", None)
+        if span is not None:
+            if exc is not None:
+                span.set_attribute("error", f"{type(exc).__name__}: {exc}"[:200])
+            close_span(span, g.pop("trace_token"))
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Métricas no formato de exposição do Prometheus"""
+        return Response(render_metrics(agent_name, stats, logger, app.extensions.get("caches")),
+                        content_type=CONTENT_TYPE)
+
+    @app.route("/traces/<trace_id>", methods=["GET"])
+    def trace_spans(trace_id: str):
+        """Spans deste servidor para um trace (consumido por utils.tracing.collect_trace)"""
+        return jsonify({"trace_id": trace_id, "service": agent_name, "spans": trace_store.get(trace_id)})
+
+    return stats
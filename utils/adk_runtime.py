@@ -0,0 +1,77 @@
+"""
+Carregamento Preguiçoso do Google ADK
+google.adk e google.genai levam cerca de 1s para importar: os wrappers dos agentes só os carregam
+no primeiro uso do LLM, e as rotas /run baseadas em tools sobem sem esse custo
+"""
+
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Iterable, Optional, Tuple
+
+
+_adk: Optional[SimpleNamespace] = None
+_adk_lock = threading.Lock()
+
+
+def load_adk() -> SimpleNamespace:
+    """Classes do ADK usadas pelos agentes (LlmAgent, FunctionTool, Runner, InMemorySessionService, types)"""
+    global _adk
+    if _adk is None:
+        with _adk_lock:
+            if _adk is None:
+                from google.adk.agents import LlmAgent
+                from google.adk.runners import Runner
+                from google.adk.sessions import InMemorySessionService
+                from google.adk.tools import FunctionTool
+                from google.genai import types
+                _adk = SimpleNamespace(LlmAgent=LlmAgent, FunctionTool=FunctionTool, Runner=Runner,
+                                       InMemorySessionService=InMemorySessionService, types=types)
+    return _adk
+
+
+def adk_loaded() -> bool:
+    return _adk is not None
+
+
+class LazyAgentWrapper:
+    """
+    Base dos wrappers dos agentes: build(adk) monta (LlmAgent, Runner, serviço de sessões)
+    no primeiro acesso a agent/runner/session_service/tools
+    tool_functions (funções já instrumentadas) não dependem do ADK
+    """
+
+    def __init__(self, name: str, description: str, tool_functions: Iterable[Callable],
+                 build: Callable[[SimpleNamespace], Tuple[Any, Any, Any]]):
+        self.name = name
+        self.description = description
+        self.tool_functions = list(tool_functions)
+        self._build = build
+        self._components: Optional[Tuple[Any, Any, Any]] = None
+        self._build_lock = threading.Lock()
+
+    def _ensure_built(self) -> Tuple[Any, Any, Any]:
+        if self._components is None:
+            with self._build_lock:
+                if self._components is None:
+                    self._components = self._build(load_adk())
+        return self._components
+
+    @property
+    def built(self) -> bool:
+        return self._components is not None
+
+    @property
+    def agent(self):
+        return self._ensure_built()[0]
+
+    @property
+    def runner(self):
+        return self._ensure_built()[1]
+
+    @property
+    def session_service(self):
+        return self._ensure_built()[2]
+
+    @property
+    def tools(self):
+        return self.agent.tools
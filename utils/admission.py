@@ -0,0 +1,166 @@
+"""
+Controle de Admissão dos Servidores A2A
+Limite de execuções simultâneas do /run, fila FIFO limitada com tempo máximo de espera
+e recusa imediata (429 + Retry-After) quando o agente está saturado
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Mapping, Optional, Sequence, Tuple
+
+from .metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUE, ADMISSION_REJECTED, ADMISSION_WAIT
+
+
+ADMISSION_ENV = "FLAFLU_ADMISSION"   # ex.: max_in_flight=4,max_queue=16,queue_timeout=5
+
+# Motivos de recusa
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class _Waiter:
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    Semáforo de max_in_flight vagas com fila FIFO de até max_queue requisições
+    Uma vaga liberada passa direto para a mais antiga da fila; quem espera mais que queue_timeout,
+    ou chega com a fila cheia, é recusado. Espera, fila e recusas vão para o registry de métricas
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_in_flight: int = 4,
+                 max_queue: int = 16,
+                 queue_timeout: float = 5.0,
+                 registry=None,
+                 clock=time.monotonic):
+        if max_in_flight < 1 or max_queue < 0:
+            raise ValueError(f"Limites de admissão inválidos: max_in_flight={max_in_flight}, max_queue={max_queue}")
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.registry = registry
+        self.clock = clock
+        self.in_flight = 0
+        self._queue: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        # Média móvel do tempo de serviço (s), base do Retry-After
+        self._service_s = 0.0
+        self.stats = {"admitted": 0, "queued": 0, QUEUE_FULL: 0, QUEUE_TIMEOUT: 0}
+
+    @classmethod
+    def from_env(cls, name: str, registry=None, environ: Mapping[str, str] = os.environ) -> "AdmissionController":
+        settings = {}
+        for item in environ.get(ADMISSION_ENV, "").split(","):
+            key, sep, value = item.partition("=")
+            if sep and key.strip() in ("max_in_flight", "max_queue", "queue_timeout"):
+                settings[key.strip()] = float(value) if key.strip() == "queue_timeout" else int(value)
+        return cls(name, registry=registry, **settings)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def acquire(self) -> Tuple[bool, float, Optional[str]]:
+        """(admitida, espera em ms, motivo da recusa)"""
+        start = self.clock()
+        with self._lock:
+            if self.in_flight < self.max_in_flight and not self._queue:
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                self._publish()
+                return True, 0.0, None
+            if len(self._queue) >= self.max_queue:
+                return self._reject(QUEUE_FULL, 0.0)
+            waiter = _Waiter()
+            self._queue.append(waiter)
+            self.stats["queued"] += 1
+            self._publish()
+
+        waiter.event.wait(self.queue_timeout)
+        waited_ms = (self.clock() - start) * 1000
+        with self._lock:
+            if not waiter.granted:
+                self._queue.remove(waiter)
+                return self._reject(QUEUE_TIMEOUT, waited_ms)
+            self.stats["admitted"] += 1
+        if self.registry is not None:
+            self.registry.observe(ADMISSION_WAIT, self.name, waited_ms)
+        return True, waited_ms, None
+
+    def release(self, service_s: Optional[float] = None):
+        """Libera a vaga (repassada à primeira da fila) e atualiza o tempo médio de serviço"""
+        with self._lock:
+            if service_s is not None:
+                self._service_s = service_s if not self._service_s else 0.8 * self._service_s + 0.2 * service_s
+            if self._queue:
+                waiter = self._queue.popleft()
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.in_flight -= 1
+            self._publish()
+
+    def retry_after(self) -> int:
+        """Segundos sugeridos no Retry-After: tempo estimado para escoar a fila atual (mínimo 1)"""
+        with self._lock:
+            backlog = len(self._queue) + self.in_flight
+            return max(1, math.ceil(self._service_s * backlog / self.max_in_flight))
+
+    def _reject(self, reason: str, waited_ms: float) -> Tuple[bool, float, Optional[str]]:
+        self.stats[reason] += 1
+        self._publish()
+        if self.registry is not None:
+            self.registry.increment(ADMISSION_REJECTED, self.name)
+        return False, waited_ms, reason
+
+    def _publish(self):
+        if self.registry is not None:
+            self.registry.set_gauge(ADMISSION_IN_FLIGHT, self.name, self.in_flight)
+            self.registry.set_gauge(ADMISSION_QUEUE, self.name, len(self._queue))
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self.stats, "in_flight": self.in_flight, "queue_depth": len(self._queue),
+                    "max_in_flight": self.max_in_flight, "max_queue": self.max_queue,
+                    "queue_timeout_s": self.queue_timeout}
+
+
+def install_admission_control(app, controller: AdmissionController, paths: Sequence[str] = ("/run",)):
+    """Aplica o controle de admissão às rotas do app Flask (429 + Retry-After quando saturado)"""
+    from flask import g, jsonify, request
+
+    app.extensions["admission"] = controller
+
+    @app.before_request
+    def _admission_acquire():
+        if request.url_rule is None or request.url_rule.rule not in paths:
+            return None
+        admitted, waited_ms, reason = controller.acquire()
+        if not admitted:
+            retry_after = controller.retry_after()
+            response = jsonify({"error": "Agente saturado, tente novamente", "reason": reason,
+                                "retry_after_s": retry_after})
+            response.status_code = 429
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+        g.admission_start = time.monotonic()
+        return None
+
+    @app.teardown_request
+    def _admission_release(exc=None):
+        start = g.pop("admission_start", None)
+        if start is not None:
+            controller.release(time.monotonic() - start)
+
+    return controller
@@ -3,16 +3,31 @@ Sistema de Log Aprimorado para FlaFludeAgentes
 Monitora fluxo completo dos agentes ADK, protocolo A2A e sistema geral
 """
 
-import logging
+import itertools
 import json
+import os
+import struct
 import time
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Union
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple, Union
 from pathlib import Path
+import sys
 import threading
-from dataclasses import dataclass, asdict
+import weakref
+from dataclasses import dataclass
 from enum import Enum
-import uuid
+
+from .log_buffer import RingBuffer
+from .log_export import iter_file_records, stream_records
+from .log_segments import SegmentReader, SegmentWriter
+from .metrics import A2A_ROUTE, AGENT, TOOL, MetricsRegistry
+from .tracing import current_trace_id, record_span
+from .log_index import (
+    FullTextIndex, SecondaryIndex, collect_tokens, flatten_values, iter_union_newest, parse_query
+)
+from .log_writer import AsyncLogWriter, OVERFLOW_BLOCK
+from .log_policy import LogPolicy, enabled_table
+from .log_shipping import SOCKET_ENV, LogShipper, shipping_supported
 
 
 class LogLevel(Enum):
@@ -57,18 +72,263 @@ class LogEntry:
     thread_id: Optional[str] = None
 
 
+_EMPTY_DETAILS = b"{}"
+_SEGMENT_META = struct.Struct("<I")
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """Interna strings de baixa cardinalidade (agentes, níveis, categorias, eventos)"""
+    return sys.intern(value) if value else value
+
+
+class _StringPool:
+    """Deduplicação limitada de strings repetidas mas não internáveis (mensagens, IDs, threads)"""
+    
+    __slots__ = ("_pool", "max_size", "hits", "misses")
+    
+    def __init__(self, max_size: int = 8192):
+        self._pool: Dict[str, str] = {}
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, value: Optional[str]) -> Optional[str]:
+        if value is None:
+            return None
+        cached = self._pool.get(value)
+        if cached is None:
+            self.misses += 1
+            if len(self._pool) >= self.max_size:
+                self._pool.clear()
+            self._pool[value] = cached = value
+        else:
+            self.hits += 1
+        return cached
+    
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._pool)}
+
+
+_string_pool = _StringPool()
+
+
+class _CorrelationIds:
+    """
+    IDs de correlação baratos: prefixo do processo + contador monotônico em hexadecimal
+    O prefixo (pid + 16 bits aleatórios) é refeito no filho após fork
+    """
+    
+    def __init__(self):
+        self.reset()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self.reset)
+    
+    def reset(self):
+        self.prefix = f"{os.getpid() & 0xffff:04x}{os.urandom(2).hex()}-"
+        self._counter = itertools.count(1)
+    
+    def next(self) -> str:
+        # next() de itertools.count é atômico sob o GIL
+        return f"{self.prefix}{next(self._counter):x}"
+
+
+_correlation_ids = _CorrelationIds()
+
+
+class CompactLogEntry:
+    """
+    Representação compacta de LogEntry mantida em memória
+    __slots__, strings internadas, timestamp epoch e detalhes serializados em bytes
+    A serialização dos detalhes é preguiçosa: feita no primeiro acesso (normalmente pela
+    thread do escritor), que descarta o dicionário original
+    """
+    
+    __slots__ = (
+        "ts", "level", "category", "agent_name", "session_id", "user_id",
+        "event_type", "message", "_details", "_details_blob", "duration_ms",
+        "correlation_id", "thread_id"
+    )
+    
+    def __init__(self, ts: float, level: str, category: str, agent_name: Optional[str],
+                 session_id: Optional[str], user_id: Optional[str], event_type: str,
+                 message: str, details: Optional[Dict[str, Any]],
+                 duration_ms: Optional[float] = None, correlation_id: Optional[str] = None,
+                 thread_id: Optional[str] = None):
+        self.ts = ts
+        self.level = _intern(level)
+        self.category = _intern(category)
+        self.agent_name = _intern(agent_name)
+        self.session_id = _string_pool.get(session_id)
+        self.user_id = _string_pool.get(user_id)
+        self.event_type = _intern(event_type)
+        self.message = _string_pool.get(message)
+        if details:
+            self._details = details
+            self._details_blob = None
+        else:
+            self._details = None
+            self._details_blob = _EMPTY_DETAILS
+        self.duration_ms = duration_ms
+        self.correlation_id = _string_pool.get(correlation_id)
+        self.thread_id = _string_pool.get(thread_id)
+    
+    @property
+    def timestamp(self) -> str:
+        """Timestamp ISO, formatado apenas quando exibido"""
+        return datetime.fromtimestamp(self.ts).isoformat()
+    
+    @property
+    def details_blob(self) -> bytes:
+        """Detalhes em JSON UTF-8, serializados no primeiro acesso"""
+        blob = self._details_blob
+        if blob is None:
+            details = self._details
+            if details is None:
+                # Serializado por outra thread entre as duas leituras
+                return self._details_blob
+            blob = json.dumps(details, ensure_ascii=False, default=str).encode("utf-8")
+            self._details_blob = blob
+            self._details = None
+        return blob
+    
+    @property
+    def details_json(self) -> str:
+        return self.details_blob.decode("utf-8")
+    
+    @property
+    def details(self) -> Dict[str, Any]:
+        blob = self.details_blob
+        if blob is _EMPTY_DETAILS:
+            return {}
+        return json.loads(blob)
+    
+    def to_segment_record(self) -> Tuple[float, bytes]:
+        """Registro binário do segmento: tamanho dos metadados + metadados JSON + detalhes"""
+        meta = json.dumps([
+            self.level, self.category, self.agent_name, self.session_id, self.user_id,
+            self.event_type, self.message, self.duration_ms, self.correlation_id, self.thread_id
+        ], ensure_ascii=False).encode("utf-8")
+        return self.ts, _SEGMENT_META.pack(len(meta)) + meta + self.details_blob
+    
+    @classmethod
+    def from_segment_record(cls, ts: float, payload: bytes) -> "CompactLogEntry":
+        """Reconstrói a entrada a partir de um registro de segmento (sem re-serializar detalhes)"""
+        (meta_length,) = _SEGMENT_META.unpack_from(payload)
+        meta_end = _SEGMENT_META.size + meta_length
+        (level, category, agent_name, session_id, user_id, event_type,
+         message, duration_ms, correlation_id, thread_id) = json.loads(payload[_SEGMENT_META.size:meta_end])
+        entry = cls(ts, level, category, agent_name, session_id, user_id, event_type,
+                    message, None, duration_ms, correlation_id, thread_id)
+        details_blob = payload[meta_end:]
+        if details_blob != _EMPTY_DETAILS:
+            entry._details_blob = details_blob
+        return entry
+    
+    def to_log_entry(self) -> LogEntry:
+        """Converte para a estrutura pública LogEntry"""
+        return LogEntry(
+            timestamp=self.timestamp,
+            level=self.level,
+            category=self.category,
+            agent_name=self.agent_name,
+            session_id=self.session_id,
+            user_id=self.user_id,
+            event_type=self.event_type,
+            message=self.message,
+            details=self.details,
+            duration_ms=self.duration_ms,
+            correlation_id=self.correlation_id,
+            thread_id=self.thread_id
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Mesmo formato de asdict(LogEntry)"""
+        return {
+            "timestamp": self.timestamp,
+            "level": self.level,
+            "category": self.category,
+            "agent_name": self.agent_name,
+            "session_id": self.session_id,
+            "user_id": self.user_id,
+            "event_type": self.event_type,
+            "message": self.message,
+            "details": self.details,
+            "duration_ms": self.duration_ms,
+            "correlation_id": self.correlation_id,
+            "thread_id": self.thread_id
+        }
+
+
+# Campos com índice secundário (valor -> sequências no buffer)
+INDEXED_FIELDS = ("agent_name", "category", "level", "event_type", "session_id", "correlation_id")
+
+
+def _to_epoch(value: Union[str, float, int, datetime]) -> float:
+    """Converte limites de intervalo (ISO, datetime ou epoch) para epoch"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return datetime.fromisoformat(value).timestamp()
+
+
+# Entradas recebidas de outros processos acumuladas antes de indexar o texto
+_TEXT_INDEX_BATCH = 256
+
+
+class _TextIndexSink:
+    """
+    Sink do escritor: indexa a busca textual a cada lote, na thread do escritor
+    Referência fraca ao logger: a thread do escritor não o mantém vivo
+    """
+    
+    def __init__(self, index_pending: Callable[[], None]):
+        self.index_pending = weakref.WeakMethod(index_pending)
+    
+    def write_batch(self, batch: List[Any]):
+        index_pending = self.index_pending()
+        if index_pending is not None:
+            index_pending()
+    
+    def close(self):
+        pass
+
+
+def _after_fork(ref):
+    logger = ref()
+    if logger is not None:
+        logger.after_fork_in_child()
+
+
 class EnhancedLogger:
     """Sistema de log aprimorado com estrutura JSON e filtros avançados"""
     
-    def __init__(self, log_dir: str = "logs", max_entries: int = 10000):
+    def __init__(self, log_dir: str = "logs", max_entries: int = 100000,
+                 policy: Optional[LogPolicy] = None):
+        # Diretório e arquivos criados pelo escritor na primeira gravação
         self.log_dir = Path(log_dir)
-        self.log_dir.mkdir(exist_ok=True)
         self.max_entries = max_entries
-        self.entries: List[LogEntry] = []
+        self.entries = RingBuffer(max_entries)
+        self.index = SecondaryIndex(INDEXED_FIELDS)
+        self.text_index = FullTextIndex()
+        # Sequência até onde a busca textual já indexou (tokenização na thread do escritor, fora do lock)
+        self.text_indexed_seq = 0
+        # Maior timestamp no buffer e última sequência que chegou fora de ordem (entradas recebidas
+        # mantêm o timestamp de origem): enquanto ela estiver no buffer, seq não é ordem temporal
+        self._newest_ts = float("-inf")
+        self._unordered_seq = -1
         self.lock = threading.Lock()
+        # Serializa quem indexa o texto (escritor, ingestão, busca); nunca tomado dentro de self.lock
+        self.text_lock = threading.Lock()
+        
+        # Limiares por categoria e amostragem (FLAFLU_LOG_LEVEL, FLAFLU_LOG_LEVELS, FLAFLU_LOG_SAMPLE)
+        self.set_policy(policy or LogPolicy.from_env())
+        self.suppressed: Dict[str, int] = {}
         
         # Configuração do logger padrão
         self.setup_file_logging()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=lambda ref=weakref.ref(self): _after_fork(ref))
         
         # Métricas de performance
         self.metrics = {
@@ -77,47 +337,88 @@ class EnhancedLogger:
             "a2a_messages": 0,
             "errors": 0,
             "avg_response_time": 0.0,
+            "timed_events": 0,
             "session_count": 0
         }
+        # Quantis e taxas por agente, tool e rota A2A (snapshot sem reprocessar logs)
+        self.registry = MetricsRegistry()
     
     def setup_file_logging(self):
-        """Configura logging para arquivos com rotação"""
-        log_formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)s | %(name)s | %(message)s'
-        )
-        
-        # Log geral do sistema
-        self.system_logger = logging.getLogger('FlaFludeSystem')
-        self.system_logger.setLevel(logging.DEBUG)
-        
-        # Handler para arquivo geral
-        system_handler = logging.FileHandler(
-            self.log_dir / f"system_{datetime.now().strftime('%Y%m%d')}.log"
-        )
-        system_handler.setFormatter(log_formatter)
-        self.system_logger.addHandler(system_handler)
-        
-        # Log específico para agentes
-        self.agent_logger = logging.getLogger('FlaFludeAgents')
-        self.agent_logger.setLevel(logging.DEBUG)
-        
-        # Handler para arquivo de agentes
-        agent_handler = logging.FileHandler(
-            self.log_dir / f"agents_{datetime.now().strftime('%Y%m%d')}.log"
+        """Configura escrita assíncrona em lote para os arquivos diários e segmentos binários"""
+        segment_dir = self.log_dir / "segments"
+        self.segments = SegmentWriter(segment_dir, encoder=CompactLogEntry.to_segment_record)
+        self.segment_reader = SegmentReader(segment_dir, live_index=self.segments.live_index)
+        sinks = [self.segments, _TextIndexSink(self.index_pending_text)]
+        # Com FLAFLU_LOG_SOCKET definido, os lotes também vão para o agregador do dashboard
+        socket_path = os.getenv(SOCKET_ENV)
+        self.shipper = None
+        if socket_path and shipping_supported():
+            self.shipper = LogShipper(socket_path, encoder=CompactLogEntry.to_segment_record)
+            sinks.append(self.shipper)
+        self.writer = AsyncLogWriter(
+            self.log_dir,
+            formatter=self._format_file_record,
+            batch_size=256,
+            flush_interval=0.25,
+            max_queue=self.max_entries,
+            overflow=OVERFLOW_BLOCK,
+            sinks=sinks
         )
-        agent_handler.setFormatter(log_formatter)
-        self.agent_logger.addHandler(agent_handler)
-        
-        # Log específico para A2A
-        self.a2a_logger = logging.getLogger('FlaFludeA2A')
-        self.a2a_logger.setLevel(logging.DEBUG)
+    
+    def after_fork_in_child(self):
+        """Workers pré-fork: lock e escritor próprios (o pai pode ter forkado com a fila ocupada)"""
+        self.lock = threading.Lock()
+        self.text_lock = threading.Lock()
+        self.writer.reset_after_fork()
+    
+    def disable_shipping(self):
+        """Para de enviar lotes ao agregador (o processo passa a ser o próprio agregador)"""
+        if self.shipper is not None:
+            self.writer.sinks = [sink for sink in self.writer.sinks if sink is not self.shipper]
+            self.shipper = None
+    
+    def ingest_record(self, source: str, ts: float, payload: bytes):
+        """
+        Insere uma entrada recebida de outro processo (registro de segmento) no buffer,
+        índices e métricas, sem gravá-la de novo em arquivo; o timestamp original é mantido
+        (lotes de processos diferentes se intercalam: consultas temporais reordenam por timestamp)
+        """
+        entry = CompactLogEntry.from_segment_record(ts, payload)
+        entry.thread_id = _string_pool.get(f"{source}/{entry.thread_id}")
+        
+        series = None
+        if entry.duration_ms is not None:
+            # Séries nomeadas que o processo de origem registrou pelos métodos específicos
+            if entry.category == LogCategory.TOOL_EXECUTION.value:
+                series = (TOOL, entry.details.get("tool_name") or entry.event_type)
+            elif entry.category == LogCategory.A2A_PROTOCOL.value:
+                details = entry.details
+                series = (A2A_ROUTE, f"{details.get('from_agent')}->{details.get('to_agent')}")
         
-        # Handler para arquivo A2A
-        a2a_handler = logging.FileHandler(
-            self.log_dir / f"a2a_{datetime.now().strftime('%Y%m%d')}.log"
-        )
-        a2a_handler.setFormatter(log_formatter)
-        self.a2a_logger.addHandler(a2a_handler)
+        with self.lock:
+            seq, evicted = self.entries.append(entry)
+            if evicted is not None:
+                self.index.remove(seq - self.max_entries, evicted)
+            self.index.add(seq, entry)
+            self._track_order(seq, entry.ts)
+            self._update_metrics(entry)
+        if series is not None:
+            self.registry.observe(*series, entry.duration_ms)
+        # Entradas recebidas não passam pelo escritor: indexadas em blocos na thread do agregador
+        if seq - self.text_indexed_seq >= _TEXT_INDEX_BATCH:
+            self.index_pending_text()
+    
+    def set_policy(self, policy: LogPolicy):
+        """Troca a política de emissão (tabela nível x categoria recalculada)"""
+        self.policy = policy
+        self._enabled = enabled_table(policy, LogLevel, LogCategory)
+    
+    def is_enabled(self, level: LogLevel, category: LogCategory) -> bool:
+        """
+        Consulta O(1) do limiar de nível da categoria
+        Use antes de montar mensagens e detalhes de eventos de baixa severidade
+        """
+        return self._enabled[(level, category)]
     
     def log(self, 
             level: LogLevel,
@@ -132,14 +433,22 @@ class EnhancedLogger:
             correlation_id: Optional[str] = None) -> str:
         """
         Log principal com estrutura padronizada
-        Retorna correlation_id para rastreamento
+        Retorna correlation_id para rastreamento (o trace_id do span atual, se houver)
+        Eventos abaixo do limiar ou descartados pela amostragem não geram entrada
+        details é serializado depois, pela thread do escritor: não altere o dicionário após a chamada
         """
         
+        if not self._enabled[(level, category)] or (
+                self.policy.samplers and not self.policy.sample(level.value, event_type)):
+            with self.lock:
+                self.suppressed[event_type] = self.suppressed.get(event_type, 0) + 1
+            return correlation_id or current_trace_id() or _correlation_ids.next()
+        
         if correlation_id is None:
-            correlation_id = str(uuid.uuid4())[:8]
+            correlation_id = current_trace_id() or _correlation_ids.next()
         
-        entry = LogEntry(
-            timestamp=datetime.now().isoformat(),
+        entry = CompactLogEntry(
+            ts=0.0,
             level=level.value,
             category=category.value,
             agent_name=agent_name,
@@ -147,18 +456,20 @@ class EnhancedLogger:
             user_id=user_id,
             event_type=event_type,
             message=message,
-            details=details or {},
+            details=details,
             duration_ms=duration_ms,
             correlation_id=correlation_id,
             thread_id=threading.current_thread().name
         )
-        
         with self.lock:
-            self.entries.append(entry)
-            
-            # Limita o número de entries em memória
-            if len(self.entries) > self.max_entries:
-                self.entries = self.entries[-self.max_entries:]
+            # Timestamp atribuído sob o lock: ordem de sequência == ordem temporal entre entradas locais
+            entry.ts = time.time()
+            # Buffer circular: a entrada mais antiga é despejada em O(1)
+            seq, evicted = self.entries.append(entry)
+            if evicted is not None:
+                self.index.remove(seq - self.max_entries, evicted)
+            self.index.add(seq, entry)
+            self._track_order(seq, entry.ts)
             
             # Atualiza métricas
             self._update_metrics(entry)
@@ -168,7 +479,7 @@ class EnhancedLogger:
         
         return correlation_id
     
-    def _update_metrics(self, entry: LogEntry):
+    def _update_metrics(self, entry: CompactLogEntry):
         """Atualiza métricas do sistema"""
         self.metrics["total_events"] += 1
         
@@ -178,39 +489,87 @@ class EnhancedLogger:
         if entry.category == LogCategory.A2A_PROTOCOL.value:
             self.metrics["a2a_messages"] += 1
         
+        # Cada execução de wrapper abre uma sessão ADK
+        if entry.event_type == "agent_start":
+            self.metrics["session_count"] += 1
+        
+        self.registry.mark("events")
         if entry.level in [LogLevel.ERROR.value, LogLevel.CRITICAL.value]:
             self.metrics["errors"] += 1
+            self.registry.mark("errors")
         
-        if entry.duration_ms:
-            # Calcula média móvel do tempo de resposta
+        if entry.duration_ms is not None:
+            # Média do tempo de resposta apenas sobre eventos cronometrados
+            self.metrics["timed_events"] += 1
             current_avg = self.metrics["avg_response_time"]
-            total_events = self.metrics["total_events"]
             self.metrics["avg_response_time"] = (
-                (current_avg * (total_events - 1) + entry.duration_ms) / total_events
+                current_avg + (entry.duration_ms - current_avg) / self.metrics["timed_events"]
             )
+            # Tools e rotas A2A são registradas pelos métodos específicos (com o nome da série)
+            if entry.category not in (LogCategory.TOOL_EXECUTION.value, LogCategory.A2A_PROTOCOL.value):
+                self.registry.observe(AGENT, entry.agent_name or "system", entry.duration_ms)
     
-    def _write_to_file(self, entry: LogEntry):
-        """Escreve entrada para o arquivo apropriado"""
-        log_message = f"{entry.message} | {json.dumps(entry.details, ensure_ascii=False)}"
-        
+    def _write_to_file(self, entry: CompactLogEntry):
+        """Enfileira entrada para o escritor em lote (sem I/O no thread chamador)"""
+        self.writer.submit(entry)
+    
+    @staticmethod
+    def _format_file_record(entry: CompactLogEntry) -> Tuple[str, str]:
+        """Formata a linha de arquivo (executado na thread do escritor; não referencia o logger)"""
         if entry.category == LogCategory.AGENT.value:
-            if entry.level == LogLevel.ERROR.value:
-                self.agent_logger.error(log_message)
-            elif entry.level == LogLevel.WARNING.value:
-                self.agent_logger.warning(log_message)
-            else:
-                self.agent_logger.info(log_message)
-        
+            prefix, logger_name = "agents", "FlaFludeAgents"
         elif entry.category == LogCategory.A2A_PROTOCOL.value:
-            self.a2a_logger.info(log_message)
+            prefix, logger_name = "a2a", "FlaFludeA2A"
+        else:
+            prefix, logger_name = "system", "FlaFludeSystem"
         
+        if entry.category == LogCategory.A2A_PROTOCOL.value:
+            level_name = "INFO"
+        elif entry.level in (LogLevel.ERROR.value, LogLevel.WARNING.value):
+            level_name = entry.level
         else:
-            if entry.level == LogLevel.ERROR.value:
-                self.system_logger.error(log_message)
-            elif entry.level == LogLevel.WARNING.value:
-                self.system_logger.warning(log_message)
-            else:
-                self.system_logger.info(log_message)
+            level_name = "INFO"
+        
+        # Mesmo layout do logging.Formatter anterior: data hora,ms | nível | logger | mensagem
+        timestamp = entry.timestamp
+        asctime = f"{timestamp[:10]} {timestamp[11:19]},{timestamp[20:23] or '000'}"
+        filename = f"{prefix}_{timestamp[:10].replace('-', '')}.log"
+        return filename, f"{asctime} | {level_name} | {logger_name} | {entry.message} | {entry.details_json}"
+    
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Garante que as entradas já registradas estejam gravadas em disco"""
+        return self.writer.flush(timeout)
+    
+    def shutdown(self, timeout: float = 5.0):
+        """Hook de encerramento: drena a fila do escritor e fecha os arquivos"""
+        self.writer.close(timeout)
+    
+    def _select(self, filters: Dict[str, Optional[str]], newest_first: bool = True) -> Iterator[CompactLogEntry]:
+        """
+        Itera entradas que casam com todos os filtros de igualdade
+        Usa a menor lista do índice secundário: custo proporcional ao resultado, não ao buffer
+        """
+        filters = {field: value for field, value in filters.items() if value is not None}
+        if not filters:
+            yield from (self.entries.iter_newest() if newest_first else self.entries.iter_oldest())
+            return
+        
+        selected = self.index.candidates(filters)
+        if selected is None:
+            return
+        postings, remaining = selected
+        
+        first_seq = self.entries.first_seq
+        seqs = postings.iter_newest(first_seq) if newest_first else postings.iter_oldest(first_seq)
+        for seq in seqs:
+            entry = self.entries.get(seq)
+            if entry is None:
+                # Despejada durante a leitura
+                if newest_first:
+                    return
+                continue
+            if all(getattr(entry, field) == value for field, value in remaining):
+                yield entry
     
     def get_recent_logs(self, 
                        limit: int = 100,
@@ -218,80 +577,280 @@ class EnhancedLogger:
                        agent_name: Optional[str] = None,
                        level: Optional[LogLevel] = None) -> List[Dict[str, Any]]:
         """Recupera logs recentes com filtros"""
-        with self.lock:
-            filtered_entries = self.entries.copy()
-        
-        # Aplica filtros
-        if category:
-            filtered_entries = [e for e in filtered_entries if e.category == category.value]
-        
-        if agent_name:
-            filtered_entries = [e for e in filtered_entries if e.agent_name == agent_name]
-        
-        if level:
-            filtered_entries = [e for e in filtered_entries if e.level == level.value]
+        filters = {
+            "category": category.value if category else None,
+            "agent_name": agent_name or None,
+            "level": level.value if level else None,
+        }
         
-        # Ordena por timestamp (mais recentes primeiro)
-        filtered_entries.sort(key=lambda x: x.timestamp, reverse=True)
+        # Percorre do mais novo para o mais antigo e para ao atingir o limite
+        results = []
+        for entry in self._select(filters):
+            results.append(entry.to_dict())
+            if len(results) >= limit:
+                break
         
-        # Limita resultado
-        return [asdict(entry) for entry in filtered_entries[:limit]]
+        return results
+    
+    def get_entries_since(self, seq: int, limit: Optional[int] = None) -> Tuple[List[Tuple[int, CompactLogEntry]], int]:
+        """
+        Entradas com sequência >= seq (ou a partir da mais antiga retida), em ordem de inserção
+        Retorna ([(seq, entrada)], próxima sequência) para consumidores incrementais
+        """
+        start = max(seq, self.entries.first_seq)
+        end = self.entries.next_seq
+        if limit is not None:
+            end = min(end, start + limit)
+        
+        entries = []
+        for current in range(start, end):
+            entry = self.entries.get(current)
+            if entry is not None:
+                entries.append((current, entry))
+        return entries, end
     
     def get_agent_flow(self, session_id: str, correlation_id: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Recupera fluxo completo de uma sessão ou correlação específica"""
-        with self.lock:
-            entries = self.entries.copy()
-        
+        """Recupera fluxo completo de uma sessão ou correlação específica, em ordem cronológica"""
         if correlation_id:
-            filtered = [e for e in entries if e.correlation_id == correlation_id]
+            filters = {"correlation_id": correlation_id}
         else:
-            filtered = [e for e in entries if e.session_id == session_id]
-        
-        # Ordena cronologicamente
-        filtered.sort(key=lambda x: x.timestamp)
-        
-        return [asdict(entry) for entry in filtered]
+            filters = {"session_id": session_id}
+        if not any(filters.values()):
+            return []
+        # Ordem de inserção: entradas recebidas de outros processos chegam depois do seu timestamp
+        flow = sorted(self._select(filters, newest_first=False), key=lambda entry: entry.ts)
+        return [e.to_dict() for e in flow]
     
     def get_performance_metrics(self) -> Dict[str, Any]:
         """Retorna métricas de performance do sistema"""
         with self.lock:
+            metrics = self.metrics.copy()
+            # Sessões cujo agent_start foi suprimido pela política também contam
+            metrics["session_count"] += self.suppressed.get("agent_start", 0)
             return {
-                **self.metrics.copy(),
+                **metrics,
                 "memory_entries": len(self.entries),
                 "uptime_hours": (time.time() - getattr(self, 'start_time', time.time())) / 3600,
-                "log_files": list(self.log_dir.glob("*.log"))
+                "log_files": list(self.log_dir.glob("*.log")),
+                "file_writer": {**self.writer.stats, "pending": self.writer.pending},
+                "active_sessions": self.index.cardinality("session_id"),
+                "suppressed_events": dict(self.suppressed),
+                "log_policy": self.policy.describe(),
+                "caches": {"string_pool": _string_pool.stats()},
+                "log_shipping": (
+                    {**self.shipper.stats, "backlog": self.shipper.backlog, "connected": self.shipper.connected}
+                    if self.shipper is not None else None
+                ),
+                **self.registry.snapshot()
             }
     
     def search_logs(self, query: str, limit: int = 50) -> List[Dict[str, Any]]:
-        """Busca textual nos logs"""
-        with self.lock:
-            entries = self.entries.copy()
-        
-        query_lower = query.lower()
-        matches = []
+        """
+        Busca textual nos logs via índice invertido
+        Termos combinados com AND, prefixo com "termo*" e filtros campo:valor
+        (agent:, category:, level:, event:, session:, correlation:)
+        """
+        terms = parse_query(query)
+        if not terms:
+            return []
+        # Só o resto ainda não indexado pelo escritor (no máximo um lote)
+        self.index_pending_text()
+        
+        # Cada termo vira (tamanho, listas de postings, verificação por entrada)
+        plans = []
+        for term in terms:
+            if term.field:
+                postings = self.index.postings(term.field, term.value)
+                lists = [postings] if postings is not None else []
+                check = (lambda entry, seq, f=term.field, v=term.value: getattr(entry, f) == v)
+            else:
+                lists = self.text_index.expand(term)
+                check = (lambda entry, seq, ls=lists: any(seq in postings for postings in ls))
+            if not lists:
+                return []
+            plans.append((sum(len(postings) for postings in lists), lists, check))
         
-        for entry in entries:
-            if (query_lower in entry.message.lower() or 
-                query_lower in str(entry.details).lower() or
-                (entry.agent_name and query_lower in entry.agent_name.lower())):
-                matches.append(entry)
+        # A menor lista conduz; as demais são verificadas por bisect / atributo
+        plans.sort(key=lambda plan: plan[0])
+        _, driver, _ = plans[0]
+        checks = [check for _, _, check in plans[1:]]
         
-        # Ordena por relevância (mais recentes primeiro)
-        matches.sort(key=lambda x: x.timestamp, reverse=True)
+        matches = []
+        for seq in iter_union_newest(driver, self.entries.first_seq):
+            entry = self.entries.get(seq)
+            if entry is None:
+                break
+            if all(check(entry, seq) for check in checks):
+                matches.append(entry.to_dict())
+                if len(matches) >= limit:
+                    break
+        
+        return matches
+    
+    def index_pending_text(self):
+        """
+        Indexa para a busca textual as entradas ainda não indexadas
+        Tokenização fora de self.lock; o lock só protege o snapshot das sequências e a publicação
+        """
+        with self.text_lock:
+            with self.lock:
+                first_seq, next_seq = self.entries.first_seq, self.entries.next_seq
+            start = max(self.text_indexed_seq, first_seq)
+            if start >= next_seq:
+                return
+            
+            pending = []
+            for seq in range(start, next_seq):
+                entry = self.entries.get(seq)
+                if entry is None:
+                    # Despejada durante a indexação
+                    continue
+                pending.append((seq, collect_tokens((entry.message, entry.agent_name,
+                                                     *flatten_values(entry.details)))))
+            
+            with self.lock:
+                first_seq = self.entries.first_seq
+                for seq, tokens in pending:
+                    if seq >= first_seq:
+                        self.text_index.add(seq, tokens, first_seq)
+                self.text_indexed_seq = next_seq
+    
+    def _track_order(self, seq: int, ts: float):
+        """Registra (sob self.lock) se a entrada chegou com timestamp anterior a uma já no buffer"""
+        if ts < self._newest_ts:
+            self._unordered_seq = seq
+        else:
+            self._newest_ts = ts
+    
+    def _iter_memory_range(self, start_ts: float, end_ts: float) -> Iterator[CompactLogEntry]:
+        """
+        Entradas em memória no intervalo, em ordem temporal
+        Buffer em ordem (caso comum): busca binária pela sequência; com entradas recebidas fora
+        de ordem ainda no buffer: filtro linear e ordenação por timestamp
+        """
+        if self._unordered_seq >= self.entries.first_seq:
+            matches = [entry for entry in self.entries.iter_oldest() if start_ts <= entry.ts <= end_ts]
+            matches.sort(key=lambda entry: entry.ts)
+            yield from matches
+            return
+        
+        low, high = self.entries.first_seq, self.entries.next_seq
+        while low < high:
+            mid = (low + high) // 2
+            entry = self.entries.get(mid)
+            if entry is None or entry.ts < start_ts:
+                low = mid + 1
+            else:
+                high = mid
         
-        return [asdict(entry) for entry in matches[:limit]]
+        for entry in self.entries.iter_oldest(low):
+            if entry.ts > end_ts:
+                return
+            if entry.ts >= start_ts:
+                yield entry
+    
+    def iter_export_records(self, time_range: Optional[tuple] = None,
+                            source: str = "auto") -> Iterator[Dict[str, Any]]:
+        """
+        Registros para exportação em ordem temporal
+        source: "memory" (buffer), "segments" (segmentos binários), "files" (arquivos diários)
+        ou "auto" (histórico para o trecho anterior à janela em memória, buffer para o restante)
+        """
+        if time_range:
+            start_ts, end_ts = _to_epoch(time_range[0]), _to_epoch(time_range[1])
+        else:
+            start_ts, end_ts = float("-inf"), float("inf")
+        
+        if source == "auto":
+            oldest = self.entries.get(self.entries.first_seq)
+            window_start = oldest.ts if oldest is not None else time.time()
+            if time_range and start_ts < window_start:
+                yield from self._iter_history_records(start_ts, end_ts, before_ts=window_start)
+                # Entradas recebidas anteriores à mais antiga do buffer já vieram do histórico
+                start_ts = window_start
+            source = "memory"
+        
+        if source == "memory":
+            for entry in self._iter_memory_range(start_ts, end_ts):
+                yield entry.to_dict()
+        elif source == "segments":
+            self.flush()
+            for entry in self.iter_history(start_ts, end_ts):
+                yield entry.to_dict()
+        elif source == "files":
+            if not time_range:
+                raise ValueError("Exportação dos arquivos exige time_range")
+            # Garante que o que está na fila do escritor já esteja nos arquivos
+            self.flush()
+            yield from iter_file_records(self.log_dir, start_ts, end_ts)
+        else:
+            raise ValueError(f"Fonte de exportação inválida: {source}")
+    
+    def iter_history(self, start_ts: float, end_ts: float) -> Iterator[CompactLogEntry]:
+        """Entradas históricas dos segmentos binários, com seek direto à janela de tempo"""
+        for ts, payload in self.segment_reader.iter_range(start_ts, end_ts):
+            yield CompactLogEntry.from_segment_record(ts, payload)
+    
+    def _iter_history_records(self, start_ts: float, end_ts: float, before_ts: float) -> Iterator[Dict[str, Any]]:
+        """
+        Histórico estritamente anterior a before_ts (início da janela em memória):
+        segmentos binários e, antes do primeiro segmento, arquivos de texto (precisão de ms)
+        """
+        self.flush()
+        first_segment_ts = self.segment_reader.first_ts()
+        if first_segment_ts is None:
+            first_segment_ts = before_ts
+        if start_ts < first_segment_ts:
+            yield from iter_file_records(self.log_dir, start_ts, min(end_ts, first_segment_ts - 0.001))
+        for entry in self.iter_history(max(start_ts, first_segment_ts), min(end_ts, before_ts)):
+            if entry.ts < before_ts:
+                yield entry.to_dict()
+    
+    def get_history_logs(self,
+                         time_range: tuple,
+                         limit: int = 1000,
+                         category: Optional[LogCategory] = None,
+                         agent_name: Optional[str] = None,
+                         level: Optional[LogLevel] = None) -> List[Dict[str, Any]]:
+        """Consulta histórica (além da janela em memória) por intervalo e filtros, do mais antigo ao mais novo"""
+        start_ts, end_ts = _to_epoch(time_range[0]), _to_epoch(time_range[1])
+        category_value = category.value if category else None
+        level_value = level.value if level else None
+        
+        self.flush()
+        results = []
+        for entry in self.iter_history(start_ts, end_ts):
+            if category_value and entry.category != category_value:
+                continue
+            if agent_name and entry.agent_name != agent_name:
+                continue
+            if level_value and entry.level != level_value:
+                continue
+            results.append(entry.to_dict())
+            if len(results) >= limit:
+                break
+        return results
+    
+    def export_logs_stream(self, format: str = "ndjson", time_range: Optional[tuple] = None,
+                           compress: bool = False, source: str = "auto",
+                           chunk_size: int = 500) -> Iterator[bytes]:
+        """
+        Exportação em streaming: gera blocos de bytes NDJSON/CSV/JSON (gzip opcional)
+        Memória constante independentemente do número de dias exportados
+        """
+        return stream_records(self.iter_export_records(time_range, source),
+                              format=format, compress=compress, chunk_size=chunk_size)
     
     def export_logs(self, format: str = "json", time_range: Optional[tuple] = None) -> str:
-        """Exporta logs em formato especificado"""
-        with self.lock:
-            entries = self.entries.copy()
-        
+        """Exporta logs em formato especificado (materializado; prefira export_logs_stream)"""
         if time_range:
-            start_time, end_time = time_range
-            entries = [e for e in entries if start_time <= e.timestamp <= end_time]
+            start_ts, end_ts = _to_epoch(time_range[0]), _to_epoch(time_range[1])
+            entries = list(self._iter_memory_range(start_ts, end_ts))
+        else:
+            entries = list(self.entries)
         
         if format.lower() == "json":
-            return json.dumps([asdict(entry) for entry in entries], 
+            return json.dumps([entry.to_dict() for entry in entries], 
                             indent=2, ensure_ascii=False)
         
         elif format.lower() == "csv":
@@ -302,7 +861,7 @@ class EnhancedLogger:
                 output = io.StringIO()
                 if entries:
                     # Converte entries para dicionários
-                    entries_dict = [asdict(entry) for entry in entries]
+                    entries_dict = [entry.to_dict() for entry in entries]
                     
                     writer = csv.DictWriter(output, fieldnames=entries_dict[0].keys())
                     writer.writeheader()
@@ -351,6 +910,9 @@ class EnhancedLogger:
     def log_tool_execution(self, agent_name: str, tool_name: str, parameters: Dict[str, Any], 
                           result: str, duration_ms: float) -> str:
         """Log específico para execução de tools"""
+        self.registry.observe(TOOL, tool_name, duration_ms)
+        end = time.time()
+        record_span(f"tool.{tool_name}", end - duration_ms / 1000, end, agent=agent_name)
         return self.log(
             LogLevel.INFO,
             LogCategory.TOOL_EXECUTION,
@@ -366,8 +928,11 @@ class EnhancedLogger:
         )
     
     def log_a2a_message(self, from_agent: str, to_agent: str, message_type: str, 
-                       content: Dict[str, Any], correlation_id: str) -> str:
-        """Log específico para mensagens A2A"""
+                       content: Dict[str, Any], correlation_id: str,
+                       duration_ms: Optional[float] = None) -> str:
+        """Log específico para mensagens A2A (duration_ms alimenta a latência da rota)"""
+        if duration_ms is not None:
+            self.registry.observe(A2A_ROUTE, f"{from_agent}->{to_agent}", duration_ms)
         return self.log(
             LogLevel.A2A_MESSAGE,
             LogCategory.A2A_PROTOCOL,
@@ -379,6 +944,7 @@ class EnhancedLogger:
                 "message_type": message_type,
                 "content": content
             },
+            duration_ms=duration_ms,
             correlation_id=correlation_id
         )
     
@@ -429,8 +995,9 @@ def log_tool_execution(agent_name: str, tool_name: str, parameters: Dict[str, An
     return enhanced_logger.log_tool_execution(agent_name, tool_name, parameters, result, duration_ms)
 
 def log_a2a_message(from_agent: str, to_agent: str, message_type: str, 
-                   content: Dict[str, Any], correlation_id: str) -> str:
-    return enhanced_logger.log_a2a_message(from_agent, to_agent, message_type, content, correlation_id)
+                   content: Dict[str, Any], correlation_id: str,
+                   duration_ms: Optional[float] = None) -> str:
+    return enhanced_logger.log_a2a_message(from_agent, to_agent, message_type, content, correlation_id, duration_ms)
 
 def log_debate_event(event_type: str, details: Dict[str, Any], 
                     session_id: Optional[str] = None) -> str:
@@ -0,0 +1,63 @@
+"""
+Índice de Fatos do Pesquisador
+Base aninhada ({categoria: {chave: valor}}) achatada uma vez, com os fatos de cada termo memorizados:
+um lote de consultas percorre a base uma única vez, só para os termos ainda não vistos
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Tuple
+
+
+class FactIndex:
+    """Busca por termos (substring na chave ou no valor), na ordem original da base"""
+
+    def __init__(self, database: Mapping[str, Any], max_terms: int = 4096):
+        # (chave em minúsculas, valor em minúsculas, linha do relatório)
+        self.entries: List[Tuple[str, str, str]] = []
+        for category, data in database.items():
+            items = data.items() if isinstance(data, dict) else [(category, data)]
+            for key, value in items:
+                self.entries.append((key.lower(), str(value).lower(), f"• {key.replace('_', ' ').title()}: {value}"))
+        self.max_terms = max_terms
+        self._by_term: Dict[str, Tuple[int, ...]] = {}
+        self._lock = threading.Lock()
+        self.stats = {"scans": 0, "terms_indexed": 0, "hits": 0, "misses": 0}
+
+    def _index(self, terms: Iterable[str]) -> Dict[str, Tuple[int, ...]]:
+        """Fatos de cada termo; os termos novos são resolvidos juntos numa passada pela base"""
+        terms = set(terms)
+        with self._lock:
+            known = self._by_term
+            missing = [term for term in terms if term not in known]
+            if missing and len(known) + len(missing) > self.max_terms:
+                known.clear()
+                missing = list(terms)
+            self.stats["hits"] += len(terms) - len(missing)
+            self.stats["misses"] += len(missing)
+            if missing:
+                found: Dict[str, List[int]] = {term: [] for term in missing}
+                for position, (key, value, _) in enumerate(self.entries):
+                    for term in missing:
+                        if term in key or term in value:
+                            found[term].append(position)
+                known.update((term, tuple(positions)) for term, positions in found.items())
+                self.stats["scans"] += 1
+                self.stats["terms_indexed"] += len(missing)
+            return {term: known[term] for term in terms}
+
+    def search_many(self, queries: List[str]) -> List[List[str]]:
+        """Linhas encontradas para cada consulta (fato casa se algum termo da consulta casar)"""
+        terms_per_query = [query.lower().split() for query in queries]
+        by_term = self._index(term for terms in terms_per_query for term in terms)
+        return [
+            [self.entries[position][2] for position in sorted(set().union(*(by_term[term] for term in terms)))]
+            for terms in terms_per_query
+        ]
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Termos resolvidos pela memória (acertos) ou por uma varredura da base (faltas)"""
+        with self._lock:
+            return {"hits": self.stats["hits"], "misses": self.stats["misses"]}
+
+    def search(self, query: str) -> List[str]:
+        return self.search_many([query])[0]
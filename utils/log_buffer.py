@@ -0,0 +1,83 @@
+"""
+Buffer Circular de Entradas de Log
+Capacidade fixa, append e evicção O(1) e leitura sem cópia do buffer inteiro
+"""
+
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+class RingBuffer:
+    """
+    Buffer circular indexado por número de sequência
+    Escritas devem ser serializadas (lock do logger); leituras dispensam lock
+    """
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("Capacidade do buffer deve ser positiva")
+        self.capacity = capacity
+        self._slots: List[Any] = [None] * capacity
+        # _claimed avança antes da escrita no slot e _next_seq depois,
+        # permitindo que leitores detectem slots sobrescritos durante a leitura
+        self._claimed = 0
+        self._next_seq = 0
+
+    def append(self, item: Any) -> Tuple[int, Optional[Any]]:
+        """Adiciona item e retorna (sequência atribuída, item despejado ou None)"""
+        seq = self._next_seq
+        index = seq % self.capacity
+        evicted = self._slots[index] if seq >= self.capacity else None
+
+        self._claimed = seq + 1
+        self._slots[index] = item
+        self._next_seq = seq + 1
+        return seq, evicted
+
+    @property
+    def first_seq(self) -> int:
+        """Sequência da entrada mais antiga ainda retida"""
+        return max(0, self._next_seq - self.capacity)
+
+    @property
+    def next_seq(self) -> int:
+        """Sequência que será atribuída ao próximo append"""
+        return self._next_seq
+
+    def __len__(self) -> int:
+        return self._next_seq - self.first_seq
+
+    def get(self, seq: int) -> Optional[Any]:
+        """Item da sequência informada, ou None se já despejado / inexistente"""
+        if seq < 0 or seq >= self._next_seq:
+            return None
+        item = self._slots[seq % self.capacity]
+        # Confirma que o slot não foi reaproveitado durante a leitura
+        if seq < self._claimed - self.capacity:
+            return None
+        return item
+
+    def iter_newest(self, start_seq: Optional[int] = None) -> Iterator[Any]:
+        """Itera do mais novo para o mais antigo sobre um snapshot lógico"""
+        seq = (self._next_seq if start_seq is None else start_seq + 1) - 1
+        while seq >= 0:
+            item = self.get(seq)
+            if item is None:
+                return
+            yield item
+            seq -= 1
+
+    def iter_oldest(self, start_seq: Optional[int] = None) -> Iterator[Any]:
+        """Itera do mais antigo para o mais novo até o fim do snapshot"""
+        end = self._next_seq
+        seq = self.first_seq if start_seq is None else max(start_seq, self.first_seq)
+        while seq < end:
+            item = self.get(seq)
+            if item is None:
+                # Foi despejado enquanto líamos: salta para o mais antigo atual
+                seq = max(seq + 1, self.first_seq)
+                continue
+            yield item
+            seq += 1
+
+    def __iter__(self) -> Iterator[Any]:
+        return self.iter_oldest()
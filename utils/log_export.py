@@ -0,0 +1,177 @@
+"""
+Exportação em Streaming de Logs para FlaFludeAgentes
+Codifica registros em blocos NDJSON/CSV/JSON (opcionalmente gzip) e lê os arquivos diários de log
+"""
+
+import csv
+import heapq
+import io
+import json
+import re
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+EXPORT_FORMATS = ("ndjson", "csv", "json")
+
+EXPORT_FIELDS = [
+    "timestamp", "level", "category", "agent_name", "session_id", "user_id",
+    "event_type", "message", "details", "duration_ms", "correlation_id", "thread_id"
+]
+
+# Prefixo do arquivo diário -> categoria registrada
+FILE_PREFIXES = {
+    "agents": "agent",
+    "a2a": "a2a_protocol",
+    "system": "system",
+}
+
+_RECORD_START = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} \| ")
+
+
+def _encode_records(records: Iterable[Dict[str, Any]], format: str, chunk_size: int) -> Iterator[str]:
+    """Serializa registros em blocos de texto de até chunk_size registros"""
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        count = 0
+        for record in records:
+            writer.writerow(record)
+            count += 1
+            if count % chunk_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+        return
+
+    if format == "json":
+        # Array JSON válido montado incrementalmente
+        parts: List[str] = ["["]
+        separator = "\n"
+        for record in records:
+            parts.append(separator + json.dumps(record, ensure_ascii=False, default=str))
+            separator = ",\n"
+            if len(parts) >= chunk_size:
+                yield "".join(parts)
+                parts = []
+        parts.append("\n]\n")
+        yield "".join(parts)
+        return
+
+    parts = []
+    for record in records:
+        parts.append(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        if len(parts) >= chunk_size:
+            yield "".join(parts)
+            parts = []
+    if parts:
+        yield "".join(parts)
+
+
+def stream_records(records: Iterable[Dict[str, Any]],
+                   format: str = "ndjson",
+                   compress: bool = False,
+                   chunk_size: int = 500) -> Iterator[bytes]:
+    """
+    Gera blocos de bytes de uma exportação
+    Memória constante: apenas um bloco é mantido por vez; gzip via zlib incremental
+    """
+    format = format.lower()
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {format}")
+
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    for text in _encode_records(records, format, chunk_size):
+        data = text.encode("utf-8")
+        if compressor is None:
+            yield data
+            continue
+        compressed = compressor.compress(data)
+        if compressed:
+            yield compressed
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _parse_file_record(text: str, category: str) -> Optional[Dict[str, Any]]:
+    """Converte uma linha "data hora,ms | nível | logger | mensagem | details" em registro"""
+    try:
+        asctime, level, _logger_name, rest = text.split(" | ", 3)
+        timestamp = datetime.strptime(asctime, "%Y-%m-%d %H:%M:%S,%f")
+    except ValueError:
+        return None
+
+    message, sep, details_json = rest.rpartition(" | ")
+    details: Dict[str, Any] = {}
+    if sep:
+        try:
+            details = json.loads(details_json)
+        except ValueError:
+            message = rest
+    else:
+        message = rest
+
+    return {
+        "timestamp": timestamp.isoformat(),
+        "level": level,
+        "category": category,
+        "agent_name": None,
+        "session_id": None,
+        "user_id": None,
+        "event_type": "file_record",
+        "message": message,
+        "details": details,
+        "duration_ms": None,
+        "correlation_id": None,
+        "thread_id": None,
+        "_ts": timestamp.timestamp(),
+    }
+
+
+def _iter_file(path: Path, category: str) -> Iterator[Dict[str, Any]]:
+    """Registros de um arquivo, linha a linha (mensagens multilinha são reagrupadas)"""
+    pending: List[str] = []
+    with open(path, "r", encoding="utf-8", errors="replace") as handle:
+        for line in handle:
+            line = line.rstrip("\n")
+            if _RECORD_START.match(line) and pending:
+                record = _parse_file_record("\n".join(pending), category)
+                if record is not None:
+                    yield record
+                pending = []
+            pending.append(line)
+    if pending:
+        record = _parse_file_record("\n".join(pending), category)
+        if record is not None:
+            yield record
+
+
+def iter_file_records(log_dir: Path, start_ts: float, end_ts: float) -> Iterator[Dict[str, Any]]:
+    """
+    Registros dos arquivos diários dentro do intervalo, em ordem temporal
+    Percorre um dia por vez e intercala os três arquivos com heapq.merge
+    """
+    log_dir = Path(log_dir)
+    day = datetime.fromtimestamp(start_ts).date()
+    last_day = datetime.fromtimestamp(end_ts).date()
+
+    while day <= last_day:
+        stamp = day.strftime("%Y%m%d")
+        streams = [
+            _iter_file(log_dir / f"{prefix}_{stamp}.log", category)
+            for prefix, category in FILE_PREFIXES.items()
+            if (log_dir / f"{prefix}_{stamp}.log").exists()
+        ]
+        for record in heapq.merge(*streams, key=lambda record: record["_ts"]):
+            ts = record.pop("_ts")
+            if ts < start_ts:
+                continue
+            if ts > end_ts:
+                break
+            yield record
+        day += timedelta(days=1)
@@ -0,0 +1,220 @@
+"""
+Cache Incremental de DataFrame para o LogViewer
+Acrescenta apenas as entradas novas (por número de sequência do logger) e mantém
+agregados por bloco, evitando reconstruir e reordenar o DataFrame a cada rerun
+"""
+
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+FRAME_COLUMNS = [
+    "seq", "timestamp", "level", "category", "agent_name", "event_type",
+    "message", "duration_ms", "session_id", "correlation_id"
+]
+
+SUMMARY_COLUMNS = ["agent_name", "events", "timed", "avg_ms", "max_ms", "min_ms"]
+
+# (agente, categoria, nível) -> [eventos, eventos com duração, soma ms, máximo ms, mínimo ms]
+Summary = Dict[Tuple[str, str, str], List[float]]
+
+
+def _accumulate(summary: Summary, rows: Iterable[Tuple[str, str, str, float]]):
+    """Soma linhas (agente, categoria, nível, duração) aos agregados de um bloco"""
+    for agent, category, level, duration in rows:
+        stats = summary.get((agent, category, level))
+        if stats is None:
+            stats = summary[(agent, category, level)] = [0, 0, 0.0, float("-inf"), float("inf")]
+        stats[0] += 1
+        if duration == duration:  # ignora NaN (sem duração)
+            stats[1] += 1
+            stats[2] += duration
+            stats[3] = max(stats[3], duration)
+            stats[4] = min(stats[4], duration)
+
+
+def _summarize(chunk: pd.DataFrame) -> Summary:
+    """Agregados completos de um bloco (usado apenas ao aparar o bloco mais antigo)"""
+    summary: Summary = {}
+    _accumulate(summary, zip(chunk["agent_name"].tolist(), chunk["category"].tolist(),
+                             chunk["level"].tolist(), chunk["duration_ms"].tolist()))
+    return summary
+
+
+class LogFrameCache:
+    """
+    DataFrame dos logs em memória, mantido em blocos de até chunk_rows linhas
+    refresh() custa O(novas entradas); blocos despejados pelo logger são descartados
+    Compartilhado entre sessões do Streamlit, por isso protegido por lock
+    """
+
+    def __init__(self, logger: Any, chunk_rows: int = 1024):
+        self.logger = logger
+        self.chunk_rows = chunk_rows
+        self.next_seq = 0
+        self._chunks: List[pd.DataFrame] = []
+        self._summaries: List[Summary] = []
+        self._frame: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self._chunks)
+
+    def refresh(self) -> int:
+        """Incorpora as entradas novas e descarta as despejadas; retorna quantas linhas entraram"""
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> int:
+        entries, next_seq = self.logger.get_entries_since(self.next_seq)
+        self._evict(self.logger.entries.first_seq)
+        self.next_seq = next_seq
+        if not entries:
+            return 0
+
+        # Completa o último bloco antes de abrir outro: custo limitado por chunk_rows
+        position = 0
+        if self._chunks and len(self._chunks[-1]) < self.chunk_rows:
+            position = self.chunk_rows - len(self._chunks[-1])
+            head = entries[:position]
+            self._chunks[-1] = pd.concat([self._chunks[-1], self._build_chunk(head)], ignore_index=True)
+            _accumulate(self._summaries[-1], self._summary_rows(head))
+        for start in range(position, len(entries), self.chunk_rows):
+            part = entries[start:start + self.chunk_rows]
+            summary: Summary = {}
+            _accumulate(summary, self._summary_rows(part))
+            self._chunks.append(self._build_chunk(part))
+            self._summaries.append(summary)
+
+        self._frame = None
+        return len(entries)
+
+    @staticmethod
+    def _summary_rows(entries: List[Any]) -> Iterator[Tuple[str, str, str, float]]:
+        for _, entry in entries:
+            duration = entry.duration_ms if entry.duration_ms is not None else float("nan")
+            yield entry.agent_name or "system", entry.category, entry.level, duration
+
+    def _build_chunk(self, entries: List[Any]) -> pd.DataFrame:
+        """Bloco colunar a partir das entradas compactas (timestamps epoch -> datetime64)"""
+        seqs, ts, levels, categories, agents, events = [], [], [], [], [], []
+        messages, durations, sessions, correlations = [], [], [], []
+        for seq, entry in entries:
+            seqs.append(seq)
+            ts.append(entry.ts)
+            levels.append(entry.level)
+            categories.append(entry.category)
+            agents.append(entry.agent_name or "system")
+            events.append(entry.event_type)
+            messages.append(entry.message)
+            durations.append(entry.duration_ms if entry.duration_ms is not None else np.nan)
+            sessions.append(entry.session_id)
+            correlations.append(entry.correlation_id)
+
+        # Horário local sem fuso, como os timestamps ISO do logger (datetime.fromtimestamp)
+        local_tz = datetime.now().astimezone().tzinfo
+        timestamps = pd.to_datetime(np.asarray(ts, dtype="float64"), unit="s", utc=True)
+        return pd.DataFrame({
+            "seq": np.asarray(seqs, dtype="int64"),
+            "timestamp": timestamps.tz_convert(local_tz).tz_localize(None),
+            "level": levels,
+            "category": categories,
+            "agent_name": agents,
+            "event_type": events,
+            "message": messages,
+            "duration_ms": np.asarray(durations, dtype="float64"),
+            "session_id": sessions,
+            "correlation_id": correlations,
+        }, columns=FRAME_COLUMNS)
+
+    def _evict(self, first_seq: int):
+        """Remove linhas já despejadas do buffer do logger"""
+        if self.next_seq < first_seq:
+            # Ficamos para trás além da janela: recomeça do mais antigo retido
+            self._chunks, self._summaries = [], []
+            self.next_seq = first_seq
+            self._frame = None
+            return
+
+        while self._chunks and int(self._chunks[0]["seq"].iat[-1]) < first_seq:
+            self._chunks.pop(0)
+            self._summaries.pop(0)
+            self._frame = None
+        if self._chunks and int(self._chunks[0]["seq"].iat[0]) < first_seq:
+            head = self._chunks[0]
+            head = head[head["seq"] >= first_seq].reset_index(drop=True)
+            self._chunks[0] = head
+            self._summaries[0] = _summarize(head)
+            self._frame = None
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """Todas as linhas retidas, em ordem de inserção (materializado sob demanda)"""
+        with self._lock:
+            if self._frame is None:
+                if self._chunks:
+                    self._frame = pd.concat(self._chunks, ignore_index=True)
+                else:
+                    self._frame = pd.DataFrame({column: [] for column in FRAME_COLUMNS})
+            return self._frame
+
+    def recent(self, limit: int = 100, category: Optional[str] = None,
+               agent_name: Optional[str] = None, level: Optional[str] = None) -> pd.DataFrame:
+        """Últimas linhas que casam com os filtros, em ordem cronológica; percorre só os blocos finais"""
+        parts: List[pd.DataFrame] = []
+        remaining = limit
+        with self._lock:
+            chunks = list(self._chunks)
+        for chunk in reversed(chunks):
+            mask = np.ones(len(chunk), dtype=bool)
+            if category:
+                mask &= (chunk["category"] == category).to_numpy()
+            if agent_name:
+                mask &= (chunk["agent_name"] == agent_name).to_numpy()
+            if level:
+                mask &= (chunk["level"] == level).to_numpy()
+            selected = chunk[mask].tail(remaining)
+            if len(selected):
+                parts.append(selected)
+                remaining -= len(selected)
+            if remaining <= 0:
+                break
+        if not parts:
+            return pd.DataFrame({column: [] for column in FRAME_COLUMNS})
+        return pd.concat(reversed(parts), ignore_index=True)
+
+    def summary(self, category: Optional[str] = None, agent_name: Optional[str] = None,
+                level: Optional[str] = None) -> pd.DataFrame:
+        """
+        Eventos e estatísticas de duração por agente, combinando os agregados dos blocos
+        Colunas: agent_name, events, timed, avg_ms, max_ms, min_ms
+        """
+        with self._lock:
+            summaries = list(self._summaries)
+        
+        per_agent: Dict[str, List[float]] = {}
+        for summary in summaries:
+            for (agent, entry_category, entry_level), stats in list(summary.items()):
+                if (category and entry_category != category) or (agent_name and agent != agent_name) \
+                        or (level and entry_level != level):
+                    continue
+                total = per_agent.get(agent)
+                if total is None:
+                    per_agent[agent] = list(stats)
+                    continue
+                total[0] += stats[0]
+                total[1] += stats[1]
+                total[2] += stats[2]
+                total[3] = max(total[3], stats[3])
+                total[4] = min(total[4], stats[4])
+        
+        rows = [
+            (agent, events, timed, total_ms / timed if timed else np.nan,
+             max_ms if timed else np.nan, min_ms if timed else np.nan)
+            for agent, (events, timed, total_ms, max_ms, min_ms) in per_agent.items()
+        ]
+        return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
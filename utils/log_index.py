@@ -0,0 +1,296 @@
+"""
+Índices de Consulta do EnhancedLogger
+Mapeiam valores de campos para sequências do buffer circular, mantidos na inserção e na evicção
+"""
+
+import heapq
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class Postings:
+    """
+    Lista ordenada de sequências de um valor indexado
+    Sequências chegam em ordem crescente e saem pela cabeça (evicção FIFO do buffer)
+    """
+
+    __slots__ = ("_seqs", "_head")
+
+    def __init__(self):
+        self._seqs: List[int] = []
+        self._head = 0
+
+    def append(self, seq: int):
+        self._seqs.append(seq)
+
+    def pop_oldest(self, seq: int):
+        """Remove a sequência despejada; compacta a lista quando metade dela é lixo"""
+        seqs = self._seqs
+        if self._head < len(seqs) and seqs[self._head] == seq:
+            self._head += 1
+            if self._head > 32 and self._head * 2 > len(seqs):
+                # Nova lista: leitores com a referência antiga seguem consistentes
+                self._seqs = seqs[self._head:]
+                self._head = 0
+
+    def prune_before(self, first_seq: int):
+        """Descarta de uma vez as sequências já despejadas (poda preguiçosa)"""
+        seqs = self._seqs
+        head = bisect_left(seqs, first_seq, self._head)
+        if head != self._head:
+            if head * 2 > len(seqs):
+                self._seqs = seqs[head:]
+                head = 0
+            self._head = head
+
+    def __len__(self) -> int:
+        return len(self._seqs) - self._head
+
+    def __contains__(self, seq: int) -> bool:
+        seqs = self._seqs
+        i = bisect_left(seqs, seq, self._head)
+        return i < len(seqs) and seqs[i] == seq
+
+    def iter_newest(self, first_seq: int) -> Iterator[int]:
+        """Sequências do mais novo para o mais antigo, sem passar de first_seq"""
+        seqs = self._seqs
+        for i in range(len(seqs) - 1, -1, -1):
+            seq = seqs[i]
+            if seq < first_seq:
+                return
+            yield seq
+
+    def iter_oldest(self, first_seq: int) -> Iterator[int]:
+        """Sequências do mais antigo (ainda retido) para o mais novo"""
+        seqs = self._seqs
+        end = len(seqs)
+        for i in range(bisect_left(seqs, first_seq, 0, end), end):
+            yield seqs[i]
+
+
+class SecondaryIndex:
+    """
+    Índices secundários por campo (agente, categoria, nível, sessão, correlação)
+    Escritas ocorrem sob o lock do logger; leituras toleram evicção concorrente
+    """
+
+    def __init__(self, fields: Iterable[str]):
+        self.fields: Tuple[str, ...] = tuple(fields)
+        self._maps: Dict[str, Dict[str, Postings]] = {field: {} for field in self.fields}
+
+    def add(self, seq: int, entry: Any):
+        """Indexa a entrada recém-inserida"""
+        for field, mapping in self._maps.items():
+            value = getattr(entry, field)
+            if value is None:
+                continue
+            postings = mapping.get(value)
+            if postings is None:
+                postings = mapping[value] = Postings()
+            postings.append(seq)
+
+    def remove(self, seq: int, entry: Any):
+        """Remove a entrada despejada (sempre a mais antiga de cada lista)"""
+        for field, mapping in self._maps.items():
+            value = getattr(entry, field)
+            if value is None:
+                continue
+            postings = mapping.get(value)
+            if postings is None:
+                continue
+            postings.pop_oldest(seq)
+            if not len(postings):
+                # Sessões e correlações têm cardinalidade alta: libera chaves vazias
+                del mapping[value]
+
+    def postings(self, field: str, value: str) -> Optional[Postings]:
+        return self._maps[field].get(value)
+
+    def values(self, field: str) -> List[str]:
+        """Valores distintos presentes para o campo"""
+        return list(self._maps[field])
+
+    def cardinality(self, field: str) -> int:
+        """Quantidade de valores distintos retidos para o campo"""
+        return len(self._maps[field])
+
+    def candidates(self, filters: Dict[str, str]) -> Optional[Tuple[Postings, List[Tuple[str, str]]]]:
+        """
+        Escolhe a menor lista de postings entre os filtros
+        Retorna (lista dirigente, filtros restantes a verificar) ou None se algum valor não existe
+        """
+        best: Optional[Postings] = None
+        best_field = None
+        for field, value in filters.items():
+            postings = self._maps[field].get(value)
+            if postings is None:
+                return None
+            if best is None or len(postings) < len(best):
+                best, best_field = postings, field
+        if best is None:
+            return None
+        remaining = [(field, value) for field, value in filters.items() if field != best_field]
+        return best, remaining
+
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_STRIP_MARKS = dict.fromkeys(range(0x300, 0x370))
+_MAX_TOKEN_LENGTH = 64
+
+
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados: minúsculas e sem acentos ("Títulos" -> "titulos")"""
+    normalized = unicodedata.normalize("NFKD", text).translate(_STRIP_MARKS).lower()
+    return [token for token in _TOKEN_PATTERN.findall(normalized) if len(token) <= _MAX_TOKEN_LENGTH]
+
+
+def collect_tokens(texts: Iterable[str]) -> Set[str]:
+    """Conjunto de tokens distintos de vários textos de uma mesma entrada"""
+    tokens: Set[str] = set()
+    for text in texts:
+        if text:
+            tokens.update(tokenize(text))
+    return tokens
+
+
+def flatten_values(value: Any) -> Iterator[str]:
+    """Valores folha de detalhes aninhados (chaves são ignoradas)"""
+    if isinstance(value, dict):
+        for item in value.values():
+            yield from flatten_values(item)
+    elif isinstance(value, (list, tuple, set)):
+        for item in value:
+            yield from flatten_values(item)
+    elif value is not None:
+        yield value if isinstance(value, str) else str(value)
+
+
+class SearchTerm:
+    """Termo de busca: token exato, prefixo (termo*) ou filtro de campo (campo:valor)"""
+
+    __slots__ = ("token", "prefix", "field", "value")
+
+    def __init__(self, token: Optional[str] = None, prefix: bool = False,
+                 field: Optional[str] = None, value: Optional[str] = None):
+        self.token = token
+        self.prefix = prefix
+        self.field = field
+        self.value = value
+
+
+# Filtros de campo aceitos na busca: alias -> (atributo da entrada, normalização do valor)
+FIELD_FILTERS = {
+    "agent": ("agent_name", str.lower),
+    "category": ("category", str.lower),
+    "level": ("level", str.upper),
+    "event": ("event_type", str),
+    "session": ("session_id", str),
+    "correlation": ("correlation_id", str),
+}
+
+
+def parse_query(query: str) -> List[SearchTerm]:
+    """
+    Interpreta a consulta: termos separados por espaço combinados com AND
+    Ex.: "erro* agent:flamengo level:ERROR timeout"
+    """
+    terms: List[SearchTerm] = []
+    for raw in query.split():
+        field, sep, value = raw.partition(":")
+        if sep and value and field.lower() in FIELD_FILTERS:
+            attribute, normalize = FIELD_FILTERS[field.lower()]
+            terms.append(SearchTerm(field=attribute, value=normalize(value)))
+            continue
+        prefix = raw.endswith("*")
+        tokens = tokenize(raw.rstrip("*"))
+        for i, token in enumerate(tokens):
+            # Só o último token de um termo composto ("a2a_mes*", "são-pau*") vira prefixo
+            terms.append(SearchTerm(token=token, prefix=prefix and i == len(tokens) - 1))
+    return terms
+
+
+class FullTextIndex:
+    """
+    Índice invertido incremental sobre mensagens e valores de detalhes
+    Atualizado na inserção; sequências despejadas são podadas preguiçosamente
+    (ignoradas na leitura e removidas por uma varredura incremental do vocabulário)
+    """
+
+    def __init__(self, sweep_per_insert: int = 4):
+        self._postings: Dict[str, Postings] = {}
+        # Vocabulário agrupado pelos dois primeiros caracteres para busca por prefixo
+        self._by_prefix: Dict[str, Set[str]] = {}
+        self._sweep_per_insert = sweep_per_insert
+        self._sweep_keys: List[str] = []
+        self._sweep_pos = 0
+
+    def __len__(self) -> int:
+        """Tamanho do vocabulário"""
+        return len(self._postings)
+
+    def add(self, seq: int, tokens: Iterable[str], first_seq: int):
+        """Indexa os tokens da entrada e avança a varredura de podas"""
+        postings_map = self._postings
+        for token in tokens:
+            postings = postings_map.get(token)
+            if postings is None:
+                postings = postings_map[token] = Postings()
+                self._by_prefix.setdefault(token[:2], set()).add(token)
+            postings.append(seq)
+
+        self._sweep(first_seq)
+
+    def _sweep(self, first_seq: int):
+        """Poda alguns tokens por inserção; tokens sem sequências vivas saem do vocabulário"""
+        if self._sweep_pos >= len(self._sweep_keys):
+            self._sweep_keys = list(self._postings)
+            self._sweep_pos = 0
+
+        end = min(self._sweep_pos + self._sweep_per_insert, len(self._sweep_keys))
+        for token in self._sweep_keys[self._sweep_pos:end]:
+            postings = self._postings.get(token)
+            if postings is None:
+                continue
+            postings.prune_before(first_seq)
+            if not len(postings):
+                del self._postings[token]
+                bucket = self._by_prefix.get(token[:2])
+                if bucket is not None:
+                    bucket.discard(token)
+                    if not bucket:
+                        del self._by_prefix[token[:2]]
+        self._sweep_pos = end
+
+    def expand(self, term: SearchTerm) -> List[Postings]:
+        """Listas de postings que satisfazem um termo textual (várias para prefixo)"""
+        if not term.prefix:
+            postings = self._postings.get(term.token)
+            return [postings] if postings is not None else []
+
+        prefix = term.token
+        if len(prefix) >= 2:
+            buckets = [self._by_prefix.get(prefix[:2], ())]
+        else:
+            buckets = [tokens for key, tokens in list(self._by_prefix.items()) if key.startswith(prefix)]
+        matched = []
+        for bucket in buckets:
+            for token in list(bucket):
+                if token.startswith(prefix):
+                    postings = self._postings.get(token)
+                    if postings is not None:
+                        matched.append(postings)
+        return matched
+
+
+def iter_union_newest(lists: List[Postings], first_seq: int) -> Iterator[int]:
+    """União de várias listas de postings, do mais novo para o mais antigo, sem repetições"""
+    if len(lists) == 1:
+        yield from lists[0].iter_newest(first_seq)
+        return
+    last = None
+    for seq in heapq.merge(*(postings.iter_newest(first_seq) for postings in lists), reverse=True):
+        if seq != last:
+            yield seq
+            last = seq
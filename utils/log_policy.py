@@ -0,0 +1,143 @@
+"""
+Política de Emissão de Logs para FlaFludeAgentes
+Limiar de nível por categoria e amostragem (probabilística ou por taxa) de eventos frequentes,
+avaliados antes de qualquer trabalho do logger
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+
+# Severidade dos níveis (os níveis de domínio equivalem a INFO)
+LEVEL_SEVERITY = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "AGENT_ACTION": 20,
+    "A2A_MESSAGE": 20,
+    "SYSTEM_EVENT": 20,
+    "DEBATE_FLOW": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+}
+
+# Eventos a partir desta severidade nunca são amostrados
+ALWAYS_KEEP_SEVERITY = LEVEL_SEVERITY["WARNING"]
+
+LEVEL_ENV = "FLAFLU_LOG_LEVEL"            # ex.: INFO
+CATEGORY_LEVELS_ENV = "FLAFLU_LOG_LEVELS"  # ex.: session=WARNING,agent=DEBUG
+SAMPLING_ENV = "FLAFLU_LOG_SAMPLE"         # ex.: session_create=0.1,adk_processing_start=5/s
+
+
+class ProbabilisticSampler:
+    """Mantém cada evento com probabilidade rate"""
+
+    __slots__ = ("rate", "_random")
+
+    def __init__(self, rate: float):
+        if not 0.0 <= rate <= 1.0:
+            raise ValueError(f"Taxa de amostragem deve estar entre 0 e 1: {rate}")
+        self.rate = rate
+        self._random = random.random
+
+    def keep(self) -> bool:
+        return self._random() < self.rate
+
+
+class RateLimitSampler:
+    """Mantém no máximo per_second eventos por segundo (balde de fichas com rajada de 1s)"""
+
+    __slots__ = ("per_second", "_tokens", "_updated", "_lock")
+
+    def __init__(self, per_second: float):
+        if per_second <= 0:
+            raise ValueError(f"Limite de eventos por segundo deve ser positivo: {per_second}")
+        self.per_second = per_second
+        self._tokens = max(1.0, per_second)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def keep(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, self.per_second), self._tokens + (now - self._updated) * self.per_second)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+def parse_sampler(spec: str):
+    """"0.1" -> probabilístico; "5/s" -> limite por segundo"""
+    spec = spec.strip().lower()
+    if spec.endswith("/s"):
+        return RateLimitSampler(float(spec[:-2]))
+    return ProbabilisticSampler(float(spec))
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    pairs = {}
+    for item in value.split(","):
+        key, sep, spec = item.partition("=")
+        if sep and key.strip() and spec.strip():
+            pairs[key.strip()] = spec.strip()
+    return pairs
+
+
+class LogPolicy:
+    """
+    Decide se um evento é registrado
+    allows(nível, categoria) é determinístico (limiares); sample(event_type) aplica a amostragem
+    """
+
+    def __init__(self,
+                 level: str = "DEBUG",
+                 category_levels: Optional[Mapping[str, str]] = None,
+                 sampling: Optional[Mapping[str, object]] = None):
+        self.threshold = LEVEL_SEVERITY[level.upper()]
+        self.category_thresholds = {
+            category.lower(): LEVEL_SEVERITY[value.upper()]
+            for category, value in (category_levels or {}).items()
+        }
+        self.samplers = {
+            event_type: parse_sampler(spec) if isinstance(spec, str) else spec
+            for event_type, spec in (sampling or {}).items()
+        }
+
+    @classmethod
+    def from_env(cls, environ: Mapping[str, str] = os.environ) -> "LogPolicy":
+        return cls(
+            level=environ.get(LEVEL_ENV, "DEBUG"),
+            category_levels=_parse_pairs(environ.get(CATEGORY_LEVELS_ENV, "")),
+            sampling=_parse_pairs(environ.get(SAMPLING_ENV, "")),
+        )
+
+    def allows(self, level: str, category: str) -> bool:
+        return LEVEL_SEVERITY[level] >= self.category_thresholds.get(category, self.threshold)
+
+    def sample(self, level: str, event_type: str) -> bool:
+        sampler = self.samplers.get(event_type)
+        if sampler is None or LEVEL_SEVERITY[level] >= ALWAYS_KEEP_SEVERITY:
+            return True
+        return sampler.keep()
+
+    def describe(self) -> Dict[str, object]:
+        severity_names = {severity: name for name, severity in reversed(list(LEVEL_SEVERITY.items()))}
+        return {
+            "level": severity_names[self.threshold],
+            "category_levels": {category: severity_names[value] for category, value in self.category_thresholds.items()},
+            "sampling": {
+                event_type: (f"{sampler.per_second:g}/s" if isinstance(sampler, RateLimitSampler) else sampler.rate)
+                for event_type, sampler in self.samplers.items()
+            },
+        }
+
+
+def enabled_table(policy: LogPolicy, levels, categories) -> Dict[Tuple[object, object], bool]:
+    """Tabela (nível, categoria) -> habilitado, com os membros dos Enums como chave (consulta O(1))"""
+    return {(level, category): policy.allows(level.value, category.value)
+            for level in levels for category in categories}
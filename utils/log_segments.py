@@ -0,0 +1,308 @@
+"""
+Segmentos Binários de Log para FlaFludeAgentes
+Arquivos append-only de registros com prefixo de tamanho, rodapé com min/max de timestamp
+e índice temporal esparso, lidos via mmap para consultas históricas por intervalo
+"""
+
+import heapq
+import json
+import mmap
+import struct
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+SEGMENT_SUFFIX = ".fls"
+FOOTER_MAGIC = b"FLSEGEND"
+
+_LENGTH = struct.Struct("<I")
+_TIMESTAMP = struct.Struct("<d")
+_TRAILER = struct.Struct("<I8s")
+
+# Escritas chegam da fila em ordem de submissão, que pode inverter poucos
+# milissegundos em relação ao timestamp (threads concorrentes); leituras toleram essa folga
+TIME_SKEW = 0.05
+
+
+def _segment_start(path: Path) -> float:
+    """Timestamp do primeiro registro, codificado no nome (seg_<microssegundos>.fls)"""
+    return int(path.stem.split("_", 1)[1]) / 1_000_000
+
+
+class SegmentWriter:
+    """
+    Escreve registros (timestamp, payload) no segmento aberto
+    Sela o segmento (rodapé) ao atingir max_bytes e ao encerrar
+    Usado como sink do AsyncLogWriter, apenas na thread do escritor
+    """
+
+    def __init__(self,
+                 directory: Path,
+                 encoder: Optional[Callable[[Any], Tuple[float, bytes]]] = None,
+                 max_bytes: int = 8 * 1024 * 1024,
+                 index_interval: int = 64):
+        self.directory = Path(directory)
+        self.encoder = encoder
+        self.max_bytes = max_bytes
+        self.index_interval = index_interval
+
+        self._handle: Optional[BinaryIO] = None
+        self._path: Optional[Path] = None
+        self._offset = 0
+        self._count = 0
+        self._min_ts = 0.0
+        self._max_ts = 0.0
+        self._sparse: List[Tuple[float, int]] = []
+
+        self.stats = {"segments": 0, "records": 0, "bytes": 0}
+
+    def write_batch(self, batch: Iterable[Any]):
+        """Acrescenta um lote (codificado por encoder) com uma única escrita"""
+        chunks: List[bytes] = []
+        for item in batch:
+            ts, payload = self.encoder(item) if self.encoder else item
+            if self._handle is None:
+                self._open(ts)
+            if self._count % self.index_interval == 0:
+                self._sparse.append((ts, self._offset))
+            record = _LENGTH.pack(len(payload) + _TIMESTAMP.size) + _TIMESTAMP.pack(ts) + payload
+            chunks.append(record)
+            self._offset += len(record)
+            self._count += 1
+            self._min_ts = ts if self._count == 1 else min(self._min_ts, ts)
+            self._max_ts = max(self._max_ts, ts)
+            self.stats["records"] += 1
+            self.stats["bytes"] += len(record)
+
+            if self._offset >= self.max_bytes:
+                self._write(b"".join(chunks))
+                chunks = []
+                self.seal()
+
+        if chunks and self._handle is not None:
+            self._write(b"".join(chunks))
+
+    def _write(self, data: bytes):
+        """Escrita direta no descritor (sem buffer: nada pendente para um filho após fork regravar)"""
+        view = memoryview(data)
+        while view:
+            view = view[self._handle.write(view):]
+
+    def seal(self):
+        """Grava o rodapé (contagem, min/max, índice esparso) e fecha o segmento"""
+        if self._handle is None:
+            return
+        footer = json.dumps({
+            "count": self._count,
+            "min_ts": self._min_ts,
+            "max_ts": self._max_ts,
+            "index": self._sparse,
+        }).encode("utf-8")
+        self._write(footer + _TRAILER.pack(len(footer), FOOTER_MAGIC))
+        self._handle.close()
+        self._handle = None
+        self._path = None
+
+    def close(self):
+        self.seal()
+
+    def reset_after_fork(self):
+        """
+        No filho após fork: solta o segmento do pai sem selá-lo; o próximo lote abre outro
+        O arquivo é aberto sem buffer, então fechar a cópia herdada só libera o descritor
+        """
+        if self._handle is not None:
+            self._handle.close()
+        self._handle = None
+        self._path = None
+        self._offset = 0
+        self._count = 0
+        self._sparse = []
+
+    def live_index(self) -> Tuple[Optional[Path], List[Tuple[float, int]]]:
+        """Caminho e índice esparso do segmento aberto (leitores no mesmo processo evitam a varredura)"""
+        return self._path, list(self._sparse)
+
+    def _open(self, first_ts: float):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"seg_{int(first_ts * 1_000_000):016d}{SEGMENT_SUFFIX}"
+        while path.exists():
+            # Outro segmento começou no mesmo microssegundo (reinício rápido)
+            first_ts += 1e-6
+            path = self.directory / f"seg_{int(first_ts * 1_000_000):016d}{SEGMENT_SUFFIX}"
+        self._handle = open(path, "ab", buffering=0)
+        self._path = path
+        self._offset = 0
+        self._count = 0
+        self._sparse = []
+        self.stats["segments"] += 1
+
+
+class SegmentReader:
+    """
+    Consultas por intervalo de tempo sobre os segmentos de um diretório
+    Cada processo grava os seus segmentos no mesmo diretório, então eles se sobrepõem no tempo:
+    a poda usa o min/max do rodapé e segmentos sobrepostos são intercalados por timestamp
+    Segmentos selados usam o índice do rodapé; o aberto usa live_index, se disponível, ou varredura
+    Segmentos sem rodapé de outros processos (ainda abertos ou abandonados por uma saída abrupta)
+    recebem um rodapé recuperado por varredura incremental, que os limita pelo último registro
+    """
+
+    def __init__(self, directory: Path,
+                 live_index: Optional[Callable[[], Tuple[Optional[Path], List[Tuple[float, int]]]]] = None):
+        self.directory = Path(directory)
+        self.live_index = live_index
+        # Rodapés de segmentos selados (imutáveis): lidos uma vez por caminho
+        self._footers: Dict[Path, Dict[str, Any]] = {}
+        # Rodapés recuperados de segmentos sem rodapé: estendidos a cada consulta se o arquivo cresceu
+        self._recovered: Dict[Path, Dict[str, Any]] = {}
+
+    def segments(self) -> List[Path]:
+        """Segmentos ordenados pelo timestamp inicial"""
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob(f"seg_*{SEGMENT_SUFFIX}"))
+
+    def first_ts(self) -> Optional[float]:
+        """Timestamp inicial do segmento mais antigo (None se não houver segmentos)"""
+        paths = self.segments()
+        return _segment_start(paths[0]) if paths else None
+
+    def iter_range(self, start_ts: float, end_ts: float) -> Iterator[Tuple[float, bytes]]:
+        """(timestamp, payload) dos registros no intervalo, em ordem temporal"""
+        paths = self.segments()
+        listed = set(paths)
+        self._footers = {path: footer for path, footer in self._footers.items() if path in listed}
+        self._recovered = {path: footer for path, footer in self._recovered.items() if path in listed}
+        live_path = self.live_index()[0] if self.live_index is not None else None
+
+        # Segmentos candidatos com o intervalo que cobrem; o aberto deste processo vai até o fim
+        candidates: List[Tuple[float, float, Path, Optional[Dict[str, Any]]]] = []
+        for path in paths:
+            first = _segment_start(path)
+            if first > end_ts + TIME_SKEW:
+                break
+            footer = self._footer(path)
+            if footer is None and live_path is not None and Path(live_path) == path:
+                candidates.append((first, float("inf"), path, None))
+                continue
+            if footer is None:
+                footer = self._recover(path)
+            else:
+                self._recovered.pop(path, None)
+            if footer["count"] and footer["max_ts"] >= start_ts and footer["min_ts"] <= end_ts:
+                candidates.append((footer["min_ts"], footer["max_ts"], path, footer))
+        candidates.sort(key=lambda candidate: candidate[0])
+
+        # Grupos de segmentos sobrepostos: intercalados entre si, grupos lidos em sequência
+        group: List[Tuple[Path, Optional[Dict[str, Any]]]] = []
+        group_end = float("-inf")
+        for first, last, path, footer in candidates:
+            if group and first > group_end + TIME_SKEW:
+                yield from self._iter_group(group, start_ts, end_ts)
+                group = []
+            group.append((path, footer))
+            group_end = max(group_end, last) if len(group) > 1 else last
+        if group:
+            yield from self._iter_group(group, start_ts, end_ts)
+
+    def _iter_group(self, group: List[Tuple[Path, Optional[Dict[str, Any]]]],
+                    start_ts: float, end_ts: float) -> Iterator[Tuple[float, bytes]]:
+        sources = [self._iter_segment(path, footer, start_ts, end_ts) for path, footer in group]
+        if len(sources) == 1:
+            yield from sources[0]
+        else:
+            yield from heapq.merge(*sources, key=lambda record: record[0])
+
+    def _iter_segment(self, path: Path, footer: Optional[Dict[str, Any]],
+                      start_ts: float, end_ts: float) -> Iterator[Tuple[float, bytes]]:
+        with open(path, "rb") as handle:
+            size = handle.seek(0, 2)
+            if size == 0:
+                return
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                data_end = size
+                offset = 0
+                if footer is not None:
+                    data_end = footer["data_end"]
+                    offset = self._seek(footer["index"], start_ts - TIME_SKEW)
+                elif self.live_index is not None:
+                    live_path, index = self.live_index()
+                    if live_path is not None and Path(live_path) == path:
+                        offset = self._seek(index, start_ts - TIME_SKEW)
+
+                while offset + _LENGTH.size <= data_end:
+                    (length,) = _LENGTH.unpack_from(view, offset)
+                    record_end = offset + _LENGTH.size + length
+                    if record_end > data_end:
+                        # Registro truncado (segmento aberto ou encerramento abrupto)
+                        return
+                    (ts,) = _TIMESTAMP.unpack_from(view, offset + _LENGTH.size)
+                    if ts > end_ts + TIME_SKEW:
+                        return
+                    if start_ts <= ts <= end_ts:
+                        yield ts, view[offset + _LENGTH.size + _TIMESTAMP.size:record_end]
+                    offset = record_end
+
+    def _footer(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Rodapé do segmento selado (em cache), ou None se ainda estiver aberto"""
+        footer = self._footers.get(path)
+        if footer is not None:
+            return footer
+        with open(path, "rb") as handle:
+            size = handle.seek(0, 2)
+            if size < _TRAILER.size:
+                return None
+            handle.seek(size - _TRAILER.size)
+            footer_length, magic = _TRAILER.unpack(handle.read(_TRAILER.size))
+            if magic != FOOTER_MAGIC or footer_length > size - _TRAILER.size:
+                return None
+            footer_start = size - _TRAILER.size - footer_length
+            handle.seek(footer_start)
+            try:
+                footer = json.loads(handle.read(footer_length))
+            except ValueError:
+                return None
+        footer["data_end"] = footer_start
+        self._footers[path] = footer
+        return footer
+
+    def _recover(self, path: Path, index_interval: int = 64) -> Dict[str, Any]:
+        """
+        Rodapé equivalente ao do SegmentWriter para um segmento sem rodapé: contagem, min/max,
+        índice esparso e data_end no fim do último registro completo (um registro truncado fica de fora)
+        """
+        footer = self._recovered.get(path)
+        if footer is None:
+            footer = {"count": 0, "min_ts": 0.0, "max_ts": 0.0, "index": [], "data_end": 0}
+            self._recovered[path] = footer
+        with open(path, "rb") as handle:
+            size = handle.seek(0, 2)
+            if size <= footer["data_end"]:
+                return footer
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                offset = footer["data_end"]
+                while offset + _LENGTH.size + _TIMESTAMP.size <= size:
+                    (length,) = _LENGTH.unpack_from(view, offset)
+                    record_end = offset + _LENGTH.size + length
+                    if length < _TIMESTAMP.size or record_end > size:
+                        break
+                    (ts,) = _TIMESTAMP.unpack_from(view, offset + _LENGTH.size)
+                    if footer["count"] % index_interval == 0:
+                        footer["index"].append([ts, offset])
+                    if footer["count"] == 0:
+                        footer["min_ts"] = footer["max_ts"] = ts
+                    else:
+                        footer["min_ts"] = min(footer["min_ts"], ts)
+                        footer["max_ts"] = max(footer["max_ts"], ts)
+                    footer["count"] += 1
+                    offset = record_end
+                footer["data_end"] = offset
+        return footer
+
+    @staticmethod
+    def _seek(index: List[List[float]], ts: float) -> int:
+        """Offset da última entrada do índice esparso com timestamp <= ts"""
+        position = bisect_right([point[0] for point in index], ts) - 1
+        return int(index[position][1]) if position >= 0 else 0
@@ -0,0 +1,289 @@
+"""
+Envio de Logs entre Processos para FlaFludeAgentes
+Cada servidor A2A envia os lotes do escritor por um socket Unix a um agregador, que os insere
+no EnhancedLogger do processo do dashboard (consultas e métricas de todos os processos)
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+
+SOCKET_ENV = "FLAFLU_LOG_SOCKET"   # caminho do socket; sem ele os processos não enviam logs
+SOURCE_ENV = "FLAFLU_LOG_SOURCE"   # nome do processo de origem (ex.: flamengo_agent)
+DEFAULT_SOCKET = "logs/aggregator.sock"
+
+# Frame: tamanho do payload + timestamp epoch + payload (mesmo registro dos segmentos binários)
+_FRAME = struct.Struct("<Id")
+# Apresentação da conexão: tamanho + JSON {"source", "pid"}
+_HELLO = struct.Struct("<I")
+
+
+def shipping_supported() -> bool:
+    return hasattr(socket, "AF_UNIX")
+
+
+def default_source() -> str:
+    return os.getenv(SOURCE_ENV) or f"pid{os.getpid()}"
+
+
+class LogShipper:
+    """
+    Sink do AsyncLogWriter: envia cada lote ao agregador, na thread do escritor
+    Sem agregador os frames aguardam numa fila limitada (os mais antigos são descartados)
+    e a reconexão é tentada a cada retry_interval; entrega ao menos uma vez
+    Após um envio parcial só os frames que não chegaram inteiros ao socket são reenviados
+    """
+
+    def __init__(self,
+                 path: str,
+                 source: Optional[str] = None,
+                 encoder: Optional[Callable[[Any], Tuple[float, bytes]]] = None,
+                 max_backlog: int = 10000,
+                 retry_interval: float = 1.0,
+                 timeout: float = 0.5):
+        self.path = path
+        self.source = source or default_source()
+        self.encoder = encoder
+        self.max_backlog = max_backlog
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self._backlog: Deque[bytes] = deque()
+        self._sock: Optional[socket.socket] = None
+        self._next_attempt = 0.0
+        self.stats = {"shipped": 0, "dropped": 0, "connects": 0, "send_errors": 0}
+
+    @property
+    def connected(self) -> bool:
+        return self._sock is not None
+
+    @property
+    def backlog(self) -> int:
+        return len(self._backlog)
+
+    def write_batch(self, batch: Iterable[Any]):
+        """Codifica o lote e envia tudo o que estiver pendente numa única escrita"""
+        for item in batch:
+            ts, payload = self.encoder(item) if self.encoder else item
+            self._backlog.append(_FRAME.pack(len(payload), ts) + payload)
+        overflow = len(self._backlog) - self.max_backlog
+        for _ in range(max(0, overflow)):
+            self._backlog.popleft()
+        if overflow > 0:
+            self.stats["dropped"] += overflow
+        self._send()
+
+    def close(self):
+        self._send()
+        self._disconnect()
+
+    def reset_after_fork(self, source: Optional[str] = None):
+        """No filho após fork: conexão própria (a herdada é do pai) e backlog vazio"""
+        self._disconnect()
+        self._backlog.clear()
+        self._next_attempt = 0.0
+        self.stats = dict.fromkeys(self.stats, 0)
+        if source:
+            self.source = source
+
+    def _send(self):
+        if not self._backlog:
+            return
+        sock = self._connect()
+        if sock is None:
+            return
+        view = memoryview(b"".join(self._backlog))
+        sent = 0
+        try:
+            while sent < len(view):
+                sent += sock.send(view[sent:])
+        except OSError:
+            # Frames entregues ao socket inteiros já serão lidos pelo agregador; o frame parcial
+            # é descartado por ele ao perder a conexão e volta a ser enviado com o restante
+            self.stats["send_errors"] += 1
+            self._disconnect()
+        finally:
+            self._trim(sent)
+
+    def _trim(self, sent: int):
+        """Remove do backlog os frames cujos bytes foram todos aceitos pelo socket"""
+        while self._backlog and len(self._backlog[0]) <= sent:
+            sent -= len(self._backlog.popleft())
+            self.stats["shipped"] += 1
+
+    def _connect(self) -> Optional[socket.socket]:
+        if self._sock is not None:
+            return self._sock
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return None
+        self._next_attempt = now + self.retry_interval
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.path)
+            hello = json.dumps({"source": self.source, "pid": os.getpid()}).encode("utf-8")
+            sock.sendall(_HELLO.pack(len(hello)) + hello)
+        except OSError:
+            sock.close()
+            return None
+        self._sock = sock
+        self.stats["connects"] += 1
+        return sock
+
+    def _disconnect(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+
+
+def _read_exact(stream, size: int) -> Optional[bytes]:
+    data = stream.read(size)
+    return data if data is not None and len(data) == size else None
+
+
+class LogAggregator:
+    """
+    Servidor do socket Unix: uma thread por processo conectado
+    Cada frame recebido é entregue a ingest(origem, timestamp, payload)
+    """
+
+    def __init__(self, path: str, ingest: Callable[[str, float, bytes], None]):
+        self.path = path
+        self.ingest = ingest
+        self.sources: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[socket.socket] = None
+        self._connections: List[socket.socket] = []
+        self._closed = False
+
+    def start(self) -> "LogAggregator":
+        """Abre o socket (removendo um arquivo órfão) e inicia a thread de aceitação"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise OSError(f"Já existe um agregador de logs ativo em {self.path}")
+            finally:
+                probe.close()
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(16)
+        self._server = server
+        threading.Thread(target=self._accept_loop, name="LogAggregator", daemon=True).start()
+        return self
+
+    def close(self):
+        self._closed = True
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            conn.close()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Processos conhecidos: pid, conectado, entradas recebidas e último frame (epoch)"""
+        with self._lock:
+            return {source: dict(info) for source, info in self.sources.items()}
+
+    def _accept_loop(self):
+        server = self._server
+        while not self._closed:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self._connections.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), name="LogAggregatorConn", daemon=True).start()
+
+    def _serve(self, conn: socket.socket):
+        stream = conn.makefile("rb")
+        source = None
+        try:
+            header = _read_exact(stream, _HELLO.size)
+            if header is None:
+                return
+            hello = _read_exact(stream, _HELLO.unpack(header)[0])
+            if hello is None:
+                return
+            info = json.loads(hello)
+            source = str(info.get("source") or "desconhecido")
+            with self._lock:
+                known = self.sources.setdefault(source, {"entries": 0, "last_ts": None})
+                known.update(pid=info.get("pid"), connected=True)
+
+            while True:
+                header = _read_exact(stream, _FRAME.size)
+                if header is None:
+                    return
+                length, ts = _FRAME.unpack(header)
+                payload = _read_exact(stream, length)
+                if payload is None:
+                    return
+                self.ingest(source, ts, payload)
+                with self._lock:
+                    known["entries"] += 1
+                    known["last_ts"] = ts
+        except (OSError, ValueError):
+            return
+        finally:
+            stream.close()
+            conn.close()
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+                if source in self.sources:
+                    self.sources[source]["connected"] = False
+
+
+_aggregator: Optional[LogAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def start_log_aggregator(logger=None, path: Optional[str] = None) -> Optional[LogAggregator]:
+    """
+    Agregador único do processo, inserindo no logger (padrão: enhanced_logger)
+    Idempotente (reruns do Streamlit); o próprio processo deixa de enviar logs para não duplicá-los
+    """
+    global _aggregator
+    if not shipping_supported():
+        return None
+    if logger is None:
+        from .enhanced_logger import enhanced_logger as logger
+    with _aggregator_lock:
+        if _aggregator is None:
+            path = os.path.abspath(path or os.getenv(SOCKET_ENV) or DEFAULT_SOCKET)
+            logger.disable_shipping()
+            _aggregator = LogAggregator(path, logger.ingest_record).start()
+        return _aggregator
+
+
+def get_log_aggregator() -> Optional[LogAggregator]:
+    return _aggregator
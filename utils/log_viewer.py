@@ -13,12 +13,22 @@ try:
     import pandas as pd
     import plotly.express as px
     import plotly.graph_objects as go
+    from .log_frame import LogFrameCache
     PLOTLY_AVAILABLE = True
 except ImportError:
     PLOTLY_AVAILABLE = False
     st.warning("⚠️ Plotly não instalado. Gráficos não estarão disponíveis. Execute: `uv add plotly pandas`")
 
 from .enhanced_logger import enhanced_logger, LogLevel, LogCategory
+from .log_shipping import get_log_aggregator
+from .tracing import collect_trace, to_chrome_trace, trace_store
+
+
+if PLOTLY_AVAILABLE:
+    @st.cache_resource
+    def get_log_frame_cache() -> "LogFrameCache":
+        """DataFrame incremental dos logs, compartilhado entre reruns e sessões"""
+        return LogFrameCache(enhanced_logger)
 
 
 class LogViewer:
@@ -44,6 +54,10 @@ class LogViewer:
             "SYSTEM_EVENT": "#20B2AA",
             "DEBATE_FLOW": "#FF6347"
         }
+        
+        # Filtros ativos no dashboard (aplicados também aos gráficos)
+        self.active_filters: Dict[str, str] = {}
+        self.frame_cache = get_log_frame_cache() if PLOTLY_AVAILABLE else None
     
     def render_main_dashboard(self):
         """Renderiza o dashboard principal de logs"""
@@ -51,6 +65,8 @@ class LogViewer:
         
         # Métricas de performance
         metrics = enhanced_logger.get_performance_metrics()
+        agent_latency = metrics.get("latency", {}).get("agent", {})
+        overall = agent_latency.get("*") or {}
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -65,7 +81,8 @@ class LogViewer:
             st.metric(
                 "Execuções de Agentes", 
                 metrics["agent_executions"],
-                delta=f"{metrics['avg_response_time']:.1f}ms média"
+                delta=(f"p95 {overall['p95_ms']:.1f}ms" if overall.get("p95_ms") is not None
+                       else f"{metrics['avg_response_time']:.1f}ms média")
             )
         
         with col3:
@@ -83,6 +100,9 @@ class LogViewer:
                 delta_color="inverse"
             )
         
+        self.render_latency_table(metrics)
+        self.render_log_sources()
+        
         # Filtros
         st.markdown("#### 🔍 **Filtros de Log**")
         col1, col2, col3 = st.columns(3)
@@ -112,6 +132,17 @@ class LogViewer:
         category_filter = None if selected_category == "Todas" else LogCategory(selected_category)
         agent_filter = None if selected_agent == "Todos" else selected_agent
         level_filter = None if selected_level == "Todos" else LogLevel(selected_level)
+        self.active_filters = {
+            key: value for key, value in (
+                ("category", category_filter.value if category_filter else None),
+                ("agent_name", agent_filter),
+                ("level", level_filter.value if level_filter else None),
+            ) if value
+        }
+        
+        # Incorpora apenas as entradas novas ao DataFrame dos gráficos
+        if self.frame_cache is not None:
+            self.frame_cache.refresh()
         
         # Buscar logs
         recent_logs = enhanced_logger.get_recent_logs(
@@ -123,6 +154,55 @@ class LogViewer:
         
         return recent_logs
     
+    def render_latency_table(self, metrics: Dict[str, Any]):
+        """Quantis de latência e taxas por agente, tool e rota A2A (snapshot pré-agregado)"""
+        latency = metrics.get("latency", {})
+        if not latency:
+            return
+        
+        labels = {"agent": "🤖 Agente", "tool": "🔧 Tool", "a2a_route": "🔗 Rota A2A"}
+        rows = []
+        for kind, series in latency.items():
+            for name, summary in sorted(series.items()):
+                rows.append({
+                    "Tipo": labels.get(kind, kind),
+                    "Nome": "todos" if name == "*" else name,
+                    "Amostras": summary["count"],
+                    "p50 (ms)": summary["p50_ms"],
+                    "p95 (ms)": summary["p95_ms"],
+                    "p99 (ms)": summary["p99_ms"],
+                    "Máx (ms)": summary["max_ms"],
+                    "Taxa 1m (/min)": summary["rate_per_min"]["1m"],
+                    "Taxa 5m (/min)": summary["rate_per_min"]["5m"],
+                    "Taxa 15m (/min)": summary["rate_per_min"]["15m"],
+                })
+        
+        with st.expander("⏱️ Latência p50/p95/p99 e taxas (1m/5m/15m)"):
+            st.dataframe(rows, use_container_width=True)
+    
+    def render_log_sources(self):
+        """Processos que enviam logs ao agregador deste dashboard"""
+        aggregator = get_log_aggregator()
+        if aggregator is None:
+            return
+        
+        rows = [
+            {
+                "Processo": source,
+                "PID": info.get("pid"),
+                "Conectado": "🟢" if info.get("connected") else "🔴",
+                "Entradas": info["entries"],
+                "Último evento": (datetime.fromtimestamp(info["last_ts"]).strftime("%H:%M:%S")
+                                  if info["last_ts"] else "—"),
+            }
+            for source, info in sorted(aggregator.snapshot().items())
+        ]
+        with st.expander(f"🛰️ Processos enviando logs ({sum(1 for row in rows if row['Conectado'] == '🟢')})"):
+            if rows:
+                st.dataframe(rows, use_container_width=True)
+            else:
+                st.info(f"Nenhum servidor conectado em {aggregator.path}")
+    
     def render_log_timeline(self, logs: List[Dict[str, Any]]):
         """Renderiza timeline de eventos"""
         if not logs:
@@ -150,10 +230,8 @@ class LogViewer:
                     st.markdown(f"  {agent_emoji} {log.get('agent_name', 'Sistema')}: {log['event_type']} - {log['level']}")
             return
         
-        # Converte para DataFrame
-        df = pd.DataFrame(logs)
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        df = df.sort_values('timestamp')
+        # Linhas finais do DataFrame incremental: já tipadas (datetime64) e em ordem cronológica
+        df = self.frame_cache.recent(limit=len(logs), **self.active_filters)
         
         # Gráfico de timeline
         fig = px.scatter(
@@ -203,9 +281,10 @@ class LogViewer:
                     st.markdown(f"  {emoji} **{agent.title()}**: {count} eventos ({percentage:.1f}%)")
                 return
             
-            # Gráfico de barras
-            agents = list(agent_counts.keys())
-            counts = list(agent_counts.values())
+            # Gráfico de barras com os agregados incrementais (toda a janela em memória)
+            summary = self.frame_cache.summary(**self.active_filters)
+            agents = summary['agent_name'].tolist() or list(agent_counts.keys())
+            counts = summary['events'].astype(int).tolist() or list(agent_counts.values())
             
             fig = go.Figure(data=[
                 go.Bar(
@@ -273,12 +352,12 @@ class LogViewer:
                 
                 return
             
-            df = pd.DataFrame(perf_logs)
-            df['timestamp'] = pd.to_datetime(df['timestamp'])
+            recent = self.frame_cache.recent(limit=len(logs), **self.active_filters)
+            df = recent[recent['duration_ms'].notna()]
             
             # Gráfico de linha para tempo de resposta
             fig = px.line(
-                df.sort_values('timestamp'),
+                df,
                 x='timestamp',
                 y='duration_ms',
                 color='agent_name',
@@ -294,19 +373,21 @@ class LogViewer:
             
             st.plotly_chart(fig, use_container_width=True)
             
-            # Estatísticas
+            # Estatísticas combinadas dos agregados por bloco (sem reprocessar linhas antigas)
+            summary = self.frame_cache.summary(**self.active_filters)
+            timed = summary[summary['timed'] > 0]
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                avg_duration = df['duration_ms'].mean()
+                avg_duration = (timed['avg_ms'] * timed['timed']).sum() / max(timed['timed'].sum(), 1)
                 st.metric("⏱️ Tempo Médio", f"{avg_duration:.1f}ms")
             
             with col2:
-                max_duration = df['duration_ms'].max()
+                max_duration = timed['max_ms'].max() if len(timed) else 0.0
                 st.metric("🏃 Mais Lento", f"{max_duration:.1f}ms")
             
             with col3:
-                min_duration = df['duration_ms'].min()
+                min_duration = timed['min_ms'].min() if len(timed) else 0.0
                 st.metric("⚡ Mais Rápido", f"{min_duration:.1f}ms")
     
     def render_detailed_logs(self, logs: List[Dict[str, Any]], limit: int = 20):
@@ -383,7 +464,7 @@ class LogViewer:
         with col1:
             search_query = st.text_input(
                 "🔎 Buscar nos logs:",
-                placeholder="Digite termos para buscar...",
+                placeholder="Ex.: títulos maraca* agent:flamengo level:ERROR",
                 key="log_search_query"
             )
         
@@ -409,12 +490,12 @@ class LogViewer:
         """Interface de exportação de logs"""
         st.markdown("#### 📥 **Exportar Logs**")
         
-        col1, col2, col3 = st.columns(3)
+        col1, col2, col3, col4 = st.columns(4)
         
         with col1:
             export_format = st.selectbox(
                 "📄 Formato:",
-                ["JSON", "CSV"],
+                ["NDJSON", "CSV", "JSON"],
                 key="export_format"
             )
         
@@ -428,24 +509,31 @@ class LogViewer:
             )
         
         with col3:
+            compress = st.checkbox("🗜️ Compactar (gzip)", value=False, key="export_gzip")
+        
+        with col4:
             st.markdown("<br>", unsafe_allow_html=True)
             if st.button("📥 Exportar", key="export_logs_btn"):
                 end_time = datetime.now()
                 start_time = end_time - timedelta(hours=hours_back)
                 
-                # Exporta logs
-                exported_data = enhanced_logger.export_logs(
+                # O download_button do Streamlit guarda o arquivo inteiro em memória: os blocos do
+                # stream são juntados uma vez, só no clique (com gzip, já compactados);
+                # intervalos além da janela em memória vêm dos segmentos e arquivos diários
+                data = b"".join(enhanced_logger.export_logs_stream(
                     format=export_format.lower(),
-                    time_range=(start_time.isoformat(), end_time.isoformat())
-                )
+                    time_range=(start_time.isoformat(), end_time.isoformat()),
+                    compress=compress
+                ))
                 
                 # Download
-                filename = f"fla_flu_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format.lower()}"
+                extension = export_format.lower() + (".gz" if compress else "")
+                filename = f"fla_flu_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
                 st.download_button(
                     label=f"⬇️ Download {export_format}",
-                    data=exported_data,
+                    data=data,
                     file_name=filename,
-                    mime=f"application/{export_format.lower()}"
+                    mime="application/gzip" if compress else f"application/{export_format.lower()}"
                 )
     
     def render_correlation_tracker(self):
@@ -470,9 +558,9 @@ class LogViewer:
                 
                 # Timeline específica
                 if len(flow_logs) > 1:
+                    # get_agent_flow já retorna em ordem cronológica
                     df = pd.DataFrame(flow_logs)
-                    df['timestamp'] = pd.to_datetime(df['timestamp'])
-                    df = df.sort_values('timestamp')
+                    df['timestamp'] = pd.to_datetime(df['timestamp'], format="ISO8601")
                     
                     # Gráfico de fluxo
                     fig = px.line(
@@ -490,6 +578,32 @@ class LogViewer:
                 self.render_detailed_logs(flow_logs, limit=20)
             else:
                 st.warning(f"❌ Nenhum evento encontrado para correlação {correlation_id}")
+            
+            self.render_trace_export(correlation_id)
+    
+    def render_trace_export(self, trace_id: str):
+        """Exporta o trace (correlation_id == trace_id) para chrome://tracing / Perfetto"""
+        if not trace_store.get(trace_id):
+            return
+        
+        st.markdown("##### 🧵 **Trace distribuído**")
+        peers = st.text_input(
+            "🌐 Servidores A2A (URLs separadas por vírgula):",
+            placeholder="http://localhost:8002, http://localhost:8005",
+            key="trace_peers"
+        )
+        spans = collect_trace(trace_id, [peer.strip() for peer in peers.split(",")])
+        trace = to_chrome_trace(spans)
+        summary = trace.get("otherData", {})
+        if summary.get("critical_path"):
+            st.info(f"⏱️ {summary['duration_ms']:.1f}ms | {summary['spans']} spans | "
+                    f"caminho crítico: {' → '.join(summary['critical_path'])}")
+        st.download_button(
+            label="⬇️ Download trace (Chrome/Perfetto)",
+            data=json.dumps(trace, ensure_ascii=False),
+            file_name=f"trace_{trace_id[:16]}.json",
+            mime="application/json"
+        )
 
 
 def render_log_dashboard():
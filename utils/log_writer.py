@@ -0,0 +1,299 @@
+"""
+Escritor Assíncrono de Logs para FlaFludeAgentes
+Tira a serialização e o I/O de disco do caminho quente do EnhancedLogger
+"""
+
+import atexit
+import queue
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Política de sobrecarga quando a fila está cheia
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP = "drop"
+
+
+# Escritores abertos, drenados no encerramento do interpretador por um único hook
+# (referências fracas: loggers de vida curta continuam coletáveis)
+_open_writers: "weakref.WeakSet[AsyncLogWriter]" = weakref.WeakSet()
+
+
+def _close_open_writers():
+    for writer in list(_open_writers):
+        writer.close()
+
+
+atexit.register(_close_open_writers)
+
+
+class _Marker:
+    """Marcador de controle enviado pela fila (flush ou encerramento)"""
+
+    def __init__(self, stop: bool = False, release: bool = False):
+        self.stop = stop
+        # Encerramento pelo coletor de lixo: a própria thread fecha arquivos e sinks
+        self.release = release
+        self.done = threading.Event()
+
+
+class _WriterCore:
+    """
+    Fila, arquivos, sinks e loop da thread de escrita
+    A thread referencia só o núcleo: o AsyncLogWriter continua coletável enquanto ela roda
+    """
+
+    def __init__(self, log_dir: Path, formatter: Callable[[Any], Tuple[str, str]], batch_size: int,
+                 flush_interval: float, max_queue: int, sinks: Sequence[Any]):
+        self.log_dir = Path(log_dir)
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.sinks = list(sinks)
+        self.queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queue)
+        self.files: Dict[str, BinaryIO] = {}
+        self.stats = {
+            "submitted": 0,
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "write_errors": 0,
+        }
+
+    def stop_async(self):
+        """Finalizador do AsyncLogWriter descartado: pede à thread que drene, grave e feche tudo"""
+        try:
+            self.queue.put(_Marker(stop=True, release=True), timeout=1.0)
+        except queue.Full:
+            pass
+
+    def run(self):
+        """Loop da thread de escrita: agrupa por tamanho ou por intervalo"""
+        batch: List[Any] = []
+        deadline = 0.0
+
+        while True:
+            timeout = self.flush_interval if not batch else max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                self.write_batch(batch)
+                batch = []
+                continue
+
+            if isinstance(item, _Marker):
+                self.write_batch(batch)
+                batch = []
+                if item.release:
+                    self.release()
+                item.done.set()
+                if item.stop:
+                    return
+                continue
+
+            if not batch:
+                deadline = time.monotonic() + self.flush_interval
+            batch.append(item)
+
+            if len(batch) >= self.batch_size:
+                self.write_batch(batch)
+                batch = []
+
+    def write_batch(self, batch: List[Any]):
+        """Formata o lote e grava uma única vez em cada arquivo de destino"""
+        if not batch:
+            return
+
+        lines_by_file: Dict[str, List[str]] = {}
+        for entry in batch:
+            try:
+                filename, line = self.formatter(entry)
+            except Exception:
+                self.stats["write_errors"] += 1
+                continue
+            lines_by_file.setdefault(filename, []).append(line)
+
+        for filename, lines in lines_by_file.items():
+            try:
+                view = memoryview(("\n".join(lines) + "\n").encode("utf-8"))
+                handle = self.get_file(filename)
+                while view:
+                    view = view[handle.write(view):]
+                self.stats["written"] += len(lines)
+            except Exception:
+                self.stats["write_errors"] += 1
+
+        for sink in self.sinks:
+            try:
+                sink.write_batch(batch)
+            except Exception:
+                self.stats["write_errors"] += 1
+
+        self.stats["batches"] += 1
+
+        # Fecha arquivos de dias anteriores (rotação diária)
+        if len(self.files) > len(lines_by_file) + 3:
+            for filename in [name for name in self.files if name not in lines_by_file]:
+                self.files.pop(filename).close()
+
+    def get_file(self, filename: str) -> BinaryIO:
+        """
+        Abre (uma vez) o arquivo de log em modo append, sem buffer: cada lote vai direto ao descritor
+        e um filho após fork não tem bytes pendentes do pai para regravar ao fechar a cópia herdada
+        """
+        handle = self.files.get(filename)
+        if handle is None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+            handle = open(self.log_dir / filename, "ab", buffering=0)
+            self.files[filename] = handle
+        return handle
+
+    def close_files(self):
+        for handle in self.files.values():
+            try:
+                handle.close()
+            except Exception:
+                pass
+        self.files.clear()
+
+    def release(self):
+        """Fecha arquivos e sinks"""
+        self.close_files()
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception:
+                self.stats["write_errors"] += 1
+
+
+class AsyncLogWriter:
+    """
+    Escritor em lote numa thread de fundo
+    Recebe entradas via fila, agrupa por tamanho ou intervalo e grava uma vez por arquivo
+    Sinks adicionais (write_batch/close) recebem cada lote na mesma thread
+    A thread e os arquivos só são criados na primeira entrada enfileirada; um escritor descartado
+    sem close() é drenado e fechado pela própria thread, que então termina
+    """
+
+    def __init__(self,
+                 log_dir: Path,
+                 formatter: Callable[[Any], Tuple[str, str]],
+                 batch_size: int = 256,
+                 flush_interval: float = 0.25,
+                 max_queue: int = 10000,
+                 overflow: str = OVERFLOW_BLOCK,
+                 block_timeout: float = 0.05,
+                 sinks: Sequence[Any] = ()):
+        if overflow not in (OVERFLOW_BLOCK, OVERFLOW_DROP):
+            raise ValueError(f"Política de sobrecarga inválida: {overflow}")
+
+        self._core = _WriterCore(log_dir, formatter, batch_size, flush_interval, max_queue, sinks)
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._closed = False
+
+        self._thread: Optional[threading.Thread] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._start_lock = threading.Lock()
+        _open_writers.add(self)
+
+    @property
+    def log_dir(self) -> Path:
+        return self._core.log_dir
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return self._core.stats
+
+    @property
+    def sinks(self) -> List[Any]:
+        return self._core.sinks
+
+    @sinks.setter
+    def sinks(self, sinks: Sequence[Any]):
+        self._core.sinks = list(sinks)
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._core.run, name="EnhancedLoggerWriter", daemon=True
+                )
+                self._thread.start()
+                if self._finalizer is None:
+                    self._finalizer = weakref.finalize(self, self._core.stop_async)
+                    # No encerramento do interpretador quem fecha é _close_open_writers
+                    self._finalizer.atexit = False
+
+    def submit(self, entry: Any) -> bool:
+        """Enfileira uma entrada; retorna False se ela foi descartada por sobrecarga"""
+        stats = self._core.stats
+        if self._closed:
+            stats["dropped"] += 1
+            return False
+        if self._thread is None:
+            self._start()
+
+        try:
+            if self.overflow == OVERFLOW_BLOCK:
+                self._core.queue.put(entry, timeout=self.block_timeout)
+            else:
+                self._core.queue.put_nowait(entry)
+        except queue.Full:
+            stats["dropped"] += 1
+            return False
+
+        stats["submitted"] += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Aguarda até que tudo o que foi enfileirado até agora esteja em disco"""
+        if self._closed or self._thread is None or not self._thread.is_alive():
+            return True
+        marker = _Marker()
+        try:
+            self._core.queue.put(marker, timeout=timeout)
+        except queue.Full:
+            return False
+        return marker.done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Drena a fila, grava o restante e fecha os arquivos (hook de shutdown)"""
+        if self._closed:
+            return
+        if self._finalizer is not None:
+            self._finalizer.detach()
+        if self._thread is not None and self._thread.is_alive():
+            marker = _Marker(stop=True)
+            try:
+                self._core.queue.put(marker, timeout=timeout)
+                marker.done.wait(timeout)
+            except queue.Full:
+                pass
+        self._closed = True
+        _open_writers.discard(self)
+        self._core.release()
+
+    def reset_after_fork(self):
+        """
+        No filho após fork: fila, thread e arquivos próprios
+        Entradas ainda na fila herdada ficam com o pai; sinks com reset_after_fork também são refeitos
+        """
+        core = self._core
+        core.queue = queue.Queue(maxsize=core.queue.maxsize)
+        self._thread = None
+        self._start_lock = threading.Lock()
+        # Arquivos sem buffer: fechar as cópias herdadas só libera os descritores
+        core.close_files()
+        for sink in core.sinks:
+            reset = getattr(sink, "reset_after_fork", None)
+            if reset is not None:
+                reset()
+
+    @property
+    def pending(self) -> int:
+        """Entradas aguardando escrita"""
+        return self._core.queue.qsize()
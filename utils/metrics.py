@@ -0,0 +1,326 @@
+"""
+Métricas Pré-agregadas para FlaFludeAgentes
+Sketches de quantis (estilo DDSketch) e taxas em janelas de 1/5/15 minutos,
+atualizados em O(1) por evento e lidos por snapshot sem reprocessar logs
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class QuantileSketch:
+    """
+    Sketch de quantis com erro relativo limitado (buckets logarítmicos, estilo DDSketch)
+    Memória proporcional à faixa dinâmica dos valores, não ao número de amostras
+    """
+
+    __slots__ = ("relative_accuracy", "_gamma", "_log_gamma", "_buckets",
+                 "_zero_count", "count", "total", "min", "max")
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._buckets: Dict[int, int] = {}
+        self._zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if value <= 0:
+            self._zero_count += 1
+            return
+        key = math.ceil(math.log(value) / self._log_gamma)
+        self._buckets[key] = self._buckets.get(key, 0) + 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valor aproximado do quantil q (0..1), com erro relativo <= relative_accuracy"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        seen = self._zero_count
+        if rank < seen:
+            return min(self.min, 0.0)
+        for key in sorted(self._buckets):
+            seen += self._buckets[key]
+            if seen > rank:
+                # Ponto médio do bucket (em escala relativa) dentro de [min, max]
+                value = 2 * self._gamma ** key / (1 + self._gamma)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def merge(self, other: "QuantileSketch"):
+        """Combina outro sketch com a mesma precisão"""
+        for key, count in other._buckets.items():
+            self._buckets[key] = self._buckets.get(key, 0) + count
+        self._zero_count += other._zero_count
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+
+# Limites dos buckets de latência em ms (chamadas de LLM chegam a dezenas de segundos)
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Limites dos buckets de tamanho em bytes (argumentos e resultados de tools)
+SIZE_BUCKETS_BYTES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class BucketHistogram:
+    """Histograma de buckets fixos, no formato agregável do Prometheus"""
+
+    __slots__ = ("bounds", "_counts")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        # Último bucket é o +Inf
+        self._counts = [0] * (len(bounds) + 1)
+
+    def add(self, value: float):
+        self._counts[bisect_left(self.bounds, value)] += 1
+
+    def cumulative(self) -> List[int]:
+        """Contagens acumuladas por limite (le), terminando no +Inf"""
+        total = 0
+        result = []
+        for count in self._counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class RateMeter:
+    """
+    Taxas por minuto com média móvel exponencial em janelas de 1, 5 e 15 minutos
+    (mesmo esquema do load average): ticks a cada 5s aplicados preguiçosamente
+    """
+
+    TICK_SECONDS = 5.0
+    WINDOWS = (("1m", 60.0), ("5m", 300.0), ("15m", 900.0))
+
+    __slots__ = ("_clock", "_last_tick", "_pending", "_rates", "_alphas", "_initialized", "count")
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._last_tick = clock()
+        self._pending = 0
+        self._rates = [0.0, 0.0, 0.0]
+        self._alphas = [1 - math.exp(-self.TICK_SECONDS / window) for _, window in self.WINDOWS]
+        self._initialized = False
+        self.count = 0
+
+    def mark(self, n: int = 1):
+        self._tick_if_needed()
+        self._pending += n
+        self.count += n
+
+    def _tick_if_needed(self):
+        elapsed = self._clock() - self._last_tick
+        if elapsed < self.TICK_SECONDS:
+            return
+        ticks = int(elapsed // self.TICK_SECONDS)
+        self._last_tick += ticks * self.TICK_SECONDS
+        for i, alpha in enumerate(self._alphas):
+            instant = self._pending / self.TICK_SECONDS
+            if self._initialized:
+                self._rates[i] += alpha * (instant - self._rates[i])
+            else:
+                self._rates[i] = instant
+            # Ticks sem eventos decaem a taxa de uma vez: (1 - alpha) ** (ticks - 1)
+            self._rates[i] *= (1 - alpha) ** (ticks - 1)
+        self._initialized = True
+        self._pending = 0
+
+    def rates(self) -> Dict[str, float]:
+        """Eventos por minuto em cada janela"""
+        self._tick_if_needed()
+        return {name: round(rate * 60, 3) for (name, _), rate in zip(self.WINDOWS, self._rates)}
+
+
+class LatencySeries:
+    """
+    Série de latência (ou tamanho): sketch de quantis, histograma, medidor de taxa e snapshot em cache
+    unit nomeia os campos do resumo (p95_ms, p95_bytes, ...)
+    """
+
+    __slots__ = ("sketch", "histogram", "meter", "unit", "_clock", "_snapshot", "_snapshot_count", "_snapshot_at")
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic,
+                 bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS, unit: str = "ms"):
+        self.sketch = QuantileSketch()
+        self.histogram = BucketHistogram(bounds)
+        self.meter = RateMeter(clock)
+        self.unit = unit
+        self._clock = clock
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._snapshot_count = -1
+        self._snapshot_at = 0.0
+
+    def observe(self, duration_ms: float):
+        self.sketch.add(duration_ms)
+        self.histogram.add(duration_ms)
+        self.meter.mark()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo da série; recalculado apenas com novas amostras ou após um tick de taxa"""
+        now = self._clock()
+        if self._snapshot is not None and self._snapshot_count == self.sketch.count \
+                and now - self._snapshot_at < RateMeter.TICK_SECONDS:
+            return self._snapshot
+        sketch = self.sketch
+        unit = self.unit
+        self._snapshot = {
+            "count": sketch.count,
+            f"mean_{unit}": _round(sketch.mean),
+            f"p50_{unit}": _round(sketch.quantile(0.50)),
+            f"p95_{unit}": _round(sketch.quantile(0.95)),
+            f"p99_{unit}": _round(sketch.quantile(0.99)),
+            f"max_{unit}": _round(sketch.max if sketch.count else None),
+            "rate_per_min": self.meter.rates(),
+        }
+        self._snapshot_count = sketch.count
+        self._snapshot_at = now
+        return self._snapshot
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+# Tipos de série agregada
+AGENT = "agent"
+TOOL = "tool"
+A2A_ROUTE = "a2a_route"
+HTTP = "http"
+
+# Tamanhos (bytes) de argumentos e resultados de tools e contagem de exceções
+TOOL_ARGS = "tool_args"
+TOOL_RESULT = "tool_result"
+TOOL_ERRORS = "tool_errors"
+SIZE_KINDS = (TOOL_ARGS, TOOL_RESULT)
+
+# Chamadas idênticas concorrentes atendidas por uma única execução (single-flight)
+COALESCED = "coalesced"
+
+# Controle de admissão dos servidores A2A: espera na fila (ms), rejeições e medidores instantâneos
+ADMISSION_WAIT = "admission_wait"
+ADMISSION_REJECTED = "admission_rejected"
+ADMISSION_IN_FLIGHT = "admission_in_flight"
+ADMISSION_QUEUE = "admission_queue"
+
+# Cota do provedor do LLM: espera no limitador (ms) e chamadas que desistiram, por classe de prioridade
+LLM_QUOTA_WAIT = "llm_quota_wait"
+LLM_QUOTA_TIMEOUTS = "llm_quota_timeouts"
+
+# Resiliência das chamadas A2A por agente: novas tentativas, hedges, recusas e estado do circuit breaker
+A2A_RETRIES = "a2a_retries"
+A2A_HEDGES = "a2a_hedges"
+CIRCUIT_REJECTED = "circuit_rejected"
+CIRCUIT_STATE = "circuit_state"
+
+# Nome da série que agrega todas as demais do mesmo tipo
+ALL = "*"
+
+
+class MetricsRegistry:
+    """
+    Registro de séries por (tipo, nome), contadores, valores instantâneos e medidores de eventos
+    Cada observação atualiza também a série agregada ALL do tipo; tipos em SIZE_KINDS medem bytes
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._series: Dict[Tuple[str, str], LatencySeries] = {}
+        self._meters: Dict[str, RateMeter] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._gauges: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, name: str, value: float):
+        with self._lock:
+            for key in ((kind, name), (kind, ALL)):
+                series = self._series.get(key)
+                if series is None:
+                    if kind in SIZE_KINDS:
+                        series = LatencySeries(self._clock, SIZE_BUCKETS_BYTES, "bytes")
+                    else:
+                        series = LatencySeries(self._clock)
+                    self._series[key] = series
+                series.observe(value)
+
+    def increment(self, kind: str, name: str, n: int = 1):
+        with self._lock:
+            self._counters[(kind, name)] = self._counters.get((kind, name), 0) + n
+
+    def counters(self) -> Dict[Tuple[str, str], int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def set_gauge(self, kind: str, name: str, value: float):
+        with self._lock:
+            self._gauges[(kind, name)] = value
+
+    def gauges(self) -> Dict[Tuple[str, str], float]:
+        with self._lock:
+            return dict(self._gauges)
+
+    def mark(self, meter: str, n: int = 1):
+        with self._lock:
+            rate = self._meters.get(meter)
+            if rate is None:
+                rate = self._meters[meter] = RateMeter(self._clock)
+            rate.mark(n)
+
+    def series(self, kind: str, name: str = ALL) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            series = self._series.get((kind, name))
+            return dict(series.snapshot()) if series is not None else None
+
+    def histograms(self) -> List[Tuple[str, str, Tuple[float, ...], List[int], float]]:
+        """(tipo, nome, limites, contagens acumuladas, soma) de cada série nomeada, na unidade da série"""
+        with self._lock:
+            return [
+                (kind, name, series.histogram.bounds, series.histogram.cumulative(), series.sketch.total)
+                for (kind, name), series in self._series.items()
+                if name != ALL
+            ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Visão para o dashboard: {latency: {tipo: {nome: resumo}}, sizes: {...},
+        rates: {medidor: taxas}, counters: {tipo: {nome: total}}, gauges: {tipo: {nome: valor}}}
+        """
+        with self._lock:
+            latency: Dict[str, Dict[str, Any]] = {}
+            sizes: Dict[str, Dict[str, Any]] = {}
+            for (kind, name), series in self._series.items():
+                target = sizes if kind in SIZE_KINDS else latency
+                target.setdefault(kind, {})[name] = series.snapshot()
+            rates = {name: {"count": meter.count, **meter.rates()} for name, meter in self._meters.items()}
+            counters: Dict[str, Dict[str, int]] = {}
+            for (kind, name), total in self._counters.items():
+                counters.setdefault(kind, {})[name] = total
+            gauges: Dict[str, Dict[str, float]] = {}
+            for (kind, name), value in self._gauges.items():
+                gauges.setdefault(kind, {})[name] = value
+        return {"latency": latency, "sizes": sizes, "rates": rates, "counters": counters, "gauges": gauges}
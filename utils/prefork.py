@@ -0,0 +1,240 @@
+"""
+Servidores A2A em Pré-Fork
+O processo pai monta o agente (LlmAgent, tools, Runner e dados) uma vez, congela o heap com gc.freeze
+e cria os workers por fork: todos compartilham esse estado copy-on-write e o mesmo socket de escuta
+"""
+
+import gc
+import json
+import os
+import select
+import signal
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from .enhanced_logger import enhanced_logger, LogCategory, LogLevel
+from .log_shipping import SOURCE_ENV
+from .replica_set import parse_replicas
+
+
+WORKERS_ENV = "FLAFLU_WORKERS"   # ex.: researcher=4 (padrão 1: processo único, sem fork)
+
+
+def prefork_supported() -> bool:
+    return hasattr(os, "fork")
+
+
+def worker_count(agent: str, value: Optional[str] = None) -> int:
+    """Workers do agente em FLAFLU_WORKERS (mesmo formato de FLAFLU_REPLICAS)"""
+    if not prefork_supported():
+        return 1
+    return parse_replicas(os.getenv(WORKERS_ENV, "") if value is None else value).get(agent, 1)
+
+
+def memory_usage(pid="self") -> Dict[str, float]:
+    """RSS, PSS e memória privada em MB (/proc/<pid>/smaps_rollup); fora do Linux, só o pico de RSS"""
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as handle:
+            for line in handle:
+                key, _, rest = line.partition(":")
+                parts = rest.split()
+                if len(parts) == 2 and parts[1] == "kB":
+                    fields[key] = int(parts[0]) / 1024
+    except OSError:
+        if pid != "self":
+            return {}
+        import resource
+        return {"rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+    return {
+        "rss_mb": round(fields.get("Rss", 0.0), 1),
+        "pss_mb": round(fields.get("Pss", 0.0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0), 1),
+    }
+
+
+class PreforkServer:
+    """
+    Pai: aquece o agente, abre o socket e supervisiona os workers (reinício por fork, sem novo aquecimento)
+    Worker: atende o socket herdado com o servidor Werkzeug em threads e informa ao pai,
+    por um pipe, o tempo do fork até ficar pronto e a memória (RSS e privada)
+    """
+
+    def __init__(self,
+                 app,
+                 port: int,
+                 workers: int,
+                 host: str = "0.0.0.0",
+                 warm: Optional[Callable[[], object]] = None,
+                 source: str = "agent",
+                 restart_delay: float = 1.0,
+                 report: Callable[[str], None] = print):
+        self.app = app
+        self.port = port
+        self.workers = workers
+        self.host = host
+        self.warm = warm
+        # Nome do processo no agregador de logs (o launcher o define para cada réplica)
+        self.source = os.getenv(SOURCE_ENV) or source
+        self.restart_delay = restart_delay
+        self.report = report
+        self.server = None
+        self.warm_seconds: Optional[float] = None
+        self.pids: Dict[int, int] = {}
+        self.ready: Dict[int, Dict[str, float]] = {}
+        self._restart_at: Dict[int, float] = {}
+        self._reports_r: Optional[int] = None
+        self._reports_w: Optional[int] = None
+        self._pending = b""
+
+    def prepare(self):
+        """Aquece o estado compartilhado e abre o socket de escuta (uma vez, no pai)"""
+        from werkzeug.serving import make_server
+
+        start = time.monotonic()
+        if self.warm is not None:
+            self.warm()
+        self.server = make_server(self.host, self.port, self.app, threaded=True)
+        self._reports_r, self._reports_w = os.pipe()
+        # Objetos do aquecimento saem das gerações do GC: as coletas nos workers não tocam
+        # nos seus cabeçalhos, e as páginas continuam compartilhadas
+        gc.collect()
+        gc.freeze()
+        self.warm_seconds = time.monotonic() - start
+        self.report(f"🔥 Estado do agente aquecido em {self.warm_seconds:.2f}s "
+                    f"({memory_usage().get('rss_mb', 0):.1f}MB no pai)")
+
+    def spawn(self, index: int):
+        forked_at = time.monotonic()
+        pid = os.fork()
+        if pid == 0:
+            self._worker(index, forked_at)
+        self.pids[pid] = index
+
+    def _worker(self, index: int, forked_at: float):
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, _raise_system_exit)
+            # Ctrl+C chega ao grupo todo; quem encerra os workers é o pai
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            os.close(self._reports_r)
+            if enhanced_logger.shipper is not None:
+                enhanced_logger.shipper.reset_after_fork(f"{self.source}/w{index}")
+            parent = os.getppid()
+            threading.Thread(target=_exit_with_parent, args=(parent,), name="PreforkParentWatch",
+                             daemon=True).start()
+
+            ready = {"worker": index, "pid": os.getpid(),
+                     "ready_ms": round((time.monotonic() - forked_at) * 1000, 2), **memory_usage()}
+            os.write(self._reports_w, (json.dumps(ready) + "\n").encode("utf-8"))
+            self.server.serve_forever()
+        except SystemExit:
+            pass
+        except BaseException:
+            code = 1
+        finally:
+            # Drena o escritor e sela o segmento do worker (os._exit não roda o atexit)
+            enhanced_logger.shutdown(timeout=2.0)
+            os._exit(code)
+
+    def _read_reports(self, timeout: float):
+        readable, _, _ = select.select([self._reports_r], [], [], timeout)
+        if not readable:
+            return
+        self._pending += os.read(self._reports_r, 65536)
+        *lines, self._pending = self._pending.split(b"\n")
+        for line in lines:
+            ready = json.loads(line)
+            index = ready.pop("worker")
+            self.ready[index] = ready
+            self.report(f"👷 Worker {index} (pid {ready['pid']}) pronto em {ready['ready_ms']:.1f}ms — "
+                        f"RSS {ready.get('rss_mb', 0):.1f}MB, privado {ready.get('private_mb', 0):.1f}MB")
+            enhanced_logger.log(
+                LogLevel.SYSTEM_EVENT, LogCategory.SYSTEM, f"Worker {self.source}/w{index} pronto",
+                event_type="prefork_worker_ready", duration_ms=ready["ready_ms"],
+                details={"agent": self.source, "worker": index, **ready}
+            )
+
+    def _reap(self):
+        now = time.monotonic()
+        while self.pids:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                break
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            self._restart_at[index] = now + self.restart_delay
+            self.report(f"❌ Worker {index} (pid {pid}) saiu com código {code}; novo fork em {self.restart_delay:.1f}s")
+            enhanced_logger.log(
+                LogLevel.ERROR, LogCategory.SYSTEM, f"Worker {self.source}/w{index} caiu (código {code})",
+                event_type="prefork_worker_exit",
+                details={"agent": self.source, "worker": index, "pid": pid, "exit_code": code}
+            )
+        for index, due in list(self._restart_at.items()):
+            if now >= due:
+                del self._restart_at[index]
+                self.spawn(index)
+
+    def poll(self, timeout: float = 0.5):
+        """Um passo do pai: relatórios de prontidão, workers que saíram e reinícios vencidos"""
+        self._read_reports(timeout)
+        self._reap()
+
+    def serve_forever(self):
+        """Aquece, cria os workers e supervisiona até SIGTERM/Ctrl+C"""
+        signal.signal(signal.SIGTERM, _raise_system_exit)
+        self.prepare()
+        try:
+            for index in range(1, self.workers + 1):
+                self.spawn(index)
+            while True:
+                self.poll()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            self.stop()
+
+    def stop(self, timeout: float = 5.0):
+        """SIGTERM nos workers, espera conjunta até timeout e SIGKILL nos restantes"""
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + timeout
+        while self.pids and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.02)
+            else:
+                self.pids.pop(pid, None)
+        for pid in self.pids:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self.pids.clear()
+        if self.server is not None:
+            self.server.server_close()
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def _exit_with_parent(parent: int):
+    """Worker órfão (pai morto com SIGKILL) encerra sozinho"""
+    while os.getppid() == parent:
+        time.sleep(1.0)
+    enhanced_logger.shutdown(timeout=2.0)
+    os._exit(0)
+
+
+def serve_prefork(app, port: int, workers: int, warm: Optional[Callable[[], object]] = None,
+                  source: str = "agent", host: str = "0.0.0.0"):
+    """Atende app na porta com workers processos pré-forkados (estado aquecido por warm no pai)"""
+    PreforkServer(app, port, workers, host=host, warm=warm, source=source).serve_forever()
@@ -0,0 +1,224 @@
+"""
+Supervisor de Processos dos Servidores A2A
+Sobe todos os agentes em paralelo, sonda o Agent Card com backoff até ficarem prontos
+e reinicia processos que caírem com backoff exponencial
+"""
+
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from .enhanced_logger import enhanced_logger, LogCategory, LogLevel
+
+
+# Estados de um processo supervisionado
+STARTING = "starting"
+READY = "ready"
+BACKOFF = "backoff"
+STOPPED = "stopped"
+
+AGENT_CARD_PATH = "/.well-known/agent.json"
+
+
+@dataclass
+class AgentSpec:
+    """Servidor A2A supervisionado (command padrão: python -m <module>)"""
+    name: str
+    module: str
+    port: int
+    emoji: str = ""
+    command: Optional[List[str]] = None
+    env: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self.port}"
+
+    def argv(self) -> List[str]:
+        return self.command or [sys.executable, "-m", self.module]
+
+
+def probe_agent_card(spec: AgentSpec, timeout: float = 0.5) -> bool:
+    """Pronto quando o Agent Card responde 200"""
+    import httpx
+
+    try:
+        return httpx.get(spec.url + AGENT_CARD_PATH, timeout=timeout).status_code == 200
+    except httpx.HTTPError:
+        return False
+
+
+class ManagedProcess:
+    """Processo de um agente: estado, tempos de partida e agenda de sondagem/reinício"""
+
+    def __init__(self, spec: AgentSpec):
+        self.spec = spec
+        self.popen: Optional[subprocess.Popen] = None
+        self.state = STOPPED
+        self.started_at = 0.0
+        self.ready_seconds: Optional[float] = None
+        self.restarts = 0
+        self.exit_codes: List[int] = []
+        self.next_probe_at = 0.0
+        self.probe_delay = 0.0
+        self.restart_at = 0.0
+        self.restart_delay = 0.0
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.popen.pid if self.popen is not None else None
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "pid": self.pid,
+            "port": self.spec.port,
+            "ready_seconds": self.ready_seconds,
+            "restarts": self.restarts,
+            "exit_codes": list(self.exit_codes),
+        }
+
+
+class ProcessSupervisor:
+    """
+    Supervisiona os servidores A2A num único processo pai (um filho por agente, sem intermediários)
+    poll() avança a máquina de estados sem bloquear: detecta quedas, sonda prontidão e reinicia
+    """
+
+    def __init__(self,
+                 specs: Sequence[AgentSpec],
+                 probe: Callable[[AgentSpec], bool] = probe_agent_card,
+                 probe_initial: float = 0.05,
+                 probe_max: float = 1.0,
+                 restart_initial: float = 1.0,
+                 restart_max: float = 30.0,
+                 stable_after: float = 60.0,
+                 report: Optional[Callable[[str], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.processes: Dict[str, ManagedProcess] = {spec.name: ManagedProcess(spec) for spec in specs}
+        self.probe = probe
+        self.probe_initial = probe_initial
+        self.probe_max = probe_max
+        self.restart_initial = restart_initial
+        self.restart_max = restart_max
+        # Processo que ficou de pé por stable_after segundos volta ao atraso inicial de reinício
+        self.stable_after = stable_after
+        self.report = report or (lambda message: None)
+        self.clock = clock
+
+    def start_all(self):
+        """Sobe todos os agentes de uma vez (sem espera entre eles)"""
+        now = self.clock()
+        for proc in self.processes.values():
+            proc.restart_delay = self.restart_initial
+            self._spawn(proc, now)
+
+    def _spawn(self, proc: ManagedProcess, now: float):
+        spec = proc.spec
+        proc.popen = subprocess.Popen(spec.argv(), env={**os.environ, **spec.env})
+        proc.state = STARTING
+        proc.started_at = now
+        proc.ready_seconds = None
+        proc.probe_delay = self.probe_initial
+        proc.next_probe_at = now
+        enhanced_logger.log(
+            LogLevel.SYSTEM_EVENT, LogCategory.SYSTEM, f"Processo {spec.name} iniciado",
+            event_type="agent_process_start",
+            details={"agent": spec.name, "pid": proc.pid, "port": spec.port, "restarts": proc.restarts}
+        )
+
+    def poll(self):
+        """Um passo da supervisão: quedas, sondagens vencidas e reinícios agendados"""
+        now = self.clock()
+        for proc in self.processes.values():
+            if proc.state in (STARTING, READY):
+                code = proc.popen.poll()
+                if code is not None:
+                    self._crashed(proc, code, now)
+                    continue
+
+            if proc.state == STARTING and now >= proc.next_probe_at:
+                if self.probe(proc.spec):
+                    now = self.clock()
+                    proc.state = READY
+                    proc.ready_seconds = now - proc.started_at
+                    self.report(f"✅ {proc.spec.emoji} {proc.spec.name}: pronto em {proc.ready_seconds:.2f}s "
+                                f"(porta {proc.spec.port}, pid {proc.pid})")
+                    enhanced_logger.log(
+                        LogLevel.SYSTEM_EVENT, LogCategory.SYSTEM, f"Processo {proc.spec.name} pronto",
+                        event_type="agent_process_ready", duration_ms=proc.ready_seconds * 1000,
+                        details={"agent": proc.spec.name, "pid": proc.pid, "restarts": proc.restarts}
+                    )
+                else:
+                    proc.next_probe_at = now + proc.probe_delay
+                    proc.probe_delay = min(proc.probe_delay * 2, self.probe_max)
+
+            elif proc.state == BACKOFF and now >= proc.restart_at:
+                proc.restarts += 1
+                self.report(f"🔄 {proc.spec.emoji} {proc.spec.name}: reiniciando (tentativa {proc.restarts})")
+                self._spawn(proc, now)
+
+    def _crashed(self, proc: ManagedProcess, code: int, now: float):
+        proc.exit_codes.append(code)
+        if now - proc.started_at >= self.stable_after:
+            proc.restart_delay = self.restart_initial
+        delay = proc.restart_delay
+        proc.state = BACKOFF
+        proc.restart_at = now + delay
+        proc.restart_delay = min(delay * 2, self.restart_max)
+        self.report(f"❌ {proc.spec.emoji} {proc.spec.name}: saiu com código {code}; reinício em {delay:.1f}s")
+        enhanced_logger.log(
+            LogLevel.ERROR, LogCategory.SYSTEM, f"Processo {proc.spec.name} caiu (código {code})",
+            event_type="agent_process_exit",
+            details={"agent": proc.spec.name, "exit_code": code, "restart_in_s": delay, "restarts": proc.restarts}
+        )
+
+    def _next_event_in(self) -> float:
+        now = self.clock()
+        pending = [proc.next_probe_at if proc.state == STARTING else proc.restart_at
+                   for proc in self.processes.values() if proc.state in (STARTING, BACKOFF)]
+        return max(0.0, min(pending) - now) if pending else self.probe_max
+
+    def wait_ready(self, timeout: float = 60.0) -> Dict[str, Optional[float]]:
+        """
+        Avança a supervisão até todos ficarem prontos ou o prazo acabar
+        Retorna segundos até a prontidão por agente (None para quem não ficou pronto)
+        """
+        deadline = self.clock() + timeout
+        while True:
+            self.poll()
+            if all(proc.state == READY for proc in self.processes.values()):
+                break
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            time.sleep(min(self._next_event_in(), remaining, self.probe_max))
+        return {name: proc.ready_seconds for name, proc in self.processes.items()}
+
+    def run(self, interval: float = 0.5, should_stop: Callable[[], bool] = lambda: False):
+        """Laço de supervisão até should_stop() (ou KeyboardInterrupt)"""
+        while not should_stop():
+            self.poll()
+            time.sleep(min(interval, max(self._next_event_in(), 0.01)))
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        return {name: proc.snapshot() for name, proc in self.processes.items()}
+
+    def stop_all(self, timeout: float = 5.0):
+        """SIGTERM em todos, espera conjunta até timeout e SIGKILL nos restantes"""
+        running = [proc for proc in self.processes.values()
+                   if proc.popen is not None and proc.popen.poll() is None]
+        for proc in running:
+            proc.popen.terminate()
+        deadline = time.monotonic() + timeout
+        for proc in running:
+            try:
+                proc.popen.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                proc.popen.kill()
+                proc.popen.wait()
+        for proc in self.processes.values():
+            proc.state = STOPPED
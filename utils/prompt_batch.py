@@ -0,0 +1,35 @@
+"""
+Lote de Prompts num Só Pedido ao LLM
+Várias consultas numeradas ([R1], [R2], ...) vão num único prompt e a resposta é separada
+pelos mesmos marcadores; consultas sem resposta marcada ficam como None (o chamador refaz sozinhas)
+"""
+
+import re
+from typing import List, Optional, Sequence
+
+
+MARKER_PATTERN = re.compile(r"\[R(\d+)\]")
+
+
+def combine_prompts(prompts: Sequence[str]) -> str:
+    """Prompt único com as consultas numeradas e a instrução de formato da resposta"""
+    lines = [
+        f"Responda separadamente às {len(prompts)} consultas abaixo. Comece cada resposta com o marcador "
+        f"da consulta ([R1], [R2], ...) e não use os marcadores dentro do texto.",
+        "",
+    ]
+    lines.extend(f"[R{number}] {prompt}" for number, prompt in enumerate(prompts, 1))
+    return "\n".join(lines)
+
+
+def split_response(text: str, count: int) -> List[Optional[str]]:
+    """Resposta de cada consulta (na ordem do lote) a partir dos marcadores [Rn]"""
+    parts: List[Optional[str]] = [None] * count
+    matches = list(MARKER_PATTERN.finditer(text))
+    for position, match in enumerate(matches):
+        number = int(match.group(1))
+        end = matches[position + 1].start() if position + 1 < len(matches) else len(text)
+        body = text[match.end():end].strip()
+        if 1 <= number <= count and parts[number - 1] is None and body:
+            parts[number - 1] = body
+    return parts
@@ -0,0 +1,344 @@
+"""
+Limite de Cota do Provedor do LLM (balde de fichas)
+Todas as chamadas de modelo passam por dois baldes compartilhados: requisições por minuto (RPM)
+e tokens por minuto (TPM). O estado pode ficar num arquivo com lock (fcntl) para valer entre processos;
+classes de prioridade reservam a parte final da cota para as chamadas mais importantes
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import LLM_QUOTA_TIMEOUTS, LLM_QUOTA_WAIT
+
+
+RPM_ENV = "FLAFLU_LLM_RPM"           # requisições por minuto (padrão 15)
+TPM_ENV = "FLAFLU_LLM_TPM"           # tokens por minuto (padrão 1.000.000)
+STATE_ENV = "FLAFLU_LLM_QUOTA_FILE"  # arquivo de estado compartilhado entre processos (opcional)
+DEFAULT_STATE_FILE = "logs/llm_quota.json"
+
+# Classes de prioridade (menor = mais importante)
+PRIORITY_HIGH = 0     # vereditos e aberturas do supervisor
+PRIORITY_NORMAL = 1   # turnos dos torcedores
+PRIORITY_LOW = 2      # pesquisas de fundo
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+# Fração de cada balde que uma classe não pode consumir (fica para as classes acima)
+DEFAULT_RESERVES = {PRIORITY_HIGH: 0.0, PRIORITY_NORMAL: 0.1, PRIORITY_LOW: 0.3}
+
+AGENT_PRIORITIES = {
+    "supervisor": PRIORITY_HIGH,
+    "flamengo": PRIORITY_NORMAL,
+    "fluminense": PRIORITY_NORMAL,
+    "researcher": PRIORITY_LOW,
+}
+
+# Tokens de saída presumidos antes da resposta (corrigidos depois com o uso real)
+DEFAULT_OUTPUT_TOKENS = 512
+
+
+class RateLimitTimeout(Exception):
+    """Cota do provedor não liberou a chamada dentro do prazo"""
+
+
+def agent_priority(agent_name: str) -> int:
+    """Prioridade pelo nome do agente (supervisor_agent, Torcedor Flamengo, Pesquisador...)"""
+    name = agent_name.lower()
+    for key, priority in AGENT_PRIORITIES.items():
+        if key in name:
+            return priority
+    return PRIORITY_LOW if "pesquisador" in name else PRIORITY_NORMAL
+
+
+def estimate_tokens(text: str, output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """Estimativa barata (~4 caracteres por token) do prompt mais a saída esperada"""
+    return len(text) // 4 + 1 + output_tokens
+
+
+class _MemoryState:
+    """Estado dos baldes no próprio processo"""
+
+    def __init__(self):
+        self.state: Optional[Dict[str, float]] = None
+
+    def transact(self, update: Callable[[Optional[Dict[str, float]]], Tuple[Dict[str, float], Any]]) -> Any:
+        self.state, result = update(self.state)
+        return result
+
+
+class _FileState:
+    """Estado dos baldes num arquivo JSON pequeno, lido e gravado sob flock (vale entre processos)"""
+
+    def __init__(self, path: str):
+        import fcntl
+
+        self._fcntl = fcntl
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def transact(self, update: Callable[[Optional[Dict[str, float]]], Tuple[Dict[str, float], Any]]) -> Any:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._fcntl.flock(fd, self._fcntl.LOCK_EX)
+            raw = os.read(fd, 4096)
+            try:
+                state = json.loads(raw) if raw else None
+            except ValueError:
+                state = None
+            state, result = update(state)
+            data = json.dumps(state).encode("utf-8")
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, data)
+            return result
+        finally:
+            os.close(fd)
+
+
+class TokenBucketLimiter:
+    """
+    Baldes RPM e TPM com reposição contínua (capacidade = um minuto de cota)
+    Uma chamada de prioridade p só consome se os baldes ficarem acima da reserva de p; no processo,
+    chamadas esperando com prioridade maior passam na frente. O TPM é corrigido com o uso real (settle)
+    """
+
+    def __init__(self,
+                 rpm: float = 15,
+                 tpm: float = 1_000_000,
+                 state_path: Optional[str] = None,
+                 reserves: Optional[Dict[int, float]] = None,
+                 prioritize: bool = True,
+                 timeout: Optional[float] = 120.0,
+                 registry=None,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rpm = float(rpm)
+        self.tpm = float(tpm)
+        self.reserves = dict(DEFAULT_RESERVES if reserves is None else reserves)
+        # False: balde simples, sem reservas nem preferência entre classes
+        self.prioritize = prioritize
+        # Espera máxima padrão por chamada (None: sem limite)
+        self.timeout = timeout
+        self.registry = registry
+        self.clock = clock
+        self.sleep = sleep
+        self.backend = _FileState(state_path) if state_path else _MemoryState()
+        self._lock = threading.Lock()
+        self._waiting = {priority: 0 for priority in PRIORITY_NAMES}
+        self.stats = {"acquired": 0, "waited": 0, "timeouts": 0, "tokens_estimated": 0, "tokens_settled": 0}
+
+    @classmethod
+    def from_env(cls, registry=None) -> "TokenBucketLimiter":
+        return cls(rpm=float(os.getenv(RPM_ENV, 15)), tpm=float(os.getenv(TPM_ENV, 1_000_000)),
+                   state_path=os.getenv(STATE_ENV) or None, registry=registry)
+
+    def _refill(self, state: Optional[Dict[str, float]], now: float) -> Dict[str, float]:
+        if state is None or now < state["updated"]:
+            return {"requests": self.rpm, "tokens": self.tpm, "updated": now}
+        elapsed = now - state["updated"]
+        return {
+            "requests": min(self.rpm, state["requests"] + elapsed * self.rpm / 60),
+            "tokens": min(self.tpm, state["tokens"] + elapsed * self.tpm / 60),
+            "updated": now,
+        }
+
+    def charged_tokens(self, tokens: int, priority: int = PRIORITY_NORMAL) -> float:
+        """
+        Tokens que acquire de fato consome: uma chamada maior que a cota acima da reserva não passaria
+        nunca, então consome só o balde cheio (settle deve partir deste valor, não da estimativa)
+        """
+        if not self.prioritize:
+            priority = PRIORITY_HIGH
+        return min(tokens, self.tpm * (1 - self.reserves.get(priority, 0.0)))
+
+    def try_acquire(self, tokens: int, priority: int = PRIORITY_NORMAL) -> float:
+        """Consome 1 requisição e tokens se a cota permitir; senão, segundos até a próxima tentativa"""
+        if not self.prioritize:
+            priority = PRIORITY_HIGH
+        with self._lock:
+            if any(self._waiting[higher] for higher in PRIORITY_NAMES if higher < priority):
+                return 0.05
+        reserve = self.reserves.get(priority, 0.0)
+        tokens = self.charged_tokens(tokens, priority)
+
+        def update(state):
+            state = self._refill(state, self.clock())
+            floor_requests = self.rpm * reserve
+            floor_tokens = self.tpm * reserve
+            missing_requests = floor_requests + 1 - state["requests"]
+            missing_tokens = floor_tokens + tokens - state["tokens"]
+            if missing_requests <= 1e-9 and missing_tokens <= 1e-9:
+                state["requests"] -= 1
+                state["tokens"] -= tokens
+                return state, 0.0
+            return state, max(missing_requests * 60 / self.rpm, missing_tokens * 60 / self.tpm, 0.001)
+
+        return self.backend.transact(update)
+
+    def settle(self, estimated: float, actual: Optional[int]):
+        """
+        Corrige o balde de tokens com o uso informado pelo provedor (pode ficar negativo: dívida)
+        estimated é o que foi consumido na reserva (charged_tokens)
+        """
+        if actual is None:
+            return
+        with self._lock:
+            self.stats["tokens_settled"] += actual
+
+        def update(state):
+            state = self._refill(state, self.clock())
+            state["tokens"] = min(self.tpm, state["tokens"] + estimated - actual)
+            return state, None
+
+        self.backend.transact(update)
+
+    def _finish(self, priority: int, tokens: int, waited: float):
+        with self._lock:
+            self.stats["acquired"] += 1
+            self.stats["tokens_estimated"] += tokens
+            if waited:
+                self.stats["waited"] += 1
+        if self.registry is not None:
+            self.registry.observe(LLM_QUOTA_WAIT, PRIORITY_NAMES[priority], waited * 1000)
+
+    def _timeout(self, priority: int, waited: float):
+        with self._lock:
+            self.stats["timeouts"] += 1
+        if self.registry is not None:
+            self.registry.increment(LLM_QUOTA_TIMEOUTS, PRIORITY_NAMES[priority])
+        raise RateLimitTimeout(f"Cota do LLM esgotada: prioridade {PRIORITY_NAMES[priority]} "
+                               f"esperou {waited:.1f}s")
+
+    def _delays(self, tokens: int, priority: int, timeout: Optional[float], start: float):
+        """Pausas até a cota liberar a chamada (a espera conta como fila da classe de prioridade)"""
+        timeout = self.timeout if timeout is None else timeout
+        delay = self.try_acquire(tokens, priority)
+        queued = bool(delay)
+        if queued:
+            with self._lock:
+                self._waiting[priority] += 1
+            try:
+                while delay:
+                    waited = self.clock() - start
+                    if timeout is not None and waited + delay > timeout:
+                        self._timeout(priority, waited)
+                    yield delay
+                    with self._lock:
+                        self._waiting[priority] -= 1
+                    try:
+                        delay = self.try_acquire(tokens, priority)
+                    finally:
+                        with self._lock:
+                            self._waiting[priority] += 1
+            finally:
+                with self._lock:
+                    self._waiting[priority] -= 1
+        self._finish(priority, tokens, self.clock() - start if queued else 0.0)
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_NORMAL, timeout: Optional[float] = None) -> float:
+        """Bloqueia até a cota liberar a chamada; retorna a espera em segundos"""
+        start = self.clock()
+        for delay in self._delays(tokens, priority, timeout, start):
+            self.sleep(delay)
+        return self.clock() - start
+
+    async def acquire_async(self, tokens: int, priority: int = PRIORITY_NORMAL,
+                            timeout: Optional[float] = None) -> float:
+        """acquire sem bloquear o event loop (callbacks do ADK)"""
+        start = self.clock()
+        for delay in self._delays(tokens, priority, timeout, start):
+            await asyncio.sleep(delay)
+        return self.clock() - start
+
+    def snapshot(self) -> Dict[str, Any]:
+        def update(state):
+            state = self._refill(state, self.clock())
+            return state, state
+
+        state = self.backend.transact(update)
+        return {
+            **self.stats,
+            "rpm": self.rpm,
+            "tpm": self.tpm,
+            "requests_available": round(state["requests"], 2),
+            "tokens_available": round(state["tokens"]),
+            "shared": isinstance(self.backend, _FileState),
+        }
+
+
+_limiter: Optional[TokenBucketLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_llm_limiter() -> TokenBucketLimiter:
+    """Limitador único do processo (FLAFLU_LLM_RPM, FLAFLU_LLM_TPM, FLAFLU_LLM_QUOTA_FILE)"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                from .enhanced_logger import enhanced_logger
+                _limiter = TokenBucketLimiter.from_env(enhanced_logger.registry)
+    return _limiter
+
+
+def set_llm_limiter(limiter: Optional[TokenBucketLimiter]):
+    """Troca o limitador do processo (testes e benchmarks); None volta a ler do ambiente"""
+    global _limiter
+    _limiter = limiter
+
+
+def _request_text(llm_request) -> str:
+    parts = []
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                parts.append(part.text)
+    instruction = getattr(llm_request.config, "system_instruction", None)
+    if isinstance(instruction, str):
+        parts.append(instruction)
+    return "".join(parts)
+
+
+# Estimativa da chamada em andamento, guardada no estado temporário da invocação (não persistido)
+ESTIMATE_STATE_KEY = "temp:llm_quota_estimate"
+
+
+def llm_rate_limit_callbacks(agent_name: str) -> Dict[str, Callable]:
+    """
+    before/after/on_model_error_callback do LlmAgent: reserva a cota antes, corrige o TPM com o uso real
+    e, se o modelo falhar, devolve os tokens reservados (a requisição continua contada no RPM)
+    """
+    priority = agent_priority(agent_name)
+
+    def settle(callback_context, actual: Optional[int]):
+        estimated = callback_context.state.get(ESTIMATE_STATE_KEY)
+        if estimated is None:
+            return
+        callback_context.state[ESTIMATE_STATE_KEY] = None
+        get_llm_limiter().settle(estimated, actual)
+
+    async def before_model_callback(callback_context, llm_request):
+        config = llm_request.config
+        output_tokens = getattr(config, "max_output_tokens", None) or DEFAULT_OUTPUT_TOKENS
+        tokens = estimate_tokens(_request_text(llm_request), output_tokens)
+        limiter = get_llm_limiter()
+        await limiter.acquire_async(tokens, priority)
+        callback_context.state[ESTIMATE_STATE_KEY] = limiter.charged_tokens(tokens, priority)
+        return None
+
+    def after_model_callback(callback_context, llm_response):
+        usage = getattr(llm_response, "usage_metadata", None)
+        settle(callback_context, usage.total_token_count if usage is not None else None)
+        return None
+
+    def on_model_error_callback(callback_context, llm_request, error):
+        settle(callback_context, 0)
+        return None
+
+    return {"before_model_callback": before_model_callback, "after_model_callback": after_model_callback,
+            "on_model_error_callback": on_model_error_callback}
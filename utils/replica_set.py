@@ -0,0 +1,150 @@
+"""
+Réplicas dos Agentes A2A e Balanceamento no Cliente
+Cada agente pode rodar em N processos (portas base, base+100, base+200...); o orquestrador
+escolhe a réplica com menos requisições em andamento e ejeta temporariamente as que falham
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+REPLICAS_ENV = "FLAFLU_REPLICAS"   # ex.: researcher=3,flamengo=2 (padrão 1 por agente)
+PORT_ENV = "FLAFLU_A2A_PORT"       # porta do servidor A2A (definida pelo launcher para cada réplica)
+REPLICA_PORT_STEP = 100
+
+
+def parse_replicas(value: Optional[str] = None) -> Dict[str, int]:
+    """Converte "researcher=3,flamengo=2" em {"researcher": 3, "flamengo": 2} (padrão: FLAFLU_REPLICAS)"""
+    if value is None:
+        value = os.getenv(REPLICAS_ENV, "")
+    counts = {}
+    for item in value.split(","):
+        name, sep, count = item.partition("=")
+        if sep and name.strip() and count.strip():
+            counts[name.strip()] = max(1, int(count))
+    return counts
+
+
+def replica_ports(base_port: int, replicas: int) -> List[int]:
+    """Portas das réplicas de um agente: base, base+100, base+200..."""
+    return [base_port + REPLICA_PORT_STEP * i for i in range(replicas)]
+
+
+def server_port(default: int) -> int:
+    """Porta deste servidor A2A (FLAFLU_A2A_PORT ou a porta padrão do agente)"""
+    return int(os.getenv(PORT_ENV, default))
+
+
+class Replica:
+    """Uma réplica: requisições em andamento, falhas consecutivas e janela de ejeção"""
+
+    __slots__ = ("url", "outstanding", "consecutive_failures", "ejections", "ejected_until",
+                 "requests", "failures")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def snapshot(self, now: float) -> Dict[str, object]:
+        return {
+            "url": self.url,
+            "outstanding": self.outstanding,
+            "healthy": now >= self.ejected_until,
+            "ejected_for_s": round(max(0.0, self.ejected_until - now), 3),
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class ReplicaSet:
+    """
+    Réplicas de um agente com balanceamento por menos requisições em andamento
+    Falha de conexão ejeta na hora; erros HTTP 5xx ejetam após eject_after seguidos.
+    A ejeção dura ejection_base * 2^(ejeções - 1), até ejection_max, e a réplica volta
+    sozinha ao fim da janela. Sem réplicas saudáveis, usa a que sai da ejeção primeiro
+    """
+
+    def __init__(self, urls: Sequence[str], eject_after: int = 3, ejection_base: float = 1.0,
+                 ejection_max: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        if not urls:
+            raise ValueError("ReplicaSet precisa de pelo menos uma réplica")
+        self.replicas = [Replica(url.rstrip("/")) for url in urls]
+        self.eject_after = eject_after
+        self.ejection_base = ejection_base
+        self.ejection_max = ejection_max
+        self.clock = clock
+        self._lock = threading.Lock()
+        # Desempate entre réplicas igualmente ocupadas (rodízio)
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    @property
+    def urls(self) -> List[str]:
+        return [replica.url for replica in self.replicas]
+
+    def acquire(self) -> Replica:
+        """Réplica saudável com menos requisições em andamento (contada como em andamento)"""
+        with self._lock:
+            now = self.clock()
+            count = len(self.replicas)
+            start = self._next
+            self._next = (start + 1) % count
+            best = None
+            for offset in range(count):
+                replica = self.replicas[(start + offset) % count]
+                if replica.ejected_until > now:
+                    continue
+                if best is None or replica.outstanding < best.outstanding:
+                    best = replica
+            if best is None:
+                best = min(self.replicas, key=lambda replica: replica.ejected_until)
+            best.outstanding += 1
+            best.requests += 1
+            return best
+
+    def release(self, replica: Replica, ok: bool = True, connection_error: bool = False):
+        """Devolve a réplica com o resultado da chamada (atualiza falhas e ejeção)"""
+        with self._lock:
+            replica.outstanding -= 1
+            if ok:
+                replica.consecutive_failures = 0
+                replica.ejections = 0
+                return
+            replica.failures += 1
+            replica.consecutive_failures += 1
+            if connection_error or replica.consecutive_failures >= self.eject_after:
+                self._eject(replica)
+
+    def mark_health(self, replica: Replica, healthy: bool):
+        """Resultado de uma sonda ativa (Agent Card): saudável readmite, falha ejeta"""
+        with self._lock:
+            if healthy:
+                replica.ejected_until = 0.0
+                replica.consecutive_failures = 0
+            elif replica.ejected_until <= self.clock():
+                self._eject(replica)
+
+    def _eject(self, replica: Replica):
+        replica.ejections += 1
+        duration = min(self.ejection_base * 2 ** (replica.ejections - 1), self.ejection_max)
+        replica.ejected_until = self.clock() + duration
+        replica.consecutive_failures = 0
+
+    def healthy_count(self) -> int:
+        with self._lock:
+            now = self.clock()
+            return sum(1 for replica in self.replicas if replica.ejected_until <= now)
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        with self._lock:
+            now = self.clock()
+            return [replica.snapshot(now) for replica in self.replicas]
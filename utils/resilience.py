@@ -0,0 +1,287 @@
+"""
+Resiliência das Chamadas A2A
+Novas tentativas com backoff exponencial e jitter limitadas por um orçamento, requisições
+em hedge para outra réplica após o p95 e circuit breaker por agente (falha rápida com o agente fora)
+"""
+
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Mapping, Optional
+
+from .metrics import A2A_HEDGES, A2A_RETRIES, CIRCUIT_REJECTED, CIRCUIT_STATE
+
+
+RESILIENCE_ENV = "FLAFLU_A2A_RESILIENCE"   # ex.: attempts=3,hedge=1,breaker_failures=5,breaker_reset=5
+
+# Estados do circuit breaker (valor do gauge entre parênteses)
+CLOSED = "closed"         # (0) chamadas passam
+HALF_OPEN = "half_open"   # (1) uma chamada de teste passa
+OPEN = "open"             # (2) falha rápida até reset_timeout
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Métodos A2A sem efeitos colaterais: podem ser repetidos e enviados em hedge
+IDEMPOTENT_METHODS = ("conduct_research", "provide_stats", "fact_check", "agent_card")
+
+
+class CircuitOpenError(Exception):
+    """Circuito do agente aberto: a chamada falha sem ir à rede"""
+
+
+def backoff_delay(attempt: int, base: float, cap: float, rng: Callable[[], float] = random.random) -> float:
+    """Backoff exponencial com jitter total: uniforme em [0, min(cap, base * 2^attempt)]"""
+    return rng() * min(cap, base * 2 ** attempt)
+
+
+class RetryBudget:
+    """
+    Novas tentativas limitadas a ratio das requisições da janela ttl, mais min_per_s por segundo
+    Sob falha generalizada as tentativas extras não multiplicam a carga sobre o agente
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_s: float = 1.0, ttl: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ratio = ratio
+        self.min_per_s = min_per_s
+        self.ttl = ttl
+        self.clock = clock
+        self._requests: Deque[float] = deque()
+        self._retries: Deque[float] = deque()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        for window in (self._requests, self._retries):
+            while window and window[0] <= now - self.ttl:
+                window.popleft()
+
+    def record_request(self):
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            self._requests.append(now)
+
+    def try_retry(self) -> bool:
+        """Consome uma nova tentativa se o orçamento permitir"""
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            if len(self._retries) >= self.min_per_s * self.ttl + self.ratio * len(self._requests):
+                return False
+            self._retries.append(now)
+            return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire(self.clock())
+            return {"requests": len(self._requests), "retries": len(self._retries)}
+
+
+class CircuitBreaker:
+    """
+    Abre após failure_threshold falhas seguidas e recusa chamadas por reset_timeout;
+    depois deixa passar uma chamada de teste (meio aberto): sucesso fecha, falha reabre
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 5.0,
+                 registry=None, clock: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.registry = registry
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        self.stats = {"opened": 0, "rejected": 0}
+
+    def allow(self) -> bool:
+        """A chamada pode seguir? (no estado meio aberto, só uma por vez)"""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return self._reject()
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._trial:
+                    return self._reject()
+                self._trial = True
+            return True
+
+    def record(self, ok: bool):
+        with self._lock:
+            self._trial = False
+            if ok:
+                self.failures = 0
+                if self.state != CLOSED:
+                    self._set_state(CLOSED)
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self.stats["opened"] += 1
+                self._set_state(OPEN)
+
+    def _reject(self) -> bool:
+        self.stats["rejected"] += 1
+        if self.registry is not None:
+            self.registry.increment(CIRCUIT_REJECTED, self.name)
+        return False
+
+    def _set_state(self, state: str):
+        self.state = state
+        if self.registry is not None:
+            self.registry.set_gauge(CIRCUIT_STATE, self.name, STATE_VALUES[state])
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, "state": self.state, "consecutive_failures": self.failures}
+
+
+class ResiliencePolicy:
+    """
+    Política das chamadas A2A do orquestrador: circuit breaker por agente, até max_attempts tentativas
+    (só chamadas idempotentes, dentro do orçamento, com backoff e jitter) e hedge opcional após hedge_after
+    """
+
+    def __init__(self,
+                 max_attempts: int = 3,
+                 backoff_base: float = 0.1,
+                 backoff_max: float = 2.0,
+                 hedge: bool = True,
+                 hedge_min_samples: int = 20,
+                 attempt_timeout: float = 10.0,
+                 breaker_failures: int = 5,
+                 breaker_reset: float = 5.0,
+                 budget: Optional[RetryBudget] = None,
+                 registry=None,
+                 sleep: Callable[[float], None] = time.sleep,
+                 rng: Callable[[], float] = random.random):
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        # Amostras de latência da rota antes de confiar no p95 para disparar hedges
+        self.hedge_min_samples = hedge_min_samples
+        self.attempt_timeout = attempt_timeout
+        self.breaker_failures = breaker_failures
+        self.breaker_reset = breaker_reset
+        self.budget = budget or RetryBudget()
+        self.registry = registry
+        self.sleep = sleep
+        self.rng = rng
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self.stats = {"calls": 0, "retries": 0, "retries_denied": 0, "hedges": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_env(cls, registry=None, environ: Mapping[str, str] = os.environ) -> "ResiliencePolicy":
+        casts = {"attempts": ("max_attempts", int), "backoff_base": ("backoff_base", float),
+                 "backoff_max": ("backoff_max", float), "hedge": ("hedge", lambda value: value not in ("0", "")),
+                 "timeout": ("attempt_timeout", float), "breaker_failures": ("breaker_failures", int),
+                 "breaker_reset": ("breaker_reset", float)}
+        settings = {}
+        for item in environ.get(RESILIENCE_ENV, "").split(","):
+            key, sep, value = item.partition("=")
+            if sep and key.strip() in casts:
+                name, cast = casts[key.strip()]
+                settings[name] = cast(value.strip())
+        return cls(registry=registry, **settings)
+
+    def breaker(self, agent: str) -> CircuitBreaker:
+        with self._lock:
+            if agent not in self.breakers:
+                self.breakers[agent] = CircuitBreaker(agent, self.breaker_failures, self.breaker_reset,
+                                                      registry=self.registry)
+            return self.breakers[agent]
+
+    def _count(self, stat: str, metric: Optional[str] = None, agent: str = ""):
+        with self._lock:
+            self.stats[stat] += 1
+        if metric is not None and self.registry is not None:
+            self.registry.increment(metric, agent)
+
+    def call(self,
+             agent: str,
+             attempt: Callable[[], Any],
+             idempotent: bool = True,
+             hedge_after: Optional[float] = None,
+             retryable: Callable[[Any], bool] = lambda result: False,
+             healthy: Callable[[Any], bool] = lambda result: True) -> Any:
+        """
+        Executa attempt() sob a política: CircuitOpenError com o circuito aberto; exceções e resultados
+        retryable são repetidos (se idempotente); o último resultado ou exceção é devolvido ao chamador
+        """
+        breaker = self.breaker(agent)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuito de {agent} aberto: falhando rápido")
+        self._count("calls")
+        self.budget.record_request()
+        retry = 0
+        while True:
+            error, result = None, None
+            try:
+                if idempotent and self.hedge and hedge_after is not None:
+                    result = self._hedged(agent, attempt, hedge_after, retryable)
+                else:
+                    result = attempt()
+                breaker.record(healthy(result))
+                if not retryable(result):
+                    return result
+            except Exception as exc:
+                error = exc
+                breaker.record(False)
+
+            retry += 1
+            if not idempotent or retry >= self.max_attempts:
+                break
+            if not self.budget.try_retry():
+                self._count("retries_denied")
+                break
+            self.sleep(backoff_delay(retry - 1, self.backoff_base, self.backoff_max, self.rng))
+            if not breaker.allow():
+                break
+            self._count("retries", A2A_RETRIES, agent)
+
+        if error is not None:
+            raise error
+        return result
+
+    def _hedged(self, agent: str, attempt: Callable[[], Any], hedge_after: float,
+                retryable: Callable[[Any], bool]) -> Any:
+        """Segunda cópia da chamada se a primeira passar de hedge_after; vale a primeira resposta boa"""
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="A2AHedge")
+            pool = self._hedge_pool
+        # Cada cópia roda no contexto do chamador (span atual e traceparent)
+        primary = pool.submit(contextvars.copy_context().run, attempt)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        self._count("hedges", A2A_HEDGES, agent)
+        pending = {primary, pool.submit(contextvars.copy_context().run, attempt)}
+        fallback = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and not retryable(future.result()):
+                    if future is not primary:
+                        self._count("hedge_wins")
+                    return future.result()
+                fallback = future
+        # As duas falharam: devolve o resultado (ou exceção) da última
+        return fallback.result()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self.breakers)
+            stats = dict(self.stats)
+        return {**stats, "budget": self.budget.snapshot(),
+                "breakers": {agent: breaker.snapshot() for agent, breaker in breakers.items()}}
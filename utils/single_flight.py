@@ -0,0 +1,88 @@
+"""
+Coalescência de Chamadas Idênticas (single-flight)
+Chamadas concorrentes com a mesma chave compartilham uma única execução em andamento:
+a primeira executa e as demais aguardam e recebem o mesmo resultado (ou a mesma exceção);
+quem espera além de wait_timeout desiste da execução travada e faz a sua própria chamada
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from .metrics import COALESCED
+
+
+class _Call:
+    """Execução em andamento de uma chave"""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    do(chave, fn) executa fn uma vez por rodada de chamadas concorrentes da mesma chave
+    Chamadas que chegam depois do término executam de novo (não é um cache)
+    Coalescências contam no registry (série COALESCED com o nome do grupo)
+    """
+
+    def __init__(self, name: str, registry=None, wait_timeout: Optional[float] = None):
+        self.name = name
+        self.registry = registry
+        self.wait_timeout = wait_timeout
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executions": 0, "collapsed": 0, "wait_timeouts": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Resultado de fn e se ele veio de uma execução de outra chamada
+        timeout (padrão wait_timeout): espera máxima pela execução em andamento antes da chamada própria
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["executions"] += 1
+            else:
+                self.stats["collapsed"] += 1
+
+        if not leader:
+            if self.registry is not None:
+                self.registry.increment(COALESCED, self.name)
+            if not call.done.wait(timeout if timeout is not None else self.wait_timeout):
+                with self._lock:
+                    self.stats["wait_timeouts"] += 1
+                return fn(), False
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Chamadas servidas por uma execução em andamento (acertos) e execuções próprias (faltas)"""
+        with self._lock:
+            return {"hits": self.stats["collapsed"], "misses": self.stats["calls"] - self.stats["collapsed"]}
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self.stats, "in_flight": len(self._calls)}
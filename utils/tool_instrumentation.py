@@ -0,0 +1,100 @@
+"""
+Instrumentação das Tools do ADK
+Envolve a função de cada FunctionTool registrando duração, tamanho dos argumentos e do resultado
+e exceções no EnhancedLogger; desligada (FLAFLU_TOOL_METRICS=0) devolve a função original
+"""
+
+import functools
+import inspect
+import os
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .enhanced_logger import enhanced_logger
+from .metrics import TOOL_ARGS, TOOL_ERRORS, TOOL_RESULT
+
+
+TOOL_METRICS_ENV = "FLAFLU_TOOL_METRICS"
+_DISABLED_VALUES = ("0", "false", "no", "off")
+
+# Prévia dos argumentos gravada no log (o histórico completo do debate não vai para os detalhes)
+PREVIEW_CHARS = 100
+
+
+def tool_metrics_enabled() -> bool:
+    return os.getenv(TOOL_METRICS_ENV, "1").strip().lower() not in _DISABLED_VALUES
+
+
+def payload_size(value: Any) -> int:
+    """Tamanho aproximado em bytes (UTF-8 para textos, repr textual para os demais)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(str(value).encode("utf-8"))
+
+
+def _preview(value: Any) -> str:
+    text = value if isinstance(value, str) else str(value)
+    return text if len(text) <= PREVIEW_CHARS else text[:PREVIEW_CHARS] + "..."
+
+
+def instrument_tool(func: Callable, agent_name: str, logger=enhanced_logger,
+                    enabled: Optional[bool] = None) -> Callable:
+    """
+    Função da tool com métricas (duração, bytes de argumentos/resultado, exceções) e log de execução
+    Preserva nome, docstring e assinatura: o FunctionTool gera a mesma declaração para o modelo
+    """
+    if enabled is None:
+        enabled = tool_metrics_enabled()
+    if not enabled:
+        return func
+
+    tool_name = func.__name__
+    registry = logger.registry
+
+    def record(args: Tuple[Any, ...], kwargs: Dict[str, Any], result: Any,
+               error: Optional[BaseException], start: float):
+        duration_ms = (time.perf_counter() - start) * 1000
+        registry.observe(TOOL_ARGS, tool_name,
+                         sum(map(payload_size, args)) + sum(map(payload_size, kwargs.values())))
+        parameters = {key: _preview(value) for key, value in kwargs.items()}
+        if args:
+            parameters["args"] = [_preview(value) for value in args]
+
+        if error is not None:
+            registry.increment(TOOL_ERRORS, tool_name)
+            logger.log_tool_execution(agent_name, tool_name, parameters,
+                                      f"❌ {type(error).__name__}: {error}", duration_ms)
+            logger.log_error(error, context=tool_name, agent_name=agent_name)
+            return
+        registry.observe(TOOL_RESULT, tool_name, payload_size(result))
+        logger.log_tool_execution(agent_name, tool_name, parameters,
+                                  result if isinstance(result, str) else str(result), duration_ms)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as e:
+                record(args, kwargs, None, e, start)
+                raise
+            record(args, kwargs, result, None, start)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            record(args, kwargs, None, e, start)
+            raise
+        record(args, kwargs, result, None, start)
+        return result
+    return wrapper
@@ -0,0 +1,349 @@
+"""
+Rastreamento Distribuído para FlaFludeAgentes
+Spans com contexto W3C traceparent propagado nas chamadas A2A, guardados por processo
+e exportados no formato Chrome Trace (chrome://tracing / Perfetto) com o caminho crítico
+"""
+
+import contextvars
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_PATTERN = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+# Nome do serviço dos spans sem serviço explícito nem pai local
+SERVICE_NAME = os.getenv("FLAFLU_SERVICE", "app")
+
+
+class Span:
+    """Operação cronometrada de um trace (timestamps epoch em segundos)"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "service", "start", "end", "thread", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], service: str,
+                 start: Optional[float] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.service = service
+        self.start = time.time() if start is None else start
+        self.end: Optional[float] = None
+        self.thread = threading.current_thread().name
+        self.attributes = attributes or {}
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end - self.start) * 1000 if self.end is not None else None
+
+    def traceparent(self) -> str:
+        """Cabeçalho W3C com este span como pai (sempre amostrado)"""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": self.duration_ms,
+            "thread": self.thread,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(trace_id, span_id do pai) de um cabeçalho traceparent válido"""
+    if not header:
+        return None
+    match = _TRACEPARENT_PATTERN.match(header.strip().lower())
+    if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2)
+
+
+class TraceStore:
+    """Spans finalizados do processo, agrupados por trace e limitados aos traces mais recentes"""
+
+    def __init__(self, max_traces: int = 512, max_spans_per_trace: int = 2048):
+        self.max_traces = max_traces
+        self.max_spans_per_trace = max_spans_per_trace
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        record = span.to_dict()
+        with self._lock:
+            spans = self._traces.get(span.trace_id)
+            if spans is None:
+                spans = self._traces[span.trace_id] = []
+                if len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+            else:
+                self._traces.move_to_end(span.trace_id)
+            if len(spans) < self.max_spans_per_trace:
+                spans.append(record)
+
+    def get(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._traces.get(trace_id, ()))
+
+    def trace_ids(self) -> List[str]:
+        """Traces do mais recente para o mais antigo"""
+        with self._lock:
+            return list(reversed(self._traces))
+
+    def clear(self):
+        with self._lock:
+            self._traces.clear()
+
+
+trace_store = TraceStore()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("flaflu_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span is not None else None
+
+
+def open_span(name: str, service: Optional[str] = None, parent: Optional[Tuple[str, str]] = None,
+              **attributes: Any) -> Tuple[Span, contextvars.Token]:
+    """
+    Inicia um span e o torna o atual; parent=(trace_id, span_id) vindo de outro processo
+    Para hooks que não cabem num bloco with (ex.: before/teardown do Flask)
+    """
+    local_parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent
+    elif local_parent is not None:
+        trace_id, parent_id = local_parent.trace_id, local_parent.span_id
+    else:
+        trace_id, parent_id = os.urandom(16).hex(), None
+    if service is None:
+        service = local_parent.service if local_parent is not None else SERVICE_NAME
+    span = Span(name, trace_id, parent_id, service, attributes=attributes)
+    return span, _current_span.set(span)
+
+
+def close_span(span: Span, token: contextvars.Token, store: Optional[TraceStore] = None):
+    """Finaliza o span, restaura o anterior e guarda o registro"""
+    span.end = time.time()
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # Token criado em outro contexto (hooks executados fora do contexto de origem)
+        _current_span.set(None)
+    (store or trace_store).add(span)
+
+
+@contextmanager
+def start_span(name: str, service: Optional[str] = None, parent: Optional[Tuple[str, str]] = None,
+               **attributes: Any) -> Iterator[Span]:
+    """Span filho do atual (ou raiz de um novo trace) durante o bloco"""
+    span, token = open_span(name, service, parent, **attributes)
+    try:
+        yield span
+    except BaseException as e:
+        span.set_attribute("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        close_span(span, token)
+
+
+def traced(name: str, service: Optional[str] = None) -> Callable:
+    """Decorator: executa a função dentro de um span"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with start_span(name, service):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name: str, start: float, end: float, **attributes: Any) -> Optional[Span]:
+    """Registra um span já concluído como filho do atual (ignorado fora de um trace)"""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    span = Span(name, parent.trace_id, parent.span_id, parent.service, start=start, attributes=attributes)
+    span.end = end
+    trace_store.add(span)
+    return span
+
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Cabeçalhos da requisição com o traceparent do span atual"""
+    headers = dict(headers or {})
+    span = _current_span.get()
+    if span is not None:
+        headers[TRACEPARENT_HEADER] = span.traceparent()
+    return headers
+
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[str]:
+    """
+    span_ids do caminho crítico de cada raiz: a partir do fim do pai, escolhe o filho
+    que termina por último antes do cursor e recua o cursor para o início dele
+    """
+    by_id = {span["span_id"]: span for span in spans if span.get("end") is not None}
+    children: Dict[str, List[Dict[str, Any]]] = {}
+    roots = []
+    for span in by_id.values():
+        if span["parent_id"] in by_id:
+            children.setdefault(span["parent_id"], []).append(span)
+        else:
+            roots.append(span)
+
+    path: List[str] = []
+
+    def walk(span: Dict[str, Any]):
+        path.append(span["span_id"])
+        cursor = span["end"]
+        for child in sorted(children.get(span["span_id"], ()), key=lambda item: item["end"], reverse=True):
+            if child["end"] <= cursor:
+                walk(child)
+                cursor = child["start"]
+
+    for root in sorted(roots, key=lambda item: item["start"]):
+        walk(root)
+    return path
+
+
+def to_chrome_trace(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Trace no formato Chrome Trace Event: um processo por serviço, uma thread por thread de origem
+    e uma trilha extra "caminho crítico" com os spans que determinam a duração do turno
+    """
+    finished = [span for span in spans if span.get("end") is not None]
+    if not finished:
+        return {"traceEvents": [], "displayTimeUnit": "ms"}
+
+    origin = min(span["start"] for span in finished)
+    on_path = critical_path(finished)
+    critical = set(on_path)
+
+    events: List[Dict[str, Any]] = []
+    pids: Dict[str, int] = {}
+    tids: Dict[Tuple[str, str], int] = {}
+
+    def pid_for(service: str) -> int:
+        if service not in pids:
+            pids[service] = len(pids) + 1
+            events.append({"ph": "M", "name": "process_name", "pid": pids[service], "tid": 0,
+                           "args": {"name": service}})
+        return pids[service]
+
+    def tid_for(service: str, thread: str) -> int:
+        key = (service, thread)
+        if key not in tids:
+            tids[key] = len(tids) + 1
+            events.append({"ph": "M", "name": "thread_name", "pid": pid_for(service), "tid": tids[key],
+                           "args": {"name": thread}})
+        return tids[key]
+
+    def complete(span: Dict[str, Any], pid: int, tid: int) -> Dict[str, Any]:
+        return {
+            "ph": "X",
+            "name": span["name"],
+            "cat": "critical" if span["span_id"] in critical else "span",
+            "ts": round((span["start"] - origin) * 1_000_000, 3),
+            "dur": round((span["end"] - span["start"]) * 1_000_000, 3),
+            "pid": pid,
+            "tid": tid,
+            "args": {
+                **span.get("attributes", {}),
+                "span_id": span["span_id"],
+                "parent_id": span["parent_id"],
+                "critical_path": span["span_id"] in critical,
+            },
+        }
+
+    for span in sorted(finished, key=lambda item: item["start"]):
+        events.append(complete(span, pid_for(span["service"]), tid_for(span["service"], span["thread"] or "main")))
+
+    critical_pid = pid_for("caminho crítico")
+    by_id = {span["span_id"]: span for span in finished}
+    for span_id in on_path:
+        events.append(complete(by_id[span_id], critical_pid, 0))
+
+    roots = [span for span in finished if span["parent_id"] not in by_id]
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "trace_id": finished[0]["trace_id"],
+            "spans": len(finished),
+            "critical_path": [by_id[span_id]["name"] for span_id in on_path],
+            "duration_ms": round(max((span["end"] - span["start"]) * 1000 for span in roots), 3),
+        },
+    }
+
+
+def collect_trace(trace_id: str, peers: Iterable[str] = (), timeout: float = 5.0) -> List[Dict[str, Any]]:
+    """Spans do trace neste processo e nos servidores A2A (GET <peer>/traces/<trace_id>)"""
+    spans = {span["span_id"]: span for span in trace_store.get(trace_id)}
+    peers = [peer.rstrip("/") for peer in peers if peer]
+    if peers:
+        import httpx
+
+        with httpx.Client(timeout=timeout) as client:
+            for peer in peers:
+                try:
+                    response = client.get(f"{peer}/traces/{trace_id}")
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    continue
+                for span in response.json().get("spans", []):
+                    spans.setdefault(span["span_id"], span)
+    return sorted(spans.values(), key=lambda span: span["start"])
+
+
+def export_chrome_trace(trace_id: str, path: Path, peers: Iterable[str] = ()) -> Dict[str, Any]:
+    """Grava o trace (local + servidores) em JSON para chrome://tracing ou ui.perfetto.dev"""
+    trace = to_chrome_trace(collect_trace(trace_id, peers))
+    Path(path).write_text(json.dumps(trace, ensure_ascii=False), encoding="utf-8")
+    return trace
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta um trace dos servidores A2A no formato Chrome Trace")
+    parser.add_argument("trace_id", help="trace_id (igual ao correlation_id dos logs do turno)")
+    parser.add_argument("--peer", action="append", default=[],
+                        help="URL de um servidor A2A (repetível), ex.: http://localhost:8002")
+    parser.add_argument("--output", default=None, help="Arquivo de saída (padrão: trace_<id>.json)")
+    args = parser.parse_args()
+
+    output = Path(args.output or f"trace_{args.trace_id[:16]}.json")
+    trace = export_chrome_trace(args.trace_id, output, args.peer)
+    summary = trace.get("otherData", {})
+    print(f"📄 {summary.get('spans', 0)} spans salvos em {output}")
+    if summary.get("critical_path"):
+        print(f"⏱️  {summary['duration_ms']}ms | caminho crítico: {' → '.join(summary['critical_path'])}")
+
+
+if __name__ == "__main__":
+    main()